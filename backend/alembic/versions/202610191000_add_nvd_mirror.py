@@ -0,0 +1,77 @@
+"""add_nvd_mirror_tables
+
+Revision ID: 202610191000
+Revises: phase5_20251225
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '202610191000'
+down_revision = 'phase5_20251225'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CVE records
+    op.create_table(
+        'nvd_cves',
+        sa.Column('cve_id', sa.String(length=50), primary_key=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('cvss_score', sa.Float(), nullable=True),
+        sa.Column('cvss_vector', sa.String(length=200), nullable=True),
+        sa.Column('severity', sa.String(length=20), nullable=True),
+        sa.Column('vuln_status', sa.String(length=50), nullable=True),
+        sa.Column('published', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_modified', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('references', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+    op.create_index('idx_nvd_cve_last_modified', 'nvd_cves', ['last_modified'])
+
+    # Vulnerable CPE matches with version ranges
+    op.create_table(
+        'nvd_cpe_matches',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('cve_id', sa.String(length=50),
+                  sa.ForeignKey('nvd_cves.cve_id', ondelete='CASCADE'), nullable=False),
+        sa.Column('criteria', sa.String(length=500), nullable=False),
+        sa.Column('part', sa.String(length=1), nullable=True),
+        sa.Column('vendor', sa.String(length=200), nullable=True),
+        sa.Column('product', sa.String(length=200), nullable=False),
+        sa.Column('version', sa.String(length=100), nullable=True),
+        sa.Column('version_start_including', sa.String(length=100), nullable=True),
+        sa.Column('version_start_excluding', sa.String(length=100), nullable=True),
+        sa.Column('version_end_including', sa.String(length=100), nullable=True),
+        sa.Column('version_end_excluding', sa.String(length=100), nullable=True),
+    )
+    op.create_index('idx_nvd_cpe_product_vendor', 'nvd_cpe_matches', ['product', 'vendor'])
+    op.create_index('idx_nvd_cpe_product_version', 'nvd_cpe_matches', ['product', 'version'])
+    op.create_index(
+        'idx_nvd_cpe_range_end', 'nvd_cpe_matches',
+        ['product', 'version_end_excluding', 'version_end_including']
+    )
+    op.create_index('idx_nvd_cpe_cve', 'nvd_cpe_matches', ['cve_id'])
+
+    # Sync high-water marks
+    op.create_table(
+        'nvd_sync_state',
+        sa.Column('source', sa.String(length=100), primary_key=True),
+        sa.Column('last_modified', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('synced_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('cve_count', sa.Integer(), server_default='0', nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('nvd_sync_state')
+    op.drop_index('idx_nvd_cpe_cve', table_name='nvd_cpe_matches')
+    op.drop_index('idx_nvd_cpe_range_end', table_name='nvd_cpe_matches')
+    op.drop_index('idx_nvd_cpe_product_version', table_name='nvd_cpe_matches')
+    op.drop_index('idx_nvd_cpe_product_vendor', table_name='nvd_cpe_matches')
+    op.drop_table('nvd_cpe_matches')
+    op.drop_index('idx_nvd_cve_last_modified', table_name='nvd_cves')
+    op.drop_table('nvd_cves')
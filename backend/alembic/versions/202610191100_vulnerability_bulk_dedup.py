@@ -0,0 +1,51 @@
+"""vulnerability_bulk_dedup
+
+Revision ID: 202610191100
+Revises: 202610191000
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '202610191100'
+down_revision = '202610191000'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Host of the affected service (previously only kept in evidence)
+    op.add_column(
+        'vulnerabilities',
+        sa.Column('host', sa.String(length=45), server_default='', nullable=False)
+    )
+    op.execute("""
+        UPDATE vulnerabilities
+        SET host = evidence->>'host'
+        WHERE evidence ? 'host' AND evidence->>'host' IS NOT NULL
+    """)
+
+    # Drop duplicates before the unique index, keeping one row per finding
+    op.execute("""
+        DELETE FROM vulnerabilities a
+        USING vulnerabilities b
+        WHERE a.task_id = b.task_id
+          AND a.cve_id = b.cve_id
+          AND a.port IS NOT DISTINCT FROM b.port
+          AND a.host = b.host
+          AND a.id > b.id
+    """)
+    # port is NULL for findings without a service; NULLS NOT DISTINCT (PostgreSQL 15+)
+    # makes the index treat those as equal, matching the dedup above
+    op.create_index(
+        'uq_vuln_task_cve_port_host', 'vulnerabilities',
+        ['task_id', 'cve_id', 'port', 'host'], unique=True,
+        postgresql_nulls_not_distinct=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_vuln_task_cve_port_host', table_name='vulnerabilities')
+    op.drop_column('vulnerabilities', 'host')
@@ -0,0 +1,79 @@
+"""add_cve_catalog
+
+Revision ID: 202610191200
+Revises: 202610191100
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '202610191200'
+down_revision = '202610191100'
+branch_labels = None
+depends_on = None
+
+# CVE metadata columns moved from vulnerabilities to cve_catalog
+_MOVED_COLUMNS = ('cve_description', 'cvss_vector', 'published_date', 'last_modified_date', 'references')
+
+
+def upgrade() -> None:
+    op.create_table(
+        'cve_catalog',
+        sa.Column('cve_id', sa.String(length=50), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('cvss_score', sa.Float(), nullable=True),
+        sa.Column('cvss_vector', sa.String(length=200), nullable=True),
+        sa.Column('severity', sa.String(length=20), nullable=True),
+        sa.Column('published_date', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_modified_date', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('references', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('cve_id')
+    )
+
+    # One catalog row per CVE, taken from its most recently modified finding
+    op.execute("""
+        INSERT INTO cve_catalog (
+            cve_id, description, cvss_score, cvss_vector, severity,
+            published_date, last_modified_date, "references"
+        )
+        SELECT DISTINCT ON (cve_id)
+            cve_id, cve_description, cvss_score, cvss_vector, severity,
+            published_date, last_modified_date, "references"
+        FROM vulnerabilities
+        WHERE cve_id IS NOT NULL
+        ORDER BY cve_id, last_modified_date DESC NULLS LAST, created_at DESC
+    """)
+
+    op.create_foreign_key(
+        'fk_vuln_cve_catalog', 'vulnerabilities', 'cve_catalog',
+        ['cve_id'], ['cve_id']
+    )
+    for column in _MOVED_COLUMNS:
+        op.drop_column('vulnerabilities', column)
+
+
+def downgrade() -> None:
+    op.add_column('vulnerabilities', sa.Column('cve_description', sa.Text(), nullable=True))
+    op.add_column('vulnerabilities', sa.Column('cvss_vector', sa.String(length=200), nullable=True))
+    op.add_column('vulnerabilities', sa.Column('published_date', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('vulnerabilities', sa.Column('last_modified_date', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('vulnerabilities', sa.Column('references', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+    op.execute("""
+        UPDATE vulnerabilities v
+        SET cve_description = c.description,
+            cvss_vector = c.cvss_vector,
+            published_date = c.published_date,
+            last_modified_date = c.last_modified_date,
+            "references" = c."references"
+        FROM cve_catalog c
+        WHERE v.cve_id = c.cve_id
+    """)
+
+    op.drop_constraint('fk_vuln_cve_catalog', 'vulnerabilities', type_='foreignkey')
+    op.drop_table('cve_catalog')
@@ -20,6 +20,7 @@ from app.schemas.samples import (
     QRCodeResponse
 )
 from app.services import samples as sample_service
+from app.services import scan_diff as scan_diff_service
 from datetime import datetime
 
 router = APIRouter(prefix="/samples", tags=["Samples"])
@@ -200,3 +201,39 @@ async def regenerate_qr_code(
         qr_code_url=updated_sample.qr_code_url,
         generated_at=datetime.utcnow()
     )
+
+
+@router.get("/{sample_id}/scan-diff")
+async def diff_latest_scans(
+    sample_id: uuid.UUID,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Compare the latest two nmap scans of a sample
+    
+    - Ports opened and closed per host, keyed by (ip, protocol, port)
+    - Service/product/version changes on ports open in both scans
+    - Results served from the scan cache are not counted as separate scans
+    """
+    sample = await sample_service.get_sample(db, sample_id)
+    
+    if not sample:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sample not found"
+        )
+    
+    scan_results = await scan_diff_service.latest_sample_scan_results(db, sample_id)
+    if len(scan_results) < 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least two nmap scans are required for comparison"
+        )
+    
+    latest, previous = scan_results
+    return {
+        "code": 200,
+        "message": "success",
+        "data": scan_diff_service.get_scan_diff(previous, latest)
+    }
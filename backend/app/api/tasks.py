@@ -24,6 +24,10 @@ from app.schemas.tasks import (
     TaskResultResponse
 )
 from app.services import tasks as task_service
+from app.services.workspace import KIND_UPLOAD, WorkspaceQuotaExceeded, workspace_manager
+from app.services.nvd_cache import get_nvd_cache
+from app.services.scan_cache import get_scan_cache
+from app.services import scan_diff as scan_diff_service
 from datetime import datetime
 
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
@@ -524,6 +528,7 @@ async def get_task_vulnerabilities(
             "cvss_score": vuln.cvss_score,
             "cvss_vector": vuln.cvss_vector,
             "description": vuln.cve_description,
+            "host": vuln.host or None,
             "service_name": vuln.service_name,
             "service_version": vuln.service_version,
             "port": vuln.port,
@@ -686,6 +691,7 @@ async def export_task_vulnerabilities(
                 "cvss_vector": vuln.cvss_vector,
                 "description": vuln.cve_description,
                 "service": {
+                    "host": vuln.host or None,
                     "name": vuln.service_name,
                     "version": vuln.service_version,
                     "port": vuln.port,
@@ -715,7 +721,7 @@ async def export_task_vulnerabilities(
         )
 
 # Firmware upload endpoint
-FIRMWARE_UPLOAD_DIR = "/tmp/firmware_uploads"
+FIRMWARE_UPLOAD_DIR = str(workspace_manager.roots[KIND_UPLOAD])
 
 @router.post("/firmware/upload")
 async def upload_firmware(
@@ -751,15 +757,27 @@ async def upload_firmware(
             detail=f"File too large: {file_size / (1024*1024):.2f}MB. Max: 500MB"
         )
     
-    # Create unique directory for this upload
+    # Create unique workspace for this upload
     upload_id = str(uuid.uuid4())
-    upload_path = Path(FIRMWARE_UPLOAD_DIR) / upload_id
-    upload_path.mkdir(parents=True, exist_ok=True)
+    try:
+        workspace = workspace_manager.allocate(
+            KIND_UPLOAD, upload_id, reserve_bytes=file_size, reserve_inodes=2
+        )
+    except WorkspaceQuotaExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_507_INSUFFICIENT_STORAGE,
+            detail=str(e)
+        )
     
     # Save file
-    file_path = upload_path / file.filename
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    file_path = workspace.path / Path(file.filename).name
+    try:
+        with file_path.open("wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+    except Exception:
+        workspace_manager.remove(KIND_UPLOAD, upload_id)
+        raise
+    workspace_manager.release(KIND_UPLOAD, upload_id)
     
     return {
         "code": 200,
@@ -772,3 +790,92 @@ async def upload_firmware(
             "size_mb": round(file_size / (1024 * 1024), 2)
         }
     }
+
+
+@router.get("/firmware/workspaces")
+async def get_firmware_workspace_usage(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Firmware workspace disk usage
+    
+    - Bytes/inodes charged against the global quota
+    - Active and cached workspaces per kind (extract/upload)
+    - Eviction and quota rejection counters
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": workspace_manager.usage()
+    }
+
+
+@router.get("/nvd/cache")
+async def get_nvd_cache_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    NVD query cache statistics
+    
+    - Hits (in-process LRU / Redis), misses and cached empty results
+    - Hit rate, TTLs and local LRU size
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": get_nvd_cache().stats()
+    }
+
+
+@router.get("/scan-results/diff")
+async def diff_scan_results(
+    base_id: uuid.UUID = Query(..., description="Earlier nmap scan result ID"),
+    target_id: uuid.UUID = Query(..., description="Later nmap scan result ID"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Compare two nmap scan results
+    
+    - Ports opened and closed per host, keyed by (ip, protocol, port)
+    - Service/product/version changes on ports open in both scans
+    - Hosts that appeared or disappeared
+    - Diffs are cached per pair of scan results
+    """
+    scan_results = []
+    for scan_result_id in (base_id, target_id):
+        scan_result = await scan_diff_service.get_scan_result(db, scan_result_id)
+        if not scan_result:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Scan result {scan_result_id} not found"
+            )
+        if not scan_diff_service.is_nmap_result(scan_result):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Scan result {scan_result_id} is not an nmap scan"
+            )
+        scan_results.append(scan_result)
+    
+    return {
+        "code": 200,
+        "message": "success",
+        "data": scan_diff_service.get_scan_diff(*scan_results)
+    }
+
+
+@router.get("/scan/cache")
+async def get_scan_cache_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Nmap scan result cache statistics
+    
+    - Hits (in-process LRU / Redis), misses and forceRescan bypasses
+    - Hit rate, freshness window and local LRU size
+    """
+    return {
+        "code": 200,
+        "message": "success",
+        "data": get_scan_cache().stats()
+    }
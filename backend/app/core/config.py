@@ -55,6 +55,38 @@ class Settings(BaseSettings):
     MINIO_BUCKET: str = "iot-files"
     MINIO_USE_SSL: bool = False
     
+    # Firmware workspaces (extracted trees and uploads)
+    FIRMWARE_EXTRACT_DIR: str = "/tmp/firmware_extracted"
+    FIRMWARE_UPLOAD_DIR: str = "/tmp/firmware_uploads"
+    FIRMWARE_WORKSPACE_MAX_MB: int = 20480  # Global byte quota
+    FIRMWARE_WORKSPACE_MAX_INODES: int = 2000000  # Global inode quota
+    FIRMWARE_TASK_MAX_MB: int = 2048  # Per-task byte quota
+    FIRMWARE_TASK_MAX_INODES: int = 100000  # Per-task inode quota
+    FIRMWARE_EXTRACT_RETENTION_HOURS: int = 24  # Completed extractions kept for reuse
+    FIRMWARE_UPLOAD_RETENTION_HOURS: int = 72
+    FIRMWARE_MAX_CACHED_EXTRACTIONS: int = 20
+    
+    # Nmap scanning (targets are expanded and split into shards run as parallel nmap processes)
+    NMAP_MAX_PARALLEL: int = 4  # Concurrent nmap processes per task
+    NMAP_MIN_HOSTS_PER_SHARD: int = 16  # Smaller host sets are split by port range instead
+    
+    # Nmap result cache keyed by (target, nmap arguments); tasks can pass forceRescan to bypass it
+    SCAN_CACHE_MAX_AGE: int = 21600  # Freshness window in seconds
+    SCAN_CACHE_MAX_ENTRIES: int = 64  # In-process LRU size
+    
+    # NVD CVE API 2.0 endpoint (point at scripts/nvd_stub_server.py for offline testing)
+    NVD_API_URL: str = "https://services.nvd.nist.gov/rest/json/cves/2.0"
+    
+    # Local NVD mirror (queried before the live NVD API)
+    NVD_MIRROR_ENABLED: bool = True
+    NVD_FEED_DIR: str = "/data/nvd"  # Default location of offline NVD JSON feed files
+    
+    # NVD query result cache (in-process LRU in front of Redis)
+    NVD_CACHE_TTL: int = 86400  # Seconds a non-empty result is kept
+    NVD_CACHE_NEGATIVE_TTL: int = 3600  # Seconds an empty result is kept
+    NVD_CACHE_MAX_ENTRIES: int = 2048  # In-process LRU size
+    NVD_MAX_CONCURRENCY: int = 8  # Concurrent lookups per scan (pace set by the shared rate limiter)
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -19,6 +19,10 @@ from app.core.config import settings
 logger = logging.getLogger(__name__)
 
 
+class TaskCancelled(Exception):
+    """Worker检测到任务已被取消时抛出，执行器保留 cancelled 状态"""
+
+
 class TaskExecutor:
     """异步任务执行器"""
     
@@ -186,6 +190,10 @@ class TaskExecutor:
             
             logger.info(f"Task {task_id} completed successfully")
             
+        except TaskCancelled:
+            # cancel_task 已写入 cancelled 状态
+            logger.info(f"Task {task_id} stopped after cancellation")
+            
         except Exception as e:
             logger.error(f"Task {task_id} failed: {str(e)}", exc_info=True)
             self.redis_sync.hset(
@@ -312,6 +320,14 @@ class TaskExecutor:
         
         return progress_callback
     
+    def is_cancelled(self, task_id: str) -> bool:
+        """任务是否已被取消 (供worker线程轮询)"""
+        try:
+            return self.redis_sync.hget(f"task:{task_id}", "status") == "cancelled"
+        except Exception as e:
+            logger.debug(f"Failed to check cancellation of task {task_id}: {e}")
+            return False
+    
     async def get_task_status(self, task_id: str) -> Optional[dict]:
         """
         获取任务状态（用于API调用）
@@ -7,9 +7,13 @@ from app.models.models import (
     Sample,
     Task,
     ScanResult,
+    CveCatalog,
     Vulnerability,
     AuditLog,
     Report,  # Added Report
+    NvdCve,
+    NvdCpeMatch,
+    NvdSyncState,
     Base
 )
 
@@ -19,8 +23,12 @@ __all__ = [
     "Sample",
     "Task",
     "ScanResult",
+    "CveCatalog",
     "Vulnerability",
     "AuditLog",
     "Report",  # Added Report
+    "NvdCve",
+    "NvdCpeMatch",
+    "NvdSyncState",
     "Base"
 ]
@@ -160,8 +160,26 @@ class ScanResult(Base):
         Index("idx_scan_result_jsonb", "result", postgresql_using="gin"),
     )
 
+class CveCatalog(Base):
+    """Canonical CVE metadata, stored once and shared by all findings of the CVE"""
+    __tablename__ = "cve_catalog"
+    
+    cve_id = Column(String(50), primary_key=True)  # CVE-2024-1234
+    description = Column(Text)
+    cvss_score = Column(Float)
+    cvss_vector = Column(String(200))
+    severity = Column(String(20))
+    published_date = Column(DateTime(timezone=True))
+    last_modified_date = Column(DateTime(timezone=True))
+    references = Column(JSONB)  # Array of {url, source}
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    vulnerabilities = relationship("Vulnerability", back_populates="catalog")
+
 class Vulnerability(Base):
-    """Vulnerability model - Enhanced for CVE tracking"""
+    """Vulnerability model - one finding of a catalogued CVE on a host/port"""
     __tablename__ = "vulnerabilities"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -174,26 +192,20 @@ class Vulnerability(Base):
     description = Column(Text)
     evidence = Column(JSONB)
     
-    # CVE Information
-    cve_id = Column(String(50), index=True)  # CVE-2024-1234
-    cve_description = Column(Text)
+    # CVE Information (metadata lives in cve_catalog)
+    cve_id = Column(String(50), ForeignKey("cve_catalog.cve_id"), index=True)  # CVE-2024-1234
     
     # Affected Service
+    host = Column(String(45), nullable=False, server_default="")  # Host IP ("" when not host-bound)
     service_name = Column(String(100))
     service_version = Column(String(100))
     port = Column(Integer)
     protocol = Column(String(10))
     
-    # Severity
+    # Severity (kept per finding so dashboard/report aggregates need no join)
     severity = Column(String(20), nullable=False)
     status = Column(String(20), server_default="open")
     cvss_score = Column(Float)  # Support 0.0-10.0
-    cvss_vector = Column(String(200))
-    
-    # CVE Metadata
-    published_date = Column(DateTime(timezone=True))
-    last_modified_date = Column(DateTime(timezone=True))
-    references = Column(JSONB)  # Array of {url, source}
     
     # Remediation
     remediation = Column(Text)
@@ -206,6 +218,28 @@ class Vulnerability(Base):
     # Relationships
     task = relationship("Task", back_populates="vulnerabilities")
     scan_result = relationship("ScanResult", back_populates="vulnerabilities")
+    catalog = relationship("CveCatalog", back_populates="vulnerabilities", lazy="joined")
+    
+    # CVE metadata from the catalog (same attribute names as the former columns)
+    @property
+    def cve_description(self):
+        return self.catalog.description if self.catalog else None
+    
+    @property
+    def cvss_vector(self):
+        return self.catalog.cvss_vector if self.catalog else None
+    
+    @property
+    def published_date(self):
+        return self.catalog.published_date if self.catalog else None
+    
+    @property
+    def last_modified_date(self):
+        return self.catalog.last_modified_date if self.catalog else None
+    
+    @property
+    def references(self):
+        return self.catalog.references if self.catalog else None
     
     __table_args__ = (
         CheckConstraint(
@@ -215,8 +249,66 @@ class Vulnerability(Base):
         Index("idx_vuln_task", "task_id"),
         Index("idx_vuln_scan_result", "scan_result_id"),
         Index("idx_vuln_cve_id", "cve_id"),
+        Index(
+            "uq_vuln_task_cve_port_host", "task_id", "cve_id", "port", "host",
+            unique=True, postgresql_nulls_not_distinct=True
+        ),
+    )
+
+class NvdCve(Base):
+    """Local NVD mirror: one row per CVE"""
+    __tablename__ = "nvd_cves"
+    
+    cve_id = Column(String(50), primary_key=True)  # CVE-2024-1234
+    description = Column(Text)
+    cvss_score = Column(Float)
+    cvss_vector = Column(String(200))
+    severity = Column(String(20))
+    vuln_status = Column(String(50))  # Analyzed / Modified / Rejected ...
+    published = Column(DateTime(timezone=True))
+    last_modified = Column(DateTime(timezone=True), nullable=False)
+    references = Column(JSONB)  # Array of {url, source}
+    
+    cpe_matches = relationship("NvdCpeMatch", back_populates="cve", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("idx_nvd_cve_last_modified", "last_modified"),
     )
 
+class NvdCpeMatch(Base):
+    """Local NVD mirror: vulnerable CPE match criteria and version ranges of a CVE"""
+    __tablename__ = "nvd_cpe_matches"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cve_id = Column(String(50), ForeignKey("nvd_cves.cve_id", ondelete="CASCADE"), nullable=False)
+    criteria = Column(String(500), nullable=False)  # cpe:2.3:a:vendor:product:version:...
+    part = Column(String(1))
+    vendor = Column(String(200))
+    product = Column(String(200), nullable=False)
+    version = Column(String(100))
+    version_start_including = Column(String(100))
+    version_start_excluding = Column(String(100))
+    version_end_including = Column(String(100))
+    version_end_excluding = Column(String(100))
+    
+    cve = relationship("NvdCve", back_populates="cpe_matches")
+    
+    __table_args__ = (
+        Index("idx_nvd_cpe_product_vendor", "product", "vendor"),
+        Index("idx_nvd_cpe_product_version", "product", "version"),
+        Index("idx_nvd_cpe_range_end", "product", "version_end_excluding", "version_end_including"),
+        Index("idx_nvd_cpe_cve", "cve_id"),
+    )
+
+class NvdSyncState(Base):
+    """Local NVD mirror: high-water mark of each import/sync source"""
+    __tablename__ = "nvd_sync_state"
+    
+    source = Column(String(100), primary_key=True)  # "api" or "feed:<file name>"
+    last_modified = Column(DateTime(timezone=True))  # Newest lastModified imported
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    cve_count = Column(Integer, server_default="0")
+
 class AuditLog(Base):
     """Audit log model"""
     __tablename__ = "audit_logs"
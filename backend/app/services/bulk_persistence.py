@@ -0,0 +1,172 @@
+"""
+批量持久化
+
+Worker的扫描结果和漏洞记录通过一个会话、一个事务批量写入:
+漏洞按批 insert().values([...]) 多行插入，(task_id, cve_id, port, host)
+冲突的记录跳过，不再逐条 db.add()。
+
+CVE元数据 (描述、CVSS向量、参考链接、日期) 写入 cve_catalog，每个CVE
+只保存一份；NVD数据更新 (lastModified 更晚) 时覆盖。
+"""
+import logging
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.database import SyncSessionLocal
+from app.models import CveCatalog, ScanResult, Vulnerability
+
+logger = logging.getLogger(__name__)
+
+# 每条INSERT语句的行数 (约12个参数/行，远低于PostgreSQL的65535参数上限)
+VULNERABILITY_BATCH_SIZE = 1000
+
+# 漏洞去重键 (唯一索引为 NULLS NOT DISTINCT，无端口的漏洞同样去重)
+VULNERABILITY_CONFLICT_KEY = ["task_id", "cve_id", "port", "host"]
+
+
+def catalog_row(vuln_data: Dict[str, Any]) -> Dict[str, Any]:
+    """CVE查询结果转为 cve_catalog 表的一行"""
+    return {
+        "cve_id": vuln_data["cve_id"],
+        "description": vuln_data.get("description"),
+        "cvss_score": vuln_data.get("cvss_score"),
+        "cvss_vector": vuln_data.get("cvss_vector"),
+        "severity": vuln_data.get("severity"),
+        "published_date": vuln_data.get("published_date"),
+        "last_modified_date": vuln_data.get("last_modified_date"),
+        "references": vuln_data.get("references", []),
+    }
+
+
+def vulnerability_row(task_id: str, scan_result_id: Optional[str], vuln_data: Dict[str, Any]) -> Dict[str, Any]:
+    """CVE查询结果 (含服务信息) 转为 vulnerabilities 表的一行"""
+    return {
+        "id": uuid.uuid4(),
+        "task_id": task_id,
+        "scan_result_id": scan_result_id,
+        "cve_id": vuln_data["cve_id"],
+        "host": vuln_data.get("host") or "",
+        "service_name": vuln_data.get("service_name"),
+        "service_version": vuln_data.get("service_version"),
+        "port": vuln_data.get("port"),
+        "protocol": vuln_data.get("protocol"),
+        "severity": vuln_data["severity"],
+        "status": vuln_data.get("status", "open"),
+        "cvss_score": vuln_data.get("cvss_score"),
+        "remediation": vuln_data.get("remediation"),
+    }
+
+
+def bulk_insert_vulnerabilities(
+    task_id: str,
+    scan_result_id: Optional[str],
+    vulnerabilities: Iterable[Dict[str, Any]],
+    batch_size: int = VULNERABILITY_BATCH_SIZE
+) -> int:
+    """
+    批量写入漏洞记录
+
+    所有批次在同一个事务中提交，任一批失败则整体回滚。
+
+    Args:
+        task_id: 任务ID
+        scan_result_id: 关联的扫描结果ID (可选)
+        vulnerabilities: CVE查询结果，含 service_name/port/host 等服务信息
+        batch_size: 每条INSERT语句的行数
+
+    Returns:
+        实际插入的行数 (不含因重复而跳过的行)
+    """
+    inserted = 0
+    with SyncSessionLocal() as db, db.begin():
+        batch: List[Dict[str, Any]] = []
+        for vuln_data in vulnerabilities:
+            batch.append(vuln_data)
+            if len(batch) >= batch_size:
+                inserted += _insert_vulnerability_batch(db, task_id, scan_result_id, batch)
+                batch = []
+        if batch:
+            inserted += _insert_vulnerability_batch(db, task_id, scan_result_id, batch)
+
+    logger.info(f"Bulk inserted {inserted} vulnerabilities for task {task_id}")
+    return inserted
+
+
+def upsert_catalog(db, vulnerabilities: Iterable[Dict[str, Any]]):
+    """
+    写入CVE元数据
+
+    已收录的CVE仅在新数据的 lastModified 更晚 (或原记录没有日期) 时更新。
+    """
+    rows = {}
+    for vuln_data in vulnerabilities:
+        rows.setdefault(vuln_data["cve_id"], catalog_row(vuln_data))
+    if not rows:
+        return
+
+    stmt = pg_insert(CveCatalog).values(list(rows.values()))
+    updates = {
+        column: stmt.excluded[column]
+        for column in (
+            "description", "cvss_score", "cvss_vector", "severity",
+            "published_date", "last_modified_date", "references"
+        )
+    }
+    updates["updated_at"] = func.now()
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CveCatalog.cve_id],
+        set_=updates,
+        where=or_(
+            CveCatalog.last_modified_date.is_(None),
+            CveCatalog.last_modified_date < stmt.excluded.last_modified_date
+        )
+    )
+    db.execute(stmt)
+
+
+def _insert_vulnerability_batch(
+    db,
+    task_id: str,
+    scan_result_id: Optional[str],
+    batch: List[Dict[str, Any]]
+) -> int:
+    upsert_catalog(db, batch)
+    rows = [vulnerability_row(task_id, scan_result_id, vuln_data) for vuln_data in batch]
+    stmt = pg_insert(Vulnerability).values(rows).on_conflict_do_nothing(
+        index_elements=VULNERABILITY_CONFLICT_KEY
+    ).returning(Vulnerability.id)
+    return len(db.execute(stmt).all())
+
+
+def insert_scan_result(
+    task_id: str,
+    scan_type: str,
+    target: str,
+    result: Dict[str, Any]
+) -> Optional[str]:
+    """
+    写入一条扫描结果
+
+    Returns:
+        新记录ID；写入失败时记录日志并返回 None (不影响任务完成)
+    """
+    try:
+        with SyncSessionLocal() as db, db.begin():
+            scan_result_id = db.execute(
+                pg_insert(ScanResult).values(
+                    id=uuid.uuid4(),
+                    task_id=task_id,
+                    scan_type=scan_type,
+                    target=target,
+                    result=result
+                ).returning(ScanResult.id)
+            ).scalar_one()
+    except Exception as e:
+        logger.error(f"Failed to save scan result: {e}")
+        return None
+
+    logger.info(f"Saved scan result {scan_result_id} for task {task_id}")
+    return str(scan_result_id)
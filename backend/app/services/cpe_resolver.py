@@ -0,0 +1,283 @@
+"""
+CPE解析
+
+将Nmap识别的服务 (product / version / extrainfo / 服务名 / Nmap自带的CPE)
+解析为候选的 CPE 2.3 名称，漏洞查询随后按 cpeName / virtualMatchString
+精确匹配，而不是按关键词搜索。
+
+本地CPE字典由两部分组成:
+- 常见IoT/网络服务的内置条目 (Nmap产品名 -> vendor:product)
+- 本地NVD镜像中出现过的全部 vendor:product
+
+字典键按规范化名称排序，前缀查询使用二分查找。
+"""
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from app.core.database import get_sync_db
+from app.models import NvdCpeMatch
+from app.services.nvd_mirror import normalize_product, product_candidates
+
+logger = logging.getLogger(__name__)
+
+# 镜像中的 vendor:product 重新加载间隔 (秒)
+DICTIONARY_REFRESH = 3600
+# 每个服务最多返回的候选CPE数量
+MAX_CANDIDATES = 3
+# 前缀匹配最短长度，过短的名称 (如 "ftp") 不做前缀匹配
+MIN_PREFIX_LENGTH = 4
+
+# 规范化的Nmap产品名 -> [(vendor, product)]
+KNOWN_PRODUCTS: Dict[str, List[Tuple[str, str]]] = {
+    "openssh": [("openbsd", "openssh")],
+    "dropbear_sshd": [("dropbear_ssh_project", "dropbear_ssh")],
+    "apache_httpd": [("apache", "http_server")],
+    "apache_tomcat": [("apache", "tomcat")],
+    "nginx": [("f5", "nginx"), ("nginx", "nginx")],
+    "lighttpd": [("lighttpd", "lighttpd")],
+    "microsoft_iis_httpd": [("microsoft", "internet_information_services")],
+    "vsftpd": [("beasts", "vsftpd")],
+    "proftpd": [("proftpd", "proftpd")],
+    "pure_ftpd": [("pureftpd", "pure-ftpd")],
+    "isc_bind": [("isc", "bind")],
+    "dnsmasq": [("thekelleys", "dnsmasq")],
+    "miniupnp": [("miniupnp_project", "miniupnpd")],
+    "samba_smbd": [("samba", "samba")],
+    "boa_httpd": [("boa", "boa")],
+    "goahead_webserver": [("embedthis", "goahead")],
+    "mini_httpd": [("acme", "mini_httpd")],
+    "thttpd": [("acme", "thttpd")],
+    "busybox_httpd": [("busybox", "busybox")],
+    "busybox_telnetd": [("busybox", "busybox")],
+    "mosquitto": [("eclipse", "mosquitto")],
+    "postfix_smtpd": [("postfix", "postfix")],
+    "exim_smtpd": [("exim", "exim")],
+    "mysql": [("oracle", "mysql")],
+    "mariadb": [("mariadb", "mariadb")],
+    "postgresql_db": [("postgresql", "postgresql")],
+    "redis_key_value_store": [("redis", "redis")],
+    "openvpn": [("openvpn", "openvpn")],
+    "net_snmp": [("net-snmp", "net-snmp")],
+    "ntpd": [("ntp", "ntp")],
+    "cups": [("apple", "cups"), ("openprinting", "cups")],
+}
+
+# CPE 2.3 格式化字符串中需要转义的字符
+_CPE_SPECIAL = re.compile(r"([^A-Za-z0-9._\-])")
+# OpenSSH风格的补丁号: 7.4p1 -> version 7.4, update p1
+_PATCH_SUFFIX = re.compile(r"^(\d+(?:\.\d+)*)(p\d+)$")
+
+
+def escape_cpe_component(value: str) -> str:
+    """转义CPE 2.3格式化字符串的一个字段"""
+    return _CPE_SPECIAL.sub(r"\\\1", value)
+
+
+def split_version(version: str) -> Tuple[str, str]:
+    """Nmap版本号拆分为CPE的 (version, update)"""
+    version = (version or "").strip().lstrip("vV").split(" ")[0]
+    match = _PATCH_SUFFIX.match(version)
+    if match:
+        return match.group(1), match.group(2)
+    return version, ""
+
+
+def format_cpe(vendor: str, product: str, version: str = "", part: str = "a") -> str:
+    """生成CPE 2.3名称，无版本时版本字段为 *"""
+    version, update = split_version(version)
+    return "cpe:2.3:{}:{}:{}:{}:{}:*:*:*:*:*:*".format(
+        part,
+        vendor,
+        product,
+        escape_cpe_component(version) if version else "*",
+        escape_cpe_component(update) if update else "*",
+    )
+
+
+def parse_cpe(cpe: str) -> Optional[Dict[str, str]]:
+    """解析CPE 2.3名称或Nmap输出的CPE 2.2 URI (cpe:/a:vendor:product:version)"""
+    if cpe.startswith("cpe:2.3:"):
+        parts = re.split(r"(?<!\\):", cpe)
+        if len(parts) < 5:
+            return None
+        return {
+            "part": parts[2],
+            "vendor": parts[3],
+            "product": parts[4],
+            "version": parts[5] if len(parts) > 5 and parts[5] not in ("*", "-") else "",
+        }
+    if cpe.startswith("cpe:/"):
+        parts = cpe[5:].split(":")
+        if len(parts) < 3:
+            return None
+        return {
+            "part": parts[0] or "a",
+            "vendor": parts[1],
+            "product": parts[2],
+            "version": parts[3] if len(parts) > 3 else "",
+        }
+    return None
+
+
+class CPEDictionary:
+    """vendor:product 字典，按规范化名称建立有序前缀索引"""
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._entries: List[Tuple[str, str, str]] = []  # (part, vendor, product)，与 _keys 对应
+        self._known_pairs = set()
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def build(self, entries: List[Tuple[str, str, str]]):
+        """
+        建立索引
+
+        每个 (part, vendor, product) 以产品名和 "vendor_product" 两个键收录，
+        内置的Nmap产品名也作为键。
+        """
+        index = []
+        for part, vendor, product in entries:
+            entry = (part or "a", vendor or "", product)
+            index.append((normalize_product(product), entry))
+            if vendor:
+                index.append((normalize_product(f"{vendor}_{product}"), entry))
+        for name, pairs in KNOWN_PRODUCTS.items():
+            for vendor, product in pairs:
+                index.append((name, ("a", vendor, product)))
+        index = sorted(set(index))
+
+        with self._lock:
+            self._keys = [key for key, _ in index]
+            self._entries = [entry for _, entry in index]
+            self._known_pairs = {(vendor, product) for _, vendor, product in self._entries}
+
+    def ensure_loaded(self):
+        """首次使用或超过刷新间隔时从本地镜像加载"""
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < DICTIONARY_REFRESH:
+            return
+        self._loaded_at = now
+
+        entries: List[Tuple[str, str, str]] = []
+        db = next(get_sync_db())
+        try:
+            entries = db.query(
+                NvdCpeMatch.part, NvdCpeMatch.vendor, NvdCpeMatch.product
+            ).distinct().all()
+        except Exception as e:
+            logger.warning(f"CPE dictionary: local mirror unavailable, using built-in entries: {e}")
+        finally:
+            db.close()
+
+        self.build([tuple(row) for row in entries])
+        logger.info(f"CPE dictionary loaded: {len(self._keys)} keys")
+
+    def contains(self, vendor: str, product: str) -> bool:
+        return (vendor, product) in self._known_pairs
+
+    def exact(self, key: str) -> List[Tuple[str, str, str]]:
+        """键完全匹配的条目"""
+        with self._lock:
+            start = bisect_left(self._keys, key)
+            found = []
+            while start < len(self._keys) and self._keys[start] == key:
+                found.append(self._entries[start])
+                start += 1
+            return found
+
+    def prefix(self, prefix: str, limit: int = 20) -> List[Tuple[str, str, str]]:
+        """键以 prefix 开头的条目，按键排序"""
+        with self._lock:
+            start = bisect_left(self._keys, prefix)
+            found = []
+            while (
+                start < len(self._keys)
+                and self._keys[start].startswith(prefix)
+                and len(found) < limit
+            ):
+                found.append(self._entries[start])
+                start += 1
+            return found
+
+
+class CPEResolver:
+    """Nmap服务 -> 候选CPE 2.3名称"""
+
+    def __init__(self, dictionary: Optional[CPEDictionary] = None):
+        self.dictionary = dictionary or CPEDictionary()
+
+    def resolve(
+        self,
+        product: str = "",
+        version: str = "",
+        extrainfo: str = "",
+        service_name: str = "",
+        nmap_cpe: str = ""
+    ) -> List[str]:
+        """
+        解析候选CPE
+
+        依次尝试: Nmap自带的CPE、product (允许前缀匹配)、extrainfo 中的各段
+        (仅完全匹配)、服务名 (仅内置条目)；第一个能解析出条目的来源决定结果。
+
+        Returns:
+            最多 MAX_CANDIDATES 个带版本的CPE 2.3名称，无法解析时为空列表
+        """
+        self.dictionary.ensure_loaded()
+
+        entries: List[Tuple[str, str, str]] = []
+        if nmap_cpe:
+            parsed = parse_cpe(nmap_cpe)
+            if parsed and self.dictionary.contains(parsed["vendor"], parsed["product"]):
+                entries = [(parsed["part"], parsed["vendor"], parsed["product"])]
+                version = version or parsed["version"]
+
+        if not entries and product:
+            entries = self._lookup(product, allow_prefix=True)
+        if not entries and extrainfo:
+            for segment in re.split(r"[;,()]", extrainfo):
+                entries = self._lookup(segment, allow_prefix=False)
+                if entries:
+                    break
+        if not entries and service_name:
+            pairs = KNOWN_PRODUCTS.get(normalize_product(service_name), [])
+            entries = [("a", vendor, cpe_product) for vendor, cpe_product in pairs]
+
+        cpes = []
+        for part, vendor, cpe_product in entries[:MAX_CANDIDATES]:
+            cpes.append(format_cpe(vendor, cpe_product, version, part))
+        return cpes
+
+    def _lookup(self, name: str, allow_prefix: bool) -> List[Tuple[str, str, str]]:
+        key = normalize_product(name)
+        if not key:
+            return []
+
+        for candidate in product_candidates(name):
+            found = self.dictionary.exact(candidate)
+            if found:
+                return self._rank(found, key)
+
+        if allow_prefix and len(key) >= MIN_PREFIX_LENGTH:
+            found = self.dictionary.prefix(key)
+            if found:
+                return self._rank(found, key)
+        return []
+
+    @staticmethod
+    def _rank(entries: List[Tuple[str, str, str]], key: str) -> List[Tuple[str, str, str]]:
+        """去重；应用软件优先，厂商名出现在Nmap产品名中的优先"""
+        unique = list(dict.fromkeys(entries))
+        tokens = set(key.split("_"))
+        return sorted(
+            unique,
+            key=lambda e: (e[0] != "a", normalize_product(e[1]) not in tokens, len(e[2]))
+        )
+
+
+cpe_resolver = CPEResolver()
@@ -0,0 +1,208 @@
+"""
+NVD查询结果缓存
+
+search_cves 的结果按规范化的 (产品, 版本, 查询方式, API地址) 缓存: 进程内LRU在前，
+Redis在后，同一产品线的多台设备、多次扫描共用一份结果。空结果同样缓存 (TTL更短)，
+避免反复查询NVD没有收录的产品。
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.nvd_mirror import normalize_product
+
+logger = logging.getLogger(__name__)
+
+
+class NVDQueryCache:
+    """NVD查询结果的两级缓存 (进程内LRU + 可选Redis)"""
+
+    KEY_PREFIX = "nvd:cves:"
+
+    def __init__(
+        self,
+        redis_client=None,
+        max_entries: int = 2048,
+        ttl: int = 86400,
+        negative_ttl: int = 3600
+    ):
+        """
+        Args:
+            redis_client: 同步Redis客户端 (可选)
+            max_entries: 进程内LRU最大条目数
+            ttl: 非空结果的缓存时间 (秒)
+            negative_ttl: 空结果的缓存时间 (秒)
+        """
+        self.redis = redis_client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # key -> (过期时间, JSON序列化的 {limit, cves})；保存序列化结果，调用方修改返回值不影响缓存
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(
+        product: str,
+        version: Optional[str],
+        cpes: Optional[List[str]] = None,
+        endpoint: str = ""
+    ) -> str:
+        """
+        规范化的缓存键
+
+        产品名按CPE风格规范化，版本去掉v前缀并转小写。查询方式 (关键词/按CPE)、
+        排序后的CPE列表和API地址取摘要作为前缀，不同查询方式或数据源的结果互不复用。
+        """
+        version = (version or "").strip().lstrip("vV").lower()
+        mode = "cpe:" + ",".join(sorted(set(cpes))) if cpes else "keyword"
+        scope = hashlib.sha1(f"{endpoint}|{mode}".encode()).hexdigest()[:16]
+        return f"{scope}:{normalize_product(product or '')}:{version}"
+
+    def get(
+        self,
+        product: str,
+        version: Optional[str] = None,
+        cpes: Optional[List[str]] = None,
+        endpoint: str = "",
+        max_results: Optional[int] = None
+    ) -> Optional[List[Dict]]:
+        """
+        查询缓存
+
+        缓存的是查询时按其 max_results 取回的完整列表；请求更多结果时视为未命中。
+
+        Returns:
+            CVE列表 (空列表表示已缓存的空结果)；未命中返回 None
+        """
+        key = self.make_key(product, version, cpes, endpoint)
+        now = time.time()
+
+        payload = None
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._local.move_to_end(key)
+                    payload = entry[1]
+                else:
+                    del self._local[key]
+        if payload is not None:
+            cves = self._decode(payload, max_results)
+            if cves is not None:
+                with self._lock:
+                    self.local_hits += 1
+                return cves
+        elif self.redis is not None:
+            # 本地条目取回的结果不够时Redis中是同一份，不再查询
+            try:
+                cached = self.redis.get(self.KEY_PREFIX + key)
+                if cached is not None:
+                    ttl = self.redis.ttl(self.KEY_PREFIX + key)
+                    self._remember(key, cached, now + (ttl if ttl and ttl > 0 else self.negative_ttl))
+                    cves = self._decode(cached, max_results)
+                    if cves is not None:
+                        with self._lock:
+                            self.redis_hits += 1
+                        return cves
+            except Exception as e:
+                self.errors += 1
+                logger.debug(f"NVD cache lookup failed: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(
+        self,
+        product: str,
+        version: Optional[str],
+        cves: List[Dict],
+        cpes: Optional[List[str]] = None,
+        endpoint: str = "",
+        limit: Optional[int] = None
+    ):
+        """
+        缓存一次查询结果 (空结果使用 negative_ttl)
+
+        Args:
+            limit: 查询时的 max_results (None 表示结果未截断)
+        """
+        key = self.make_key(product, version, cpes, endpoint)
+        ttl = self.ttl if cves else self.negative_ttl
+        payload = json.dumps({"limit": limit, "cves": cves}, default=str)
+
+        self._remember(key, payload, time.time() + ttl)
+        with self._lock:
+            self.stores += 1
+        if self.redis is not None:
+            try:
+                self.redis.set(self.KEY_PREFIX + key, payload, ex=ttl)
+            except Exception as e:
+                self.errors += 1
+                logger.debug(f"NVD cache store failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """命中/未命中统计"""
+        with self._lock:
+            hits = self.local_hits + self.redis_hits
+            lookups = hits + self.misses
+            return {
+                "local_entries": len(self._local),
+                "max_entries": self.max_entries,
+                "redis_enabled": self.redis is not None,
+                "ttl": self.ttl,
+                "negative_ttl": self.negative_ttl,
+                "hits": hits,
+                "local_hits": self.local_hits,
+                "redis_hits": self.redis_hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "errors": self.errors,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _decode(self, payload: str, max_results: Optional[int] = None) -> Optional[List[Dict]]:
+        """反序列化缓存条目；条目按更小的 max_results 取回 (可能不完整) 时返回 None"""
+        entry = json.loads(payload)
+        limit = entry["limit"]
+        if limit is not None and (max_results is None or max_results > limit):
+            return None
+        cves = entry["cves"]
+        if not cves:
+            with self._lock:
+                self.negative_hits += 1
+        return cves
+
+    def _remember(self, key: str, payload: str, expires_at: float):
+        with self._lock:
+            self._local[key] = (expires_at, payload)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+
+# 进程内所有漏洞扫描共用
+_default_cache = NVDQueryCache(
+    max_entries=settings.NVD_CACHE_MAX_ENTRIES,
+    ttl=settings.NVD_CACHE_TTL,
+    negative_ttl=settings.NVD_CACHE_NEGATIVE_TTL
+)
+
+
+def get_nvd_cache(redis_client=None) -> NVDQueryCache:
+    if redis_client is not None and _default_cache.redis is None:
+        _default_cache.redis = redis_client
+    return _default_cache
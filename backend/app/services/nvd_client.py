@@ -4,37 +4,103 @@ NVD (National Vulnerability Database) API Client
 Provides interface for querying CVE data with rate limiting support
 """
 import httpx
-import asyncio
-from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+import hashlib
+from typing import Hashable, List, Dict, Optional
 import logging
 
+from app.core.config import settings
+from app.services.rate_limiter import TokenBucket
+from app.services.versions import VersionRangeIndex, compare_versions, version_in_range
+
 logger = logging.getLogger(__name__)
 
+# 同一进程内按API密钥共享的限流器
+_rate_limiters: Dict[str, TokenBucket] = {}
+
+
+def get_nvd_rate_limiter(api_key: Optional[str] = None, redis_client=None) -> TokenBucket:
+    """
+    获取NVD全局限流器
+    
+    NVD按API密钥 (无密钥时按来源IP) 限制为每30秒5次/50次请求，
+    同一密钥的所有worker和进程通过Redis共享一个令牌桶。
+    """
+    scope = f"key:{hashlib.sha256(api_key.encode()).hexdigest()[:16]}" if api_key else "anonymous"
+    limiter = _rate_limiters.get(scope)
+    if limiter is None:
+        limiter = TokenBucket(
+            key=f"nvd:ratelimit:{scope}",
+            rate=NVDClient.RATE_LIMIT_WITH_KEY if api_key else NVDClient.RATE_LIMIT,
+            period=NVDClient.RATE_WINDOW
+        )
+        _rate_limiters[scope] = limiter
+    if redis_client is not None and limiter.redis is None:
+        limiter.redis = redis_client
+    return limiter
+
 
 class NVDClient:
     """NVD CVE数据库API客户端"""
     
     BASE_URL = "https://services.nvd.nist.gov/rest/json/cves/2.0"
+    RATE_LIMIT = 5
+    RATE_LIMIT_WITH_KEY = 50
+    RATE_WINDOW = 30  # seconds
+    MAX_CONNECTIONS = 10
+    MAX_PAGE_SIZE = 2000
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        mirror=None,
+        cache=None,
+        rate_limiter: Optional[TokenBucket] = None,
+        base_url: Optional[str] = None
+    ):
         """
         初始化NVD客户端
         
         Args:
             api_key: NVD API密钥 (可选，提高速率限制)
+            mirror: 本地NVD镜像 (可选，优先查询，未命中时才访问在线API)
+            cache: 查询结果缓存 (可选，见 NVDQueryCache)
+            rate_limiter: 共享限流器 (可选，默认为进程内按密钥共享的令牌桶)
+            base_url: API地址 (可选，默认为 settings.NVD_API_URL)
         """
         self.api_key = api_key
-        self.rate_limit = 50 if api_key else 5
-        self.rate_window = 30  # seconds
-        
-        self._request_times: List[datetime] = []
+        self.base_url = base_url or settings.NVD_API_URL or self.BASE_URL
+        self.mirror = mirror
+        self.cache = cache
+        self.rate_limit = self.RATE_LIMIT_WITH_KEY if api_key else self.RATE_LIMIT
+        self.rate_window = self.RATE_WINDOW
+        self.rate_limiter = rate_limiter or get_nvd_rate_limiter(api_key)
+        self._http: Optional[httpx.AsyncClient] = None
+    
+    async def __aenter__(self) -> "NVDClient":
+        """在上下文内所有查询共用一个连接池"""
+        self._http = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(
+                max_connections=self.MAX_CONNECTIONS,
+                max_keepalive_connections=self.MAX_CONNECTIONS
+            )
+        )
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
         
     async def search_cves(
         self, 
         product: str, 
         version: Optional[str] = None,
-        max_results: int = 20
+        max_results: int = 20,
+        cpes: Optional[List[str]] = None
     ) -> List[Dict]:
         """
         搜索CVE
@@ -43,41 +109,104 @@ class NVDClient:
             product: 产品名称 (如 "Apache", "nginx")
             version: 版本号 (可选)
             max_results: 最大结果数
+            cpes: 已解析的候选CPE 2.3名称 (可选，见 cpe_resolver)；
+                  提供时按CPE精确查询，否则按关键词搜索
             
         Returns:
             CVE列表
         """
-        await self._check_rate_limit()
+        if self.cache is not None:
+            cves = self.cache.get(product, version, cpes, self.base_url, max_results)
+            if cves is not None:
+                return cves[:max_results]
+        
+        cves = await self._search(product, version, max_results, cpes)
+        if self.cache is not None:
+            self.cache.set(product, version, cves, cpes, self.base_url, limit=max_results)
+        return cves
+    
+    async def _search(
+        self,
+        product: str,
+        version: Optional[str],
+        max_results: int,
+        cpes: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """查询本地镜像，未收录时查询在线API"""
+        if self.mirror is not None:
+            if cpes:
+                cves = self.mirror.search_cpes(cpes, version, max_results)
+            else:
+                cves = self.mirror.search(product, version, max_results)
+            if cves is not None:
+                return cves
+        
+        if cpes:
+            return await self._search_by_cpe(cpes, max_results)
         
         # 构建搜索关键词
         keyword = product
         if version:
             keyword = f"{product} {version}"
         
-        params = {
+        vulnerabilities = await self._request({
             "keywordSearch": keyword,
             "resultsPerPage": min(max_results, 100)
-        }
+        })
+        logger.info(f"NVD API: Found {len(vulnerabilities)} CVEs for {keyword}")
+        return self._parse_cves(vulnerabilities)
+    
+    async def _search_by_cpe(self, cpes: List[str], max_results: int) -> List[Dict]:
+        """
+        按CPE查询在线API
+        
+        带版本的CPE先用 cpeName 查询 (NVD会匹配包含该版本的版本范围)，
+        该名称不在NVD CPE字典中 (404) 时改用 virtualMatchString；
+        无版本的CPE直接用 virtualMatchString 查询该产品的全部CVE。
+        """
+        merged: Dict[str, Dict] = {}
+        for cpe in cpes:
+            page_size = min(max_results, self.MAX_PAGE_SIZE)
+            vulnerabilities = None
+            if cpe.split(":")[5:6] not in (["*"], ["-"], []):
+                try:
+                    vulnerabilities = await self._request({"cpeName": cpe, "resultsPerPage": page_size})
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code != 404:
+                        raise
+            if vulnerabilities is None:
+                vulnerabilities = await self._request({
+                    "virtualMatchString": cpe,
+                    "resultsPerPage": page_size
+                })
+            logger.info(f"NVD API: Found {len(vulnerabilities)} CVEs for {cpe}")
+            for vuln in vulnerabilities:
+                cve_id = vuln.get("cve", {}).get("id")
+                if cve_id:
+                    merged.setdefault(cve_id, vuln)
+        return self._parse_cves(list(merged.values()))[:max_results]
+    
+    async def _request(self, params: Dict) -> List[Dict]:
+        """发送一次API请求 (经过全局限流)，返回 vulnerabilities 列表"""
+        await self._check_rate_limit()
         
         headers = {}
         if self.api_key:
             headers["apiKey"] = self.api_key
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    self.BASE_URL,
-                    params=params,
-                    headers=headers
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                vulnerabilities = data.get("vulnerabilities", [])
-                
-                logger.info(f"NVD API: Found {len(vulnerabilities)} CVEs for {keyword}")
-                return self._parse_cves(vulnerabilities)
+            if self._http is not None:
+                response = await self._http.get(self.base_url, params=params, headers=headers)
+            else:
+                async with httpx.AsyncClient(timeout=30.0) as client:
+                    response = await client.get(self.base_url, params=params, headers=headers)
+            response.raise_for_status()
+            return response.json().get("vulnerabilities", [])
                 
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 404:
+                logger.error(f"NVD API error: {e}")
+            raise
         except httpx.HTTPError as e:
             logger.error(f"NVD API error: {e}")
             raise
@@ -198,34 +327,26 @@ class NVDClient:
             return "NONE"
     
     async def _check_rate_limit(self):
-        """检查并等待速率限制"""
-        now = datetime.now()
-        
-        # 清理旧请求
-        self._request_times = [
-            t for t in self._request_times
-            if (now - t).total_seconds() < self.rate_window
-        ]
-        
-        # 如果达到限制，等待
-        if len(self._request_times) >= self.rate_limit:
-            oldest = self._request_times[0]
-            wait_time = self.rate_window - (now - oldest).total_seconds()
-            if wait_time > 0:
-                logger.info(f"Rate limit reached, waiting {wait_time:.1f}s")
-                await asyncio.sleep(wait_time)
-                # 清理后重新检查
-                self._request_times = [
-                    t for t in self._request_times
-                    if (datetime.now() - t).total_seconds() < self.rate_window
-                ]
+        """等待全局令牌桶放行"""
+        await self.rate_limiter.acquire()
+    
+    @staticmethod
+    def version_index(cves: List[Dict]) -> VersionRangeIndex:
+        """
+        将一次查询结果中所有CVE的受影响版本范围编译为区间索引
         
-        self._request_times.append(now)
+        lookup(版本) 返回影响该版本的 cve_id 集合；没有受影响产品信息的CVE
+        视为影响所有版本。
+        """
+        index = VersionRangeIndex()
+        for cve in cves:
+            NVDClient._index_products(index, cve["cve_id"], cve.get("affected_products"))
+        return index.build()
     
     @staticmethod
     def is_version_affected(service_version: str, affected_products: List[Dict]) -> bool:
         """
-        检查服务版本是否受CVE影响
+        检查服务版本是否受CVE影响 (单个CVE；批量过滤见 version_index)
         
         Args:
             service_version: 服务版本号 (如 "2.4.1", "1.19.0")
@@ -237,22 +358,25 @@ class NVDClient:
         if not service_version or not affected_products:
             return True  # 无版本信息时默认包含
         
-        # 清理版本号
-        service_version = service_version.strip().lstrip('vV')
-        
+        index = VersionRangeIndex()
+        NVDClient._index_products(index, True, affected_products)
+        return bool(index.build().lookup(service_version))
+    
+    @staticmethod
+    def _index_products(index: VersionRangeIndex, item: Hashable, affected_products: Optional[List[Dict]]):
+        """将一个CVE的受影响产品加入索引"""
+        if not affected_products:
+            index.add(item)
+            return
         for product in affected_products:
-            # 检查版本范围
-            if NVDClient._version_in_range(
-                service_version,
+            index.add(
+                item,
+                product.get("version"),
                 product.get("version_start_including"),
                 product.get("version_start_excluding"),
                 product.get("version_end_including"),
-                product.get("version_end_excluding"),
-                product.get("version")
-            ):
-                return True
-        
-        return False
+                product.get("version_end_excluding")
+            )
     
     @staticmethod
     def _version_in_range(
@@ -263,84 +387,19 @@ class NVDClient:
         end_excluding: Optional[str],
         exact_version: Optional[str]
     ) -> bool:
-        """检查版本是否在范围内"""
-        try:
-            # 精确匹配
-            if exact_version and exact_version != "*" and exact_version != "-":
-                return NVDClient._compare_versions(version, exact_version) == 0
-            
-            # 范围匹配
-            if start_including:
-                if NVDClient._compare_versions(version, start_including) < 0:
-                    return False
-            
-            if start_excluding:
-                if NVDClient._compare_versions(version, start_excluding) <= 0:
-                    return False
-            
-            if end_including:
-                if NVDClient._compare_versions(version, end_including) > 0:
-                    return False
-            
-            if end_excluding:
-                if NVDClient._compare_versions(version, end_excluding) >= 0:
-                    return False
-            
-            # 如果有任何范围定义，且通过了所有检查，则在范围内
-            if any([start_including, start_excluding, end_including, end_excluding]):
-                return True
-            
-            # 无范围信息时返回True (宽松匹配)
-            return True
-            
-        except Exception:
-            # 版本比较失败时返回True (宽松匹配)
-            return True
+        """检查版本是否在范围内 (见 versions.version_in_range)"""
+        return version_in_range(
+            version, start_including, start_excluding, end_including, end_excluding, exact_version
+        )
     
     @staticmethod
     def _compare_versions(v1: str, v2: str) -> int:
         """
-        比较两个版本号
+        比较两个版本号 (见 versions.compare_versions)
         
         Returns:
             -1 if v1 < v2
              0 if v1 == v2
              1 if v1 > v2
         """
-        # 清理版本号前缀
-        v1 = v1.strip().lstrip('vV')
-        v2 = v2.strip().lstrip('vV')
-        
-        def normalize(v: str) -> List[int]:
-            """将版本号转为数字列表"""
-            parts = v.replace('-', '.').replace('_', '.').split('.')
-            result = []
-            for part in parts:
-                # 尝试提取数字部分
-                num_str = ''
-                for char in part:
-                    if char.isdigit():
-                        num_str += char
-                    else:
-                        break
-                if num_str:
-                    result.append(int(num_str))
-                elif part:  # 非数字部分
-                    result.append(0)
-            return result
-        
-        v1_parts = normalize(v1)
-        v2_parts = normalize(v2)
-        
-        # 补齐长度
-        max_len = max(len(v1_parts), len(v2_parts))
-        v1_parts.extend([0] * (max_len - len(v1_parts)))
-        v2_parts.extend([0] * (max_len - len(v2_parts)))
-        
-        for a, b in zip(v1_parts, v2_parts):
-            if a < b:
-                return -1
-            elif a > b:
-                return 1
-        
-        return 0
+        return compare_versions(v1, v2)
@@ -0,0 +1,608 @@
+"""
+NVD本地镜像
+
+将NVD CVE数据保存在本地数据库 (nvd_cves / nvd_cpe_matches)，漏洞扫描按
+CPE产品名和版本范围直接查询本地表，只有镜像不可用或未收录该产品时才
+回退到在线API。
+
+数据来源:
+- 离线导入NVD JSON数据文件 (API 2.0格式或 fkie-cad nvd-json-data-feeds，支持 .gz/.xz)
+- 按 lastModified 增量同步在线API 2.0
+"""
+import gzip
+import json
+import logging
+import lzma
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import and_, delete, func, insert, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.core.database import get_sync_db
+from app.models import NvdCpeMatch, NvdCve, NvdSyncState
+from app.services.nvd_client import NVDClient
+from app.services.versions import VersionRangeIndex
+
+logger = logging.getLogger(__name__)
+
+# 每批写入的CVE数量
+IMPORT_BATCH_SIZE = 1000
+# NVD API 2.0 单次 lastModified 查询窗口上限为120天
+API_WINDOW_DAYS = 120
+API_PAGE_SIZE = 2000
+# 每页请求间隔 (无密钥 5次/30秒，有密钥 50次/30秒)
+API_PAGE_DELAY = 6.0
+API_PAGE_DELAY_WITH_KEY = 0.6
+# 镜像是否有数据的检查结果缓存时间
+AVAILABILITY_TTL = 300
+# 编译好的产品版本区间索引: 缓存数量和有效期 (秒)
+INDEX_CACHE_SIZE = 128
+INDEX_TTL = 600
+
+SOURCE_API = "api"
+
+# Nmap产品名 -> NVD CPE产品名
+PRODUCT_ALIASES = {
+    "apache_httpd": "http_server",
+    "apache_http_server": "http_server",
+    "microsoft_iis_httpd": "internet_information_services",
+    "dropbear_sshd": "dropbear_ssh",
+    "isc_bind": "bind",
+    "miniupnp": "miniupnpd",
+    "samba_smbd": "samba",
+    "postfix_smtpd": "postfix",
+    "exim_smtpd": "exim",
+    "boa_httpd": "boa",
+    "goahead_webs_httpd": "goahead",
+}
+# 去掉后可能得到CPE产品名的通用后缀
+GENERIC_SUFFIXES = ("httpd", "sshd", "ftpd", "smtpd", "server", "daemon", "service")
+
+
+def normalize_product(name: str) -> str:
+    """产品名规范化为CPE风格: 小写，非字母数字转为下划线"""
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def product_candidates(name: str) -> List[str]:
+    """一个产品名可能对应的CPE产品名"""
+    normalized = normalize_product(name)
+    if not normalized:
+        return []
+    candidates = [normalized]
+    if normalized in PRODUCT_ALIASES:
+        candidates.append(PRODUCT_ALIASES[normalized])
+    tokens = normalized.split("_")
+    while len(tokens) > 1 and tokens[-1] in GENERIC_SUFFIXES:
+        tokens = tokens[:-1]
+        candidates.append("_".join(tokens))
+    return list(dict.fromkeys(candidates))
+
+
+def parse_nvd_datetime(value: Optional[str]) -> Optional[datetime]:
+    """解析NVD时间戳 (无时区的视为UTC)"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def cpe_match_rows(cve_id: str, configurations: List[Dict]) -> List[Dict[str, Any]]:
+    """提取CVE配置中的易受攻击CPE匹配条件"""
+    rows = []
+    seen = set()
+    for config in configurations:
+        for node in config.get("nodes", []):
+            for cpe_match in node.get("cpeMatch", []):
+                if not cpe_match.get("vulnerable", True):
+                    continue
+                criteria = cpe_match.get("criteria", "")
+                # cpe:2.3:part:vendor:product:version:...
+                parts = criteria.split(":")
+                if len(parts) < 5 or not parts[4]:
+                    continue
+                row = {
+                    "cve_id": cve_id,
+                    "criteria": criteria[:500],
+                    "part": parts[2][:1] or None,
+                    "vendor": parts[3] or None,
+                    "product": parts[4],
+                    "version": parts[5] if len(parts) > 5 else "*",
+                    "version_start_including": cpe_match.get("versionStartIncluding"),
+                    "version_start_excluding": cpe_match.get("versionStartExcluding"),
+                    "version_end_including": cpe_match.get("versionEndIncluding"),
+                    "version_end_excluding": cpe_match.get("versionEndExcluding"),
+                }
+                key = tuple(row.values())
+                if key not in seen:
+                    seen.add(key)
+                    rows.append(row)
+    return rows
+
+
+def read_feed(path: Path) -> Iterator[Dict]:
+    """
+    读取NVD JSON数据文件，逐个返回CVE对象
+
+    支持 NVD API 2.0 响应格式 ({"vulnerabilities": [{"cve": ...}]}) 和
+    fkie-cad nvd-json-data-feeds 格式 ({"cve_items": [...]})，文件可为 .gz/.xz 压缩。
+    """
+    if path.suffix == ".gz":
+        opener = gzip.open
+    elif path.suffix == ".xz":
+        opener = lzma.open
+    else:
+        opener = open
+
+    with opener(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+
+    if "vulnerabilities" in data:
+        for vuln in data["vulnerabilities"]:
+            if vuln.get("cve"):
+                yield vuln["cve"]
+    elif "cve_items" in data:
+        yield from data["cve_items"]
+    elif "CVE_Items" in data:
+        raise ValueError(f"{path.name}: NVD 1.1 数据源已停止维护，请使用API 2.0格式的数据文件")
+    else:
+        raise ValueError(f"{path.name}: 无法识别的NVD数据文件格式")
+
+
+class NVDMirror:
+    """NVD本地镜像: 导入、增量同步和查询"""
+
+    def __init__(self):
+        self._parser = NVDClient()
+        self._available: Optional[bool] = None
+        self._checked_at = 0.0
+        # 产品 -> (编译时间, 版本区间索引, cve_id -> 结果字典)
+        self._indexes: "OrderedDict[tuple, Tuple[float, VersionRangeIndex, Dict[str, Dict]]]" = OrderedDict()
+        self._indexes_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def is_available(self) -> bool:
+        """镜像已启用且有数据 (结果缓存 AVAILABILITY_TTL 秒)"""
+        if not settings.NVD_MIRROR_ENABLED:
+            return False
+        now = time.monotonic()
+        if self._available is None or now - self._checked_at > AVAILABILITY_TTL:
+            db = next(get_sync_db())
+            try:
+                self._available = db.query(NvdCve.cve_id).limit(1).first() is not None
+            except Exception as e:
+                logger.warning(f"NVD mirror unavailable: {e}")
+                self._available = False
+            finally:
+                db.close()
+            self._checked_at = now
+        return self._available
+
+    def search(
+        self,
+        product: str,
+        version: Optional[str] = None,
+        max_results: int = 20
+    ) -> Optional[List[Dict]]:
+        """
+        按产品和版本查询本地镜像
+
+        Args:
+            product: 产品名称 (Nmap产品名或CPE产品名)
+            version: 版本号 (可选)
+            max_results: 最大结果数
+
+        Returns:
+            与 NVDClient.search_cves 相同结构的CVE列表 (按CVSS降序)；
+            镜像不可用或未收录该产品时返回 None，由调用方回退到在线API
+        """
+        if not product or not self.is_available():
+            return None
+
+        candidates = product_candidates(product)
+        if not candidates:
+            return None
+        return self._query(
+            ("product",) + tuple(candidates),
+            NvdCpeMatch.product.in_(candidates),
+            version,
+            max_results
+        )
+
+    def search_cpes(
+        self,
+        cpes: List[str],
+        version: Optional[str] = None,
+        max_results: int = 20
+    ) -> Optional[List[Dict]]:
+        """
+        按CPE (vendor:product) 查询本地镜像
+
+        Args:
+            cpes: CPE 2.3名称列表 (见 cpe_resolver)
+            version: 版本号 (可选)
+
+        Returns:
+            同 search；镜像未收录这些产品时返回 None
+        """
+        if not cpes or not self.is_available():
+            return None
+
+        pairs = []
+        for cpe in cpes:
+            parts = re.split(r"(?<!\\):", cpe)
+            if len(parts) > 4:
+                pairs.append((parts[3], parts[4]))
+        if not pairs:
+            return None
+        pairs = sorted(set(pairs))
+        condition = or_(*(
+            and_(NvdCpeMatch.vendor == vendor, NvdCpeMatch.product == product)
+            for vendor, product in pairs
+        ))
+        return self._query(("cpe",) + tuple(pairs), condition, version, max_results)
+
+    def _query(
+        self,
+        cache_key: tuple,
+        condition,
+        version: Optional[str],
+        max_results: int
+    ) -> Optional[List[Dict]]:
+        compiled = self._product_index(cache_key, condition)
+        if compiled is None:
+            return None
+        index, cves = compiled
+
+        version = (version or "").strip().lstrip("vV")
+        results = [
+            {**cves[cve_id], "affected_products": list(cves[cve_id]["affected_products"])}
+            for cve_id in index.lookup(version)
+        ]
+        results.sort(key=lambda r: (r["cvss_score"], r["cve_id"]), reverse=True)
+        logger.info(f"NVD mirror: Found {len(results)} CVEs for {cache_key[1:]} {version}".rstrip())
+        return results[:max_results]
+
+    def _product_index(
+        self,
+        cache_key: tuple,
+        condition
+    ) -> Optional[Tuple[VersionRangeIndex, Dict[str, Dict]]]:
+        """
+        产品的全部CPE匹配条件编译为版本区间索引 (LRU缓存)
+
+        Returns:
+            (索引, cve_id -> 结果字典)；镜像未收录该产品时返回 None
+        """
+        now = time.monotonic()
+        with self._indexes_lock:
+            cached = self._indexes.get(cache_key)
+            if cached and now - cached[0] < INDEX_TTL:
+                self._indexes.move_to_end(cache_key)
+                return cached[1], cached[2]
+
+        db = next(get_sync_db())
+        try:
+            rows = db.query(NvdCpeMatch, NvdCve).join(
+                NvdCve, NvdCve.cve_id == NvdCpeMatch.cve_id
+            ).filter(condition).all()
+
+            if not rows:
+                return None
+
+            index = VersionRangeIndex()
+            cves: Dict[str, Dict] = {}
+            for cpe, cve in rows:
+                if cve.vuln_status == "Rejected":
+                    continue
+                if cve.cve_id not in cves:
+                    cves[cve.cve_id] = self._to_result(cve, [])
+                cves[cve.cve_id]["affected_products"].append({
+                    "vendor": cpe.vendor or "",
+                    "product": cpe.product,
+                    "version": cpe.version or "*",
+                    "version_start_including": cpe.version_start_including,
+                    "version_start_excluding": cpe.version_start_excluding,
+                    "version_end_including": cpe.version_end_including,
+                    "version_end_excluding": cpe.version_end_excluding,
+                })
+                index.add(
+                    cve.cve_id,
+                    cpe.version,
+                    cpe.version_start_including,
+                    cpe.version_start_excluding,
+                    cpe.version_end_including,
+                    cpe.version_end_excluding
+                )
+        finally:
+            db.close()
+
+        index.build()
+        with self._indexes_lock:
+            self._indexes[cache_key] = (now, index, cves)
+            self._indexes.move_to_end(cache_key)
+            while len(self._indexes) > INDEX_CACHE_SIZE:
+                self._indexes.popitem(last=False)
+        return index, cves
+
+    def modified_since(self, since: datetime) -> Optional[Dict[str, set]]:
+        """
+        lastModified 晚于 since 的CVE (含新发布的CVE)
+
+        Returns:
+            {"cves": CVE ID集合, "products": (vendor, product) 集合}；
+            镜像不可用时返回 None
+        """
+        if not self.is_available():
+            return None
+
+        db = next(get_sync_db())
+        try:
+            rows = db.query(NvdCve.cve_id, NvdCpeMatch.vendor, NvdCpeMatch.product).outerjoin(
+                NvdCpeMatch, NvdCpeMatch.cve_id == NvdCve.cve_id
+            ).filter(NvdCve.last_modified > since).distinct().all()
+        finally:
+            db.close()
+
+        return {
+            "cves": {cve_id for cve_id, _, _ in rows},
+            "products": {(vendor or "", product) for _, vendor, product in rows if product},
+        }
+
+    @staticmethod
+    def _to_result(cve: NvdCve, affected: List[Dict]) -> Dict:
+        return {
+            "cve_id": cve.cve_id,
+            "description": cve.description or "",
+            "cvss_score": cve.cvss_score or 0.0,
+            "cvss_vector": cve.cvss_vector or "",
+            "severity": cve.severity or "UNKNOWN",
+            "published_date": cve.published.strftime("%Y-%m-%dT%H:%M:%S.000") if cve.published else None,
+            "last_modified_date": cve.last_modified.strftime("%Y-%m-%dT%H:%M:%S.000"),
+            "references": cve.references or [],
+            "affected_products": affected,
+        }
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def import_feed_file(self, path: str) -> Dict[str, Any]:
+        """
+        离线导入一个NVD JSON数据文件
+
+        已存在且 lastModified 不更新的CVE会被跳过，因此重复导入同一文件
+        或导入新版本文件都是增量的。
+
+        Returns:
+            {source, processed, changed, last_modified}
+        """
+        feed_path = Path(path)
+        stats = self._upsert(read_feed(feed_path))
+        self._save_state(f"feed:{feed_path.name}", stats)
+        logger.info(f"NVD mirror: imported {feed_path.name}: {stats}")
+        return {"source": feed_path.name, **stats}
+
+    def sync_from_api(
+        self,
+        api_key: Optional[str] = None,
+        since: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        从在线API增量同步 lastModified 晚于上次同步点的CVE
+
+        同步起点依次取: since 参数、上次API同步的高水位、镜像中最新的 lastModified。
+
+        Returns:
+            {source, processed, changed, last_modified}
+        """
+        start = since or self._sync_start()
+        if start is None:
+            raise ValueError("镜像为空，请先导入NVD数据文件或指定同步起点")
+        end = datetime.now(timezone.utc)
+
+        stats = {"processed": 0, "changed": 0, "last_modified": None}
+        with httpx.Client(timeout=60.0) as client:
+            window_start = start
+            while window_start < end:
+                window_end = min(window_start + timedelta(days=API_WINDOW_DAYS), end)
+                window_stats = self._upsert(
+                    self._fetch_window(client, window_start, window_end, api_key)
+                )
+                stats["processed"] += window_stats["processed"]
+                stats["changed"] += window_stats["changed"]
+                stats["last_modified"] = max(
+                    filter(None, [stats["last_modified"], window_stats["last_modified"]]),
+                    default=None
+                )
+                window_start = window_end
+
+        stats["last_modified"] = stats["last_modified"] or start
+        self._save_state(SOURCE_API, stats)
+        logger.info(f"NVD mirror: API sync since {start.isoformat()}: {stats}")
+        return {"source": SOURCE_API, **stats}
+
+    def status(self) -> Dict[str, Any]:
+        """镜像统计和各数据源同步状态"""
+        db = next(get_sync_db())
+        try:
+            return {
+                "cves": db.query(func.count(NvdCve.cve_id)).scalar(),
+                "cpe_matches": db.query(func.count(NvdCpeMatch.id)).scalar(),
+                "newest_last_modified": db.query(func.max(NvdCve.last_modified)).scalar(),
+                "sources": [
+                    {
+                        "source": state.source,
+                        "last_modified": state.last_modified,
+                        "synced_at": state.synced_at,
+                        "cve_count": state.cve_count,
+                    }
+                    for state in db.query(NvdSyncState).order_by(NvdSyncState.source).all()
+                ],
+            }
+        finally:
+            db.close()
+
+    def _sync_start(self) -> Optional[datetime]:
+        db = next(get_sync_db())
+        try:
+            state = db.get(NvdSyncState, SOURCE_API)
+            if state and state.last_modified:
+                return state.last_modified
+            return db.query(func.max(NvdCve.last_modified)).scalar()
+        finally:
+            db.close()
+
+    def _fetch_window(
+        self,
+        client: httpx.Client,
+        start: datetime,
+        end: datetime,
+        api_key: Optional[str]
+    ) -> Iterator[Dict]:
+        """分页获取一个 lastModified 窗口内的CVE对象"""
+        headers = {"apiKey": api_key} if api_key else {}
+        delay = API_PAGE_DELAY_WITH_KEY if api_key else API_PAGE_DELAY
+        start_index = 0
+
+        while True:
+            params = {
+                "lastModStartDate": start.strftime("%Y-%m-%dT%H:%M:%S.000+00:00"),
+                "lastModEndDate": end.strftime("%Y-%m-%dT%H:%M:%S.000+00:00"),
+                "resultsPerPage": API_PAGE_SIZE,
+                "startIndex": start_index,
+            }
+            response = client.get(settings.NVD_API_URL, params=params, headers=headers)
+            response.raise_for_status()
+            data = response.json()
+
+            vulnerabilities = data.get("vulnerabilities", [])
+            for vuln in vulnerabilities:
+                if vuln.get("cve"):
+                    yield vuln["cve"]
+
+            start_index += len(vulnerabilities)
+            if not vulnerabilities or start_index >= data.get("totalResults", 0):
+                break
+            time.sleep(delay)
+
+    def _upsert(self, cves: Iterable[Dict]) -> Dict[str, Any]:
+        """分批写入CVE对象，仅替换 lastModified 更新的记录"""
+        stats = {"processed": 0, "changed": 0, "last_modified": None}
+        batch: List[Dict] = []
+
+        db = next(get_sync_db())
+        try:
+            for cve in cves:
+                batch.append(cve)
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    self._write_batch(db, batch, stats)
+                    batch = []
+            if batch:
+                self._write_batch(db, batch, stats)
+        finally:
+            db.close()
+
+        if stats["changed"]:
+            self._available = True
+            with self._indexes_lock:
+                self._indexes.clear()
+        return stats
+
+    def _write_batch(self, db, cves: List[Dict], stats: Dict[str, Any]):
+        records: Dict[str, Dict[str, Any]] = {}
+        cpe_rows: Dict[str, List[Dict[str, Any]]] = {}
+
+        for cve, parsed in zip(cves, self._parser._parse_cves([{"cve": c} for c in cves])):
+            last_modified = parse_nvd_datetime(parsed["last_modified_date"])
+            if last_modified is None:
+                continue
+            cve_id = parsed["cve_id"]
+            previous = records.get(cve_id)
+            if previous and previous["last_modified"] >= last_modified:
+                continue
+            records[cve_id] = {
+                "cve_id": cve_id,
+                "description": parsed["description"],
+                "cvss_score": parsed["cvss_score"],
+                "cvss_vector": (parsed["cvss_vector"] or "")[:200],
+                "severity": parsed["severity"],
+                "vuln_status": cve.get("vulnStatus"),
+                "published": parse_nvd_datetime(parsed["published_date"]),
+                "last_modified": last_modified,
+                "references": parsed["references"],
+            }
+            cpe_rows[cve_id] = cpe_match_rows(cve_id, cve.get("configurations", []))
+            if stats["last_modified"] is None or last_modified > stats["last_modified"]:
+                stats["last_modified"] = last_modified
+
+        stats["processed"] += len(cves)
+        if not records:
+            return
+
+        stmt = pg_insert(NvdCve).values(list(records.values()))
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[NvdCve.cve_id],
+            set_={
+                "description": excluded.description,
+                "cvss_score": excluded.cvss_score,
+                "cvss_vector": excluded.cvss_vector,
+                "severity": excluded.severity,
+                "vuln_status": excluded.vuln_status,
+                "published": excluded.published,
+                "last_modified": excluded.last_modified,
+                "references": excluded.references,
+            },
+            where=NvdCve.last_modified < excluded.last_modified,
+        ).returning(NvdCve.cve_id)
+
+        try:
+            changed = db.execute(stmt).scalars().all()
+            if changed:
+                db.execute(delete(NvdCpeMatch).where(NvdCpeMatch.cve_id.in_(changed)))
+                rows = [row for cve_id in changed for row in cpe_rows[cve_id]]
+                if rows:
+                    db.execute(insert(NvdCpeMatch), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        stats["changed"] += len(changed)
+
+    def _save_state(self, source: str, stats: Dict[str, Any]):
+        db = next(get_sync_db())
+        try:
+            state = db.get(NvdSyncState, source)
+            if state is None:
+                state = NvdSyncState(source=source, cve_count=0)
+                db.add(state)
+            if stats["last_modified"] and (
+                state.last_modified is None or stats["last_modified"] > state.last_modified
+            ):
+                state.last_modified = stats["last_modified"]
+            state.cve_count = (state.cve_count or 0) + stats["changed"]
+            state.synced_at = datetime.now(timezone.utc)
+            db.commit()
+        finally:
+            db.close()
+
+
+nvd_mirror = NVDMirror()
@@ -0,0 +1,95 @@
+"""
+令牌桶限流器
+
+桶状态保存在Redis中，由Lua脚本原子地补充和扣减令牌，所有worker线程和
+进程共享同一个速率；Redis不可用时退化为进程内的令牌桶。
+
+采用预约方式: 每次请求都立即扣减一个令牌 (可以扣成负数)，并返回需要
+等待的时间，调用方等待后直接发出请求，无需重试，请求按到达顺序排队。
+"""
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]=桶, ARGV[1]=每秒补充令牌数, ARGV[2]=容量; 返回等待秒数 (字符串，避免Lua数字被截断为整数)
+_RESERVE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+local wait = 0
+if tokens < 0 then
+    wait = -tokens / rate
+end
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity / rate + wait) * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    """全局令牌桶 (Redis优先，进程内兜底)"""
+
+    def __init__(
+        self,
+        key: str,
+        rate: float,
+        period: float,
+        capacity: float = 1,
+        redis_client=None
+    ):
+        """
+        Args:
+            key: Redis键名
+            rate: 每个周期允许的请求数
+            period: 周期 (秒)
+            capacity: 桶容量，即允许的突发请求数
+            redis_client: 同步Redis客户端 (可选)
+        """
+        self.key = key
+        self.tokens_per_second = rate / period
+        self.capacity = capacity
+        self.redis = redis_client
+        self._script = None
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """扣减一个令牌，返回发出请求前需要等待的秒数"""
+        if self.redis is not None:
+            try:
+                if self._script is None:
+                    self._script = self.redis.register_script(_RESERVE_SCRIPT)
+                return float(self._script(keys=[self.key], args=[self.tokens_per_second, self.capacity]))
+            except Exception as e:
+                logger.warning(f"Redis rate limiter unavailable, using local bucket: {e}")
+        return self._reserve_local()
+
+    async def acquire(self):
+        """等待直到可以发出一个请求"""
+        if self.redis is not None:
+            # 同步Redis调用放到线程池执行，避免阻塞事件循环上的其他查询
+            wait = await asyncio.get_running_loop().run_in_executor(None, self.reserve)
+        else:
+            wait = self._reserve_local()
+        if wait > 0:
+            logger.debug(f"Rate limit {self.key}: waiting {wait:.2f}s")
+            await asyncio.sleep(wait)
+
+    def _reserve_local(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._updated) * self.tokens_per_second
+            ) - 1
+            self._updated = now
+            return -self._tokens / self.tokens_per_second if self._tokens < 0 else 0.0
@@ -0,0 +1,189 @@
+"""
+网络扫描结果缓存
+
+nmap扫描结果按 (目标, _build_nmap_args 生成的参数, 扫描模式) 缓存: 进程内LRU在前，Redis在后。
+新鲜度窗口内对同一设备重复执行相同扫描配置时直接复用结构化的主机/端口结果；
+任务参数 forceRescan 可跳过缓存。
+"""
+import hashlib
+import json
+import logging
+import shlex
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ScanResultCache:
+    """nmap扫描结果的两级缓存 (进程内LRU + 可选Redis)"""
+
+    KEY_PREFIX = "scan:nmap:"
+
+    def __init__(
+        self,
+        redis_client=None,
+        max_entries: int = 64,
+        max_age: int = 21600
+    ):
+        """
+        Args:
+            redis_client: 同步Redis客户端 (可选)
+            max_entries: 进程内LRU最大条目数
+            max_age: 新鲜度窗口 (秒)，超过后视为过期
+        """
+        self.redis = redis_client
+        self.max_entries = max_entries
+        self.max_age = max_age
+        # key -> (过期时间, JSON序列化的缓存条目)
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bypassed = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(target: str, arguments: str, mode: str = "") -> str:
+        """
+        规范化的缓存键
+
+        目标按空白/逗号拆分后排序去重 (顺序不影响结果)，参数按shell规则重新拼接。
+        mode 区分参数之外影响结果的扫描方式: 流水线模式只扫描发现阶段应答的主机
+        (且附加 -Pn)，其结果不能提供给完整扫描。
+        """
+        targets = sorted({t for t in target.replace(",", " ").split() if t})
+        canonical = f"{' '.join(targets)}|{shlex.join(shlex.split(arguments))}|{mode}"
+        return hashlib.sha1(canonical.encode()).hexdigest()
+
+    def get(self, target: str, arguments: str, mode: str = "") -> Optional[Dict[str, Any]]:
+        """
+        查询新鲜的缓存结果
+
+        Returns:
+            {result, arguments, mode, target, task_id, scan_result_id, scanned_at, age}；
+            未命中或已过期返回 None
+        """
+        key = self.make_key(target, arguments, mode)
+        now = time.time()
+
+        payload = None
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._local.move_to_end(key)
+                    self.local_hits += 1
+                    payload = entry[1]
+                else:
+                    del self._local[key]
+        if payload is not None:
+            return self._decode(payload, now)
+
+        if self.redis is not None:
+            try:
+                cached = self.redis.get(self.KEY_PREFIX + key)
+                if cached is not None:
+                    ttl = self.redis.ttl(self.KEY_PREFIX + key)
+                    if ttl and ttl > 0:
+                        self._remember(key, cached, now + ttl)
+                    with self._lock:
+                        self.redis_hits += 1
+                    return self._decode(cached, now)
+            except Exception as e:
+                self.errors += 1
+                logger.debug(f"Scan cache lookup failed: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(
+        self,
+        target: str,
+        arguments: str,
+        result: Dict[str, Any],
+        task_id: Optional[str] = None,
+        scan_result_id: Optional[str] = None,
+        mode: str = ""
+    ):
+        """缓存一次完成的扫描 (新鲜度窗口从现在开始计算)"""
+        key = self.make_key(target, arguments, mode)
+        payload = json.dumps({
+            "target": target,
+            "arguments": arguments,
+            "mode": mode,
+            "task_id": str(task_id) if task_id else None,
+            "scan_result_id": str(scan_result_id) if scan_result_id else None,
+            "scanned_at": datetime.now(timezone.utc).isoformat(),
+            "stored_at": time.time(),
+            "result": result,
+        }, default=str)
+
+        self._remember(key, payload, time.time() + self.max_age)
+        with self._lock:
+            self.stores += 1
+        if self.redis is not None:
+            try:
+                self.redis.set(self.KEY_PREFIX + key, payload, ex=self.max_age)
+            except Exception as e:
+                self.errors += 1
+                logger.debug(f"Scan cache store failed: {e}")
+
+    def record_bypass(self):
+        """记录一次被 forceRescan 跳过的查询"""
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """命中/未命中统计"""
+        with self._lock:
+            hits = self.local_hits + self.redis_hits
+            lookups = hits + self.misses
+            return {
+                "local_entries": len(self._local),
+                "max_entries": self.max_entries,
+                "redis_enabled": self.redis is not None,
+                "max_age": self.max_age,
+                "hits": hits,
+                "local_hits": self.local_hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "bypassed": self.bypassed,
+                "errors": self.errors,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    @staticmethod
+    def _decode(payload: str, now: float) -> Dict[str, Any]:
+        entry = json.loads(payload)
+        entry["age"] = int(now - entry.pop("stored_at", now))
+        return entry
+
+    def _remember(self, key: str, payload: str, expires_at: float):
+        with self._lock:
+            self._local[key] = (expires_at, payload)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+
+# 进程内所有扫描任务共用
+_default_cache = ScanResultCache(
+    max_entries=settings.SCAN_CACHE_MAX_ENTRIES,
+    max_age=settings.SCAN_CACHE_MAX_AGE
+)
+
+
+def get_scan_cache(redis_client=None) -> ScanResultCache:
+    if redis_client is not None and _default_cache.redis is None:
+        _default_cache.redis = redis_client
+    return _default_cache
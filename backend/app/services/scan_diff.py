@@ -0,0 +1,212 @@
+"""
+Nmap扫描结果对比
+
+两次扫描的结果按 (IP, 协议, 端口) 建立索引后逐项比较，时间与端口总数成线性关系:
+新开放/已关闭的端口、服务/产品/版本变化，以及新出现/消失的主机。
+扫描结果写入后不再修改，同一对扫描结果的对比结果缓存在进程内LRU中。
+"""
+import ipaddress
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import ScanResult, Task
+
+# 端口服务信息中参与比较的字段
+SERVICE_FIELDS = ("service", "product", "version", "extrainfo", "cpe")
+
+PortKey = Tuple[str, str, int]
+
+_DIFF_CACHE_MAX_ENTRIES = 256
+_diff_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_diff_cache_lock = threading.Lock()
+
+
+def is_nmap_result(scan_result: ScanResult) -> bool:
+    return (scan_result.scan_type or "").startswith("nmap_")
+
+
+def index_scan(result: Dict[str, Any]) -> Tuple[Dict[str, Dict], Dict[PortKey, Dict]]:
+    """
+    索引扫描结果
+
+    Returns:
+        (在线主机 {ip: 主机信息}, 开放端口 {(ip, 协议, 端口): 端口信息})
+    """
+    hosts: Dict[str, Dict] = {}
+    ports: Dict[PortKey, Dict] = {}
+    for host in result.get("hosts", []):
+        ip = host.get("ip")
+        if not ip or host.get("state", "up") != "up":
+            continue
+        hosts[ip] = host
+        for port in host.get("ports", []):
+            if port.get("state") == "open":
+                ports[(ip, port.get("protocol", "tcp"), int(port["port"]))] = port
+    return hosts, ports
+
+
+def _port_summary(port: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "port": port.get("port"),
+        "protocol": port.get("protocol", "tcp"),
+        **{field: port.get(field, "") for field in SERVICE_FIELDS},
+    }
+
+
+def _ip_sort_key(ip: str):
+    try:
+        address = ipaddress.ip_address(ip)
+        return (0, address.version, int(address), "")
+    except ValueError:
+        return (1, 0, 0, ip)
+
+
+def diff_scan_results(base: Dict[str, Any], target: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    对比两次nmap扫描结果 (ScanResult.result)
+
+    Args:
+        base: 较早的扫描结果
+        target: 较新的扫描结果
+
+    Returns:
+        {summary, hosts: [{ip, status, opened, closed, changed}]}，只包含有变化的主机；
+        status 为 added (新出现) / removed (消失) / changed
+    """
+    base_hosts, base_ports = index_scan(base)
+    target_hosts, target_ports = index_scan(target)
+    # 较新结果中所有状态的端口 (用于说明已关闭端口的当前状态: closed/filtered/未扫描)
+    target_states = {
+        (host.get("ip"), port.get("protocol", "tcp"), int(port["port"])): port.get("state")
+        for host in target.get("hosts", [])
+        for port in host.get("ports", [])
+    }
+
+    per_host: Dict[str, Dict[str, List]] = {}
+
+    def entry(ip: str) -> Dict[str, List]:
+        return per_host.setdefault(ip, {"opened": [], "closed": [], "changed": []})
+
+    for key, port in target_ports.items():
+        before = base_ports.get(key)
+        if before is None:
+            entry(key[0])["opened"].append(_port_summary(port))
+            continue
+        fields = [f for f in SERVICE_FIELDS if (before.get(f) or "") != (port.get(f) or "")]
+        if fields:
+            entry(key[0])["changed"].append({
+                "port": key[2],
+                "protocol": key[1],
+                "fields": fields,
+                "before": {f: before.get(f, "") for f in fields},
+                "after": {f: port.get(f, "") for f in fields},
+            })
+
+    for key, port in base_ports.items():
+        if key not in target_ports:
+            entry(key[0])["closed"].append({
+                **_port_summary(port),
+                "state_after": target_states.get(key),
+            })
+
+    hosts_added = [ip for ip in target_hosts if ip not in base_hosts]
+    hosts_removed = [ip for ip in base_hosts if ip not in target_hosts]
+    for ip in hosts_added + hosts_removed:
+        entry(ip)
+
+    hosts = []
+    for ip in sorted(per_host, key=_ip_sort_key):
+        changes = per_host[ip]
+        for name in ("opened", "closed", "changed"):
+            changes[name].sort(key=lambda p: (p["protocol"], p["port"]))
+        if ip in target_hosts and ip not in base_hosts:
+            status = "added"
+        elif ip in base_hosts and ip not in target_hosts:
+            status = "removed"
+        else:
+            status = "changed"
+        hosts.append({"ip": ip, "status": status, **changes})
+
+    return {
+        "summary": {
+            "hosts_base": len(base_hosts),
+            "hosts_target": len(target_hosts),
+            "hosts_added": len(hosts_added),
+            "hosts_removed": len(hosts_removed),
+            "hosts_changed": len(hosts),
+            "ports_opened": sum(len(h["opened"]) for h in hosts),
+            "ports_closed": sum(len(h["closed"]) for h in hosts),
+            "services_changed": sum(len(h["changed"]) for h in hosts),
+        },
+        "hosts": hosts,
+    }
+
+
+def _scan_meta(scan_result: ScanResult) -> Dict[str, Any]:
+    return {
+        "scan_result_id": str(scan_result.id),
+        "task_id": str(scan_result.task_id),
+        "scan_type": scan_result.scan_type,
+        "target": scan_result.target,
+        "created_at": scan_result.created_at.isoformat() if scan_result.created_at else None,
+    }
+
+
+def get_scan_diff(base: ScanResult, target: ScanResult) -> Dict[str, Any]:
+    """对比两条扫描结果记录 (结果按记录ID对缓存)"""
+    key = (str(base.id), str(target.id))
+    with _diff_cache_lock:
+        cached = _diff_cache.get(key)
+        if cached is not None:
+            _diff_cache.move_to_end(key)
+    if cached is not None:
+        return json.loads(cached)
+
+    diff = {
+        "base": _scan_meta(base),
+        "target": _scan_meta(target),
+        **diff_scan_results(base.result or {}, target.result or {}),
+    }
+    payload = json.dumps(diff)
+    with _diff_cache_lock:
+        _diff_cache[key] = payload
+        while len(_diff_cache) > _DIFF_CACHE_MAX_ENTRIES:
+            _diff_cache.popitem(last=False)
+    return json.loads(payload)
+
+
+async def get_scan_result(db: AsyncSession, scan_result_id: uuid.UUID) -> Optional[ScanResult]:
+    """按ID查询扫描结果记录"""
+    result = await db.execute(select(ScanResult).where(ScanResult.id == scan_result_id))
+    return result.scalar_one_or_none()
+
+
+async def latest_sample_scan_results(
+    db: AsyncSession,
+    sample_id: uuid.UUID,
+    limit: int = 2
+) -> List[ScanResult]:
+    """
+    样品所属任务最近的nmap扫描结果 (新的在前)
+
+    由扫描缓存提供的结果是较早扫描的副本，不参与对比。
+    """
+    stmt = (
+        select(ScanResult)
+        .join(Task, ScanResult.task_id == Task.id)
+        .where(
+            Task.sample_id == sample_id,
+            ScanResult.scan_type.like("nmap_%"),
+            ~ScanResult.result.has_key("cache"),
+        )
+        .order_by(ScanResult.created_at.desc())
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
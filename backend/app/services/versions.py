@@ -0,0 +1,225 @@
+"""
+版本代数
+
+版本号只解析一次，转换为可直接比较的元组键；CVE的CPE版本范围编译为
+区间索引，判断一个版本受哪些CVE影响只需几次二分查找。
+
+版本键的每一段为 (等级, 值)，等级决定不同类型片段的先后:
+    预发布 (dev < alpha < beta < pre < rc)  <  版本结束  <  字母/补丁 (1.0.2k, 7.4p1)  <  数字
+因此 1.0rc1 < 1.0 < 1.0.2 < 1.0.2k < 1.0.3，7.4 < 7.4p1 < 7.5，末尾的 .0 不影响比较 (2.4 == 2.4.0)。
+"""
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+# 片段等级
+_RANK_PRE = 0
+_RANK_END = 1
+_RANK_POST = 2
+_RANK_NUMBER = 3
+
+PRE_RELEASES = {
+    "dev": 0, "snapshot": 0,
+    "alpha": 1,
+    "beta": 2,
+    "pre": 3, "preview": 3,
+    "rc": 4, "cr": 4,
+}
+# 单字母 a/b/c 后面跟数字时是预发布 (1.0b2)，否则是字母补丁 (1.0.2b)
+_SHORT_PRE_RELEASES = {"a": 1, "b": 2, "c": 4}
+
+_TOKEN_RE = re.compile(r"\d+|[a-z]+")
+_END = (_RANK_END, 0)
+
+# 通配/不适用的CPE版本字段
+WILDCARDS = {"", "*", "-"}
+
+VersionKey = Tuple[Tuple[int, object], ...]
+
+
+@lru_cache(maxsize=65536)
+def version_key(version: str) -> VersionKey:
+    """
+    将版本号解析为可比较的元组键
+
+    Examples:
+        version_key("2.4") == version_key("v2.4.0")
+        version_key("1.0.2k") > version_key("1.0.2")
+        version_key("2.0rc1") < version_key("2.0")
+    """
+    tokens = _TOKEN_RE.findall(version.strip().lower().lstrip("v"))
+    key: List[Tuple[int, object]] = []
+    for idx, token in enumerate(tokens):
+        if token.isdigit():
+            key.append((_RANK_NUMBER, int(token)))
+            continue
+        followed_by_number = idx + 1 < len(tokens) and tokens[idx + 1].isdigit()
+        if token in PRE_RELEASES:
+            key.append((_RANK_PRE, PRE_RELEASES[token]))
+        elif token in _SHORT_PRE_RELEASES and followed_by_number:
+            key.append((_RANK_PRE, _SHORT_PRE_RELEASES[token]))
+        else:
+            key.append((_RANK_POST, token))
+
+    # 末尾的 .0 不影响比较: 去掉其后直到结尾或非数字片段都只有 0 的 0 (首段除外)
+    zero = (_RANK_NUMBER, 0)
+    normalized: List[Tuple[int, object]] = []
+    for idx, part in enumerate(key):
+        if part == zero and idx > 0:
+            following = next((p for p in key[idx + 1:] if p != zero), None)
+            if following is None or following[0] != _RANK_NUMBER:
+                continue
+        normalized.append(part)
+    normalized.append(_END)
+    return tuple(normalized)
+
+
+def compare_versions(v1: str, v2: str) -> int:
+    """比较两个版本号，返回 -1 / 0 / 1"""
+    k1, k2 = version_key(v1), version_key(v2)
+    return (k1 > k2) - (k1 < k2)
+
+
+def version_in_range(
+    version: str,
+    start_including: Optional[str] = None,
+    start_excluding: Optional[str] = None,
+    end_including: Optional[str] = None,
+    end_excluding: Optional[str] = None,
+    exact_version: Optional[str] = None
+) -> bool:
+    """版本是否落在一条CPE匹配条件内 (精确版本优先，其次范围，都没有时匹配所有版本)"""
+    key = version_key(version)
+    if exact_version not in WILDCARDS and exact_version is not None:
+        return key == version_key(exact_version)
+    if start_including and key < version_key(start_including):
+        return False
+    if start_excluding and key <= version_key(start_excluding):
+        return False
+    if end_including and key > version_key(end_including):
+        return False
+    if end_excluding and key >= version_key(end_excluding):
+        return False
+    return True
+
+
+# 区间端点在 "位置" 上编码: 查询版本 v 的位置为 (key(v), 1)，
+# 每条范围化为左闭右开区间 [进入位置, 离开位置)
+_QUERY = 1
+_INCLUSIVE_START = 1
+_EXCLUSIVE_START = 2
+_INCLUSIVE_END = 2
+_EXCLUSIVE_END = 1
+
+
+class VersionRangeIndex:
+    """
+    一个产品的CPE版本范围区间索引
+
+    add() 收集 (条目, 匹配条件)，build() 编译后 lookup(version) 返回
+    影响该版本的条目集合:
+    - 精确版本: 字典
+    - 只有上界的范围 (最常见的 "< 修复版本"): 按离开位置排序，二分取后缀
+    - 只有下界的范围: 按进入位置排序，二分取前缀
+    - 上下界都有的范围: 端点切分的基本区间及其覆盖集合，二分定位
+    - 无版本限制: 始终命中
+    """
+
+    def __init__(self):
+        self._exact: Dict[VersionKey, Set[Hashable]] = {}
+        self._any: Set[Hashable] = set()
+        self._upper: List[Tuple[tuple, Hashable]] = []
+        self._lower: List[Tuple[tuple, Hashable]] = []
+        self._bounded: List[Tuple[tuple, tuple, Hashable]] = []
+        self._upper_positions: List[tuple] = []
+        self._lower_positions: List[tuple] = []
+        self._segment_starts: List[tuple] = []
+        self._segment_items: List[frozenset] = []
+        self.size = 0
+
+    def add(
+        self,
+        item: Hashable,
+        version: Optional[str] = None,
+        start_including: Optional[str] = None,
+        start_excluding: Optional[str] = None,
+        end_including: Optional[str] = None,
+        end_excluding: Optional[str] = None
+    ):
+        """加入一条匹配条件 (参数同NVD cpeMatch字段)"""
+        self.size += 1
+        if version not in WILDCARDS and version is not None:
+            self._exact.setdefault(version_key(version), set()).add(item)
+            return
+
+        enter = None
+        if start_including:
+            enter = (version_key(start_including), _INCLUSIVE_START)
+        elif start_excluding:
+            enter = (version_key(start_excluding), _EXCLUSIVE_START)
+        leave = None
+        if end_including:
+            leave = (version_key(end_including), _INCLUSIVE_END)
+        elif end_excluding:
+            leave = (version_key(end_excluding), _EXCLUSIVE_END)
+
+        if enter is None and leave is None:
+            self._any.add(item)
+        elif enter is None:
+            self._upper.append((leave, item))
+        elif leave is None:
+            self._lower.append((enter, item))
+        elif enter < leave:
+            self._bounded.append((enter, leave, item))
+
+    def build(self) -> "VersionRangeIndex":
+        """编译索引，返回自身"""
+        self._upper.sort(key=lambda e: e[0])
+        self._lower.sort(key=lambda e: e[0])
+        self._upper_positions = [position for position, _ in self._upper]
+        self._lower_positions = [position for position, _ in self._lower]
+
+        # 基本区间扫描: 每个端点处更新覆盖集合
+        events: Dict[tuple, List[Tuple[int, Hashable]]] = {}
+        for enter, leave, item in self._bounded:
+            events.setdefault(enter, []).append((1, item))
+            events.setdefault(leave, []).append((-1, item))
+        active: Dict[Hashable, int] = {}
+        self._segment_starts = []
+        self._segment_items = []
+        for position in sorted(events):
+            for delta, item in events[position]:
+                count = active.get(item, 0) + delta
+                if count:
+                    active[item] = count
+                else:
+                    active.pop(item, None)
+            self._segment_starts.append(position)
+            self._segment_items.append(frozenset(active))
+        return self
+
+    def lookup(self, version: Optional[str]) -> Set[Hashable]:
+        """影响该版本的全部条目；无版本信息时返回全部条目"""
+        if not version or not version.strip():
+            return self.items()
+
+        key = version_key(version)
+        point = (key, _QUERY)
+        found = set(self._any)
+        found.update(self._exact.get(key, ()))
+        found.update(item for _, item in self._upper[bisect_right(self._upper_positions, point):])
+        found.update(item for _, item in self._lower[:bisect_right(self._lower_positions, point)])
+        segment = bisect_right(self._segment_starts, point) - 1
+        if segment >= 0:
+            found.update(self._segment_items[segment])
+        return found
+
+    def items(self) -> Set[Hashable]:
+        found = set(self._any)
+        for items in self._exact.values():
+            found.update(items)
+        found.update(item for _, item in self._upper)
+        found.update(item for _, item in self._lower)
+        found.update(item for _, _, item in self._bounded)
+        return found
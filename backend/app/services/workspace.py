@@ -0,0 +1,406 @@
+"""
+Firmware workspace lifecycle management
+
+Allocates per-task directories for extracted firmware trees and uploads,
+enforces global and per-workspace byte/inode quotas, and evicts completed
+workspaces by age and least-recent use. Workspaces pinned by a running task
+(e.g. the upload it is analysing) are never evicted.
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, List
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+KIND_EXTRACT = 'extract'
+KIND_UPLOAD = 'upload'
+
+STATE_ACTIVE = 'active'
+STATE_COMPLETED = 'completed'
+
+META_FILE = '.workspace.json'
+
+
+class WorkspaceQuotaExceeded(Exception):
+    """Raised when a workspace cannot be allocated within the disk quotas"""
+
+
+class Workspace:
+    """A single task or upload directory and its accounting"""
+
+    def __init__(
+        self,
+        kind: str,
+        key: str,
+        path: Path,
+        reserved_bytes: int,
+        reserved_inodes: int,
+        state: str = STATE_ACTIVE,
+        created_at: Optional[float] = None,
+        last_used: Optional[float] = None,
+        bytes_used: int = 0,
+        inodes_used: int = 0
+    ):
+        now = time.time()
+        self.kind = kind
+        self.key = key
+        self.path = path
+        self.reserved_bytes = reserved_bytes
+        self.reserved_inodes = reserved_inodes
+        self.state = state
+        self.created_at = created_at or now
+        self.last_used = last_used or now
+        self.bytes_used = bytes_used
+        self.inodes_used = inodes_used
+
+    @property
+    def charged_bytes(self) -> int:
+        """Bytes counted against the global quota (reservation while active)"""
+        return self.reserved_bytes if self.state == STATE_ACTIVE else self.bytes_used
+
+    @property
+    def charged_inodes(self) -> int:
+        return self.reserved_inodes if self.state == STATE_ACTIVE else self.inodes_used
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'kind': self.kind,
+            'key': self.key,
+            'path': str(self.path),
+            'state': self.state,
+            'created_at': self.created_at,
+            'last_used': self.last_used,
+            'reserved_bytes': self.reserved_bytes,
+            'reserved_inodes': self.reserved_inodes,
+            'bytes_used': self.bytes_used,
+            'inodes_used': self.inodes_used
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], path: Path) -> 'Workspace':
+        return cls(
+            data['kind'],
+            data['key'],
+            path,
+            data.get('reserved_bytes', 0),
+            data.get('reserved_inodes', 0),
+            state=data.get('state', STATE_COMPLETED),
+            created_at=data.get('created_at'),
+            last_used=data.get('last_used'),
+            bytes_used=data.get('bytes_used', 0),
+            inodes_used=data.get('inodes_used', 0)
+        )
+
+
+class WorkspaceManager:
+    """
+    Per-task workspace allocator with quotas and eviction
+
+    Active workspaces are charged their full reservation; completed ones are
+    charged their measured size and become candidates for eviction unless a
+    running task has pinned them. State is kept in a small metadata file
+    inside each workspace so it survives restarts; pins are per-process.
+    """
+
+    def __init__(
+        self,
+        extract_dir: str = settings.FIRMWARE_EXTRACT_DIR,
+        upload_dir: str = settings.FIRMWARE_UPLOAD_DIR,
+        max_bytes: int = settings.FIRMWARE_WORKSPACE_MAX_MB * 1024 * 1024,
+        max_inodes: int = settings.FIRMWARE_WORKSPACE_MAX_INODES,
+        task_max_bytes: int = settings.FIRMWARE_TASK_MAX_MB * 1024 * 1024,
+        task_max_inodes: int = settings.FIRMWARE_TASK_MAX_INODES,
+        extract_retention: float = settings.FIRMWARE_EXTRACT_RETENTION_HOURS * 3600,
+        upload_retention: float = settings.FIRMWARE_UPLOAD_RETENTION_HOURS * 3600,
+        max_cached_extractions: int = settings.FIRMWARE_MAX_CACHED_EXTRACTIONS
+    ):
+        self.roots = {KIND_EXTRACT: Path(extract_dir), KIND_UPLOAD: Path(upload_dir)}
+        self.max_bytes = max_bytes
+        self.max_inodes = max_inodes
+        self.task_max_bytes = task_max_bytes
+        self.task_max_inodes = task_max_inodes
+        self.retention = {KIND_EXTRACT: extract_retention, KIND_UPLOAD: upload_retention}
+        self.max_cached_extractions = max_cached_extractions
+
+        self.evictions = 0
+        self.bytes_evicted = 0
+        self.quota_rejections = 0
+
+        self._workspaces: Dict[Tuple[str, str], Workspace] = {}
+        self._pins: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def allocate(
+        self,
+        kind: str,
+        key: str,
+        reserve_bytes: Optional[int] = None,
+        reserve_inodes: Optional[int] = None
+    ) -> Workspace:
+        """
+        Allocate (or reset) the workspace for a task or upload
+
+        Args:
+            kind: 'extract' or 'upload'
+            key: Task ID or upload ID
+            reserve_bytes: Bytes to reserve (default: per-task quota)
+            reserve_inodes: Inodes to reserve (default: per-task quota)
+
+        Raises:
+            WorkspaceQuotaExceeded: The reservation does not fit even after eviction
+        """
+        reserve_bytes = min(reserve_bytes or self.task_max_bytes, self.task_max_bytes)
+        reserve_inodes = min(reserve_inodes or self.task_max_inodes, self.task_max_inodes)
+
+        with self._lock:
+            self._ensure_loaded()
+            existing = self._workspaces.pop((kind, key), None)
+            if existing:
+                shutil.rmtree(existing.path, ignore_errors=True)
+
+            self._make_room(reserve_bytes, reserve_inodes)
+
+            path = self.roots[kind] / key
+            path.mkdir(parents=True, exist_ok=True)
+            workspace = Workspace(kind, key, path, reserve_bytes, reserve_inodes)
+            self._workspaces[(kind, key)] = workspace
+            self._save(workspace)
+            return workspace
+
+    def release(self, kind: str, key: str) -> Optional[Workspace]:
+        """Mark a workspace completed, record its real usage and apply retention"""
+        with self._lock:
+            self._ensure_loaded()
+            workspace = self._workspaces.get((kind, key))
+            if workspace is None:
+                return None
+            workspace.bytes_used, workspace.inodes_used = measure(workspace.path)
+            workspace.state = STATE_COMPLETED
+            workspace.last_used = time.time()
+            self._save(workspace)
+            self._apply_retention()
+            return workspace
+
+    def touch(self, kind: str, key: str) -> Optional[Workspace]:
+        """Record a use of a completed workspace (keeps it at the LRU tail)"""
+        with self._lock:
+            self._ensure_loaded()
+            workspace = self._workspaces.get((kind, key))
+            if workspace is not None and workspace.path.exists():
+                workspace.last_used = time.time()
+                self._save(workspace)
+                return workspace
+            return None
+
+    def touch_path(self, file_path: str) -> Optional[Workspace]:
+        """touch() the workspace that contains file_path, if any"""
+        located = self._locate(file_path)
+        return self.touch(*located) if located else None
+
+    def pin(self, kind: str, key: str) -> Optional[Workspace]:
+        """Protect a workspace from eviction until the matching unpin()"""
+        with self._lock:
+            workspace = self.touch(kind, key)
+            if workspace is not None:
+                self._pins[(kind, key)] = self._pins.get((kind, key), 0) + 1
+            return workspace
+
+    def unpin(self, kind: str, key: str):
+        """Drop one pin; the workspace is evictable again once none are left"""
+        with self._lock:
+            pins = self._pins.pop((kind, key), 0) - 1
+            if pins > 0:
+                self._pins[(kind, key)] = pins
+            self.touch(kind, key)
+
+    def pin_path(self, file_path: str) -> Optional[Workspace]:
+        """pin() the workspace that contains file_path, if any"""
+        located = self._locate(file_path)
+        return self.pin(*located) if located else None
+
+    def unpin_path(self, file_path: str):
+        """unpin() the workspace that contains file_path, if any"""
+        located = self._locate(file_path)
+        if located:
+            self.unpin(*located)
+
+    def remove(self, kind: str, key: str):
+        """Delete a workspace immediately"""
+        with self._lock:
+            self._ensure_loaded()
+            workspace = self._workspaces.get((kind, key))
+            if workspace is not None:
+                self._evict(workspace)
+
+    def evict_expired(self) -> int:
+        """Apply the retention policy now; returns the number of evicted workspaces"""
+        with self._lock:
+            self._ensure_loaded()
+            before = self.evictions
+            self._apply_retention()
+            return self.evictions - before
+
+    def usage(self) -> Dict[str, Any]:
+        """Current usage and quota metrics"""
+        with self._lock:
+            self._ensure_loaded()
+            by_kind: Dict[str, Dict[str, int]] = {}
+            for workspace in self._workspaces.values():
+                stats = by_kind.setdefault(workspace.kind, {
+                    'active': 0, 'completed': 0, 'bytes': 0, 'inodes': 0
+                })
+                stats[workspace.state] += 1
+                stats['bytes'] += workspace.charged_bytes
+                stats['inodes'] += workspace.charged_inodes
+
+            used_bytes, used_inodes = self._charged()
+            return {
+                'bytes_used': used_bytes,
+                'inodes_used': used_inodes,
+                'max_bytes': self.max_bytes,
+                'max_inodes': self.max_inodes,
+                'bytes_utilization': round(used_bytes / self.max_bytes, 4) if self.max_bytes else 0,
+                'inodes_utilization': round(used_inodes / self.max_inodes, 4) if self.max_inodes else 0,
+                'task_max_bytes': self.task_max_bytes,
+                'task_max_inodes': self.task_max_inodes,
+                'workspaces': by_kind,
+                'pinned': len(self._pins),
+                'evictions': self.evictions,
+                'bytes_evicted': self.bytes_evicted,
+                'quota_rejections': self.quota_rejections
+            }
+
+    def _charged(self) -> Tuple[int, int]:
+        total_bytes = total_inodes = 0
+        for workspace in self._workspaces.values():
+            total_bytes += workspace.charged_bytes
+            total_inodes += workspace.charged_inodes
+        return total_bytes, total_inodes
+
+    def _make_room(self, reserve_bytes: int, reserve_inodes: int):
+        """Evict completed workspaces, least recently used first, until the reservation fits"""
+        self._apply_retention()
+        used_bytes, used_inodes = self._charged()
+        if used_bytes + reserve_bytes <= self.max_bytes and used_inodes + reserve_inodes <= self.max_inodes:
+            return
+
+        for workspace in self._lru_completed():
+            self._evict(workspace)
+            used_bytes, used_inodes = self._charged()
+            if used_bytes + reserve_bytes <= self.max_bytes and used_inodes + reserve_inodes <= self.max_inodes:
+                return
+
+        self.quota_rejections += 1
+        raise WorkspaceQuotaExceeded(
+            f"Firmware workspace quota exhausted: {used_bytes} of {self.max_bytes} bytes and "
+            f"{used_inodes} of {self.max_inodes} inodes in use, {reserve_bytes} bytes requested"
+        )
+
+    def _apply_retention(self):
+        """Evict completed workspaces past their age limit and extractions beyond the cache size"""
+        now = time.time()
+        for workspace in self._lru_completed():
+            if now - workspace.last_used > self.retention[workspace.kind]:
+                self._evict(workspace)
+
+        extractions = [w for w in self._lru_completed() if w.kind == KIND_EXTRACT]
+        for workspace in extractions[:max(0, len(extractions) - self.max_cached_extractions)]:
+            self._evict(workspace)
+
+    def _lru_completed(self) -> List[Workspace]:
+        """Eviction candidates: completed and not pinned, least recently used first"""
+        return sorted(
+            (
+                w for w in self._workspaces.values()
+                if w.state == STATE_COMPLETED and (w.kind, w.key) not in self._pins
+            ),
+            key=lambda w: w.last_used
+        )
+
+    def _locate(self, file_path: str) -> Optional[Tuple[str, str]]:
+        """(kind, key) of the workspace that contains file_path"""
+        path = Path(file_path)
+        for kind, root in self.roots.items():
+            try:
+                relative = path.relative_to(root)
+            except ValueError:
+                continue
+            if relative.parts:
+                return kind, relative.parts[0]
+        return None
+
+    def _evict(self, workspace: Workspace):
+        logger.info(
+            f"Evicting {workspace.kind} workspace {workspace.key} "
+            f"({workspace.bytes_used} bytes, idle {time.time() - workspace.last_used:.0f}s)"
+        )
+        shutil.rmtree(workspace.path, ignore_errors=True)
+        self._workspaces.pop((workspace.kind, workspace.key), None)
+        self.evictions += 1
+        self.bytes_evicted += workspace.bytes_used
+
+    def _save(self, workspace: Workspace):
+        meta_path = workspace.path / META_FILE
+        tmp_path = meta_path.with_suffix('.tmp')
+        try:
+            tmp_path.write_text(json.dumps(workspace.to_dict()))
+            os.replace(tmp_path, meta_path)
+        except OSError as e:
+            logger.warning(f"Could not persist workspace metadata for {workspace.key}: {e}")
+
+    def _ensure_loaded(self):
+        """Pick up workspaces left on disk by earlier runs"""
+        if self._loaded:
+            return
+        self._loaded = True
+        for kind, root in self.roots.items():
+            if not root.is_dir():
+                continue
+            for path in sorted(root.iterdir()):
+                if not path.is_dir() or path.is_symlink():
+                    continue
+                workspace = self._load_workspace(kind, path)
+                self._workspaces[(kind, workspace.key)] = workspace
+
+    def _load_workspace(self, kind: str, path: Path) -> Workspace:
+        try:
+            data = json.loads((path / META_FILE).read_text())
+            workspace = Workspace.from_dict(data, path)
+        except (OSError, ValueError, KeyError):
+            # Left behind before the manager existed
+            mtime = path.stat().st_mtime
+            workspace = Workspace(kind, path.name, path, 0, 0, created_at=mtime, last_used=mtime)
+        if workspace.state == STATE_ACTIVE:
+            # The process that owned it is gone
+            workspace.state = STATE_COMPLETED
+        if not workspace.bytes_used:
+            workspace.bytes_used, workspace.inodes_used = measure(path)
+        return workspace
+
+
+def measure(path: Path) -> Tuple[int, int]:
+    """Return (bytes, inodes) used by a directory tree without following symlinks"""
+    total_bytes = 0
+    inodes = 0
+    for root, dirs, files in os.walk(path):
+        inodes += len(dirs)
+        for name in files:
+            if name == META_FILE:
+                continue
+            inodes += 1
+            try:
+                total_bytes += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total_bytes, inodes
+
+
+workspace_manager = WorkspaceManager()
@@ -0,0 +1,43 @@
+"""
+Firmware analysis building blocks used by firmware_worker
+"""
+
+from .extractors import (
+    EncryptedImage,
+    ExtractionBudget,
+    ExtractionLimitExceeded,
+    ExtractedMember,
+    FirmwareExtractor,
+    detect_format,
+    detect_filesystem_type,
+)
+from .detectors import MemberScanner
+from .profiles import AnalysisBudget, prioritised_files
+from .streaming import StreamingAnalyzer, iter_archive_members
+from .components import ComponentScanner, build_cyclonedx_sbom, fingerprint_components
+from .entropy import compute_entropy_profile, data_regions
+from .elf import ElfResultCache, build_elf_inventory, get_elf_cache, parse_elf
+
+__all__ = [
+    'EncryptedImage',
+    'ExtractionBudget',
+    'ExtractionLimitExceeded',
+    'ExtractedMember',
+    'FirmwareExtractor',
+    'detect_format',
+    'detect_filesystem_type',
+    'MemberScanner',
+    'AnalysisBudget',
+    'prioritised_files',
+    'StreamingAnalyzer',
+    'iter_archive_members',
+    'ComponentScanner',
+    'build_cyclonedx_sbom',
+    'fingerprint_components',
+    'compute_entropy_profile',
+    'data_regions',
+    'ElfResultCache',
+    'build_elf_inventory',
+    'get_elf_cache',
+    'parse_elf',
+]
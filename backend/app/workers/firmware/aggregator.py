@@ -0,0 +1,187 @@
+"""
+Findings Aggregation
+
+Streaming, bounded top-K aggregation of firmware findings. Each category
+keeps a fixed-size Space-Saving table of candidates ranked by severity, then
+frequency, then key, so memory stays flat on noisy images and the surviving
+items do not depend on set hashing. Total counts per category are exact;
+per-key counts are upper bounds whose overestimate is tracked (see TopK).
+"""
+import heapq
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+SEVERITY_RANK = {
+    'CRITICAL': 4,
+    'HIGH': 3,
+    'MEDIUM': 2,
+    'LOW': 1,
+    'INFO': 0,
+}
+
+
+class TopK:
+    """
+    Bounded top-K tracker for a single category (Space-Saving)
+
+    Holds at most `capacity` candidates. A new key arriving at a full table
+    replaces the lowest ranked candidate (lowest severity, then lowest count)
+    and inherits its count as error: the reported count c of a key with
+    error e means the key occurred between c - e and c times. The error is
+    at most the smallest count at the lowest severity held, so a frequent
+    key cannot be pushed out by a stream of one-off keys. A newcomer ranked
+    below every candidate of a full table is only counted in `total`.
+    """
+
+    def __init__(
+        self,
+        k: int,
+        capacity: Optional[int] = None,
+        merge: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None
+    ):
+        """
+        Args:
+            k: Number of items reported by top()
+            capacity: Number of candidates tracked (default 8*k, at least 128)
+            merge: Optional merge(existing_item, new_item) for repeated keys
+        """
+        self.k = k
+        self.capacity = capacity or max(8 * k, 128)
+        self.merge = merge
+        self.total = 0
+        self.evicted = 0
+        # key -> [count, severity_rank, item, error, seq]
+        self._entries: Dict[Any, list] = {}
+        # Lazy min-heap of (severity_rank, count, seq, key); stale once the
+        # entry's count or rank moved on, skipped when popped
+        self._heap: List[Tuple[int, int, int, Any]] = []
+        self._seq = 0
+
+    def __len__(self) -> int:
+        """Number of candidates currently tracked"""
+        return len(self._entries)
+
+    def add(self, key: Any, item: Any = None, severity: str = 'INFO'):
+        """Record one occurrence of key"""
+        self.total += 1
+        rank = SEVERITY_RANK.get(str(severity).upper(), 0)
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            entry[0] += 1
+            if rank > entry[1]:
+                entry[1] = rank
+            if self.merge and item is not None:
+                self.merge(entry[2], item)
+            self._push(key, entry)
+            return
+
+        count = error = 0
+        if len(self._entries) >= self.capacity:
+            victim_key, victim = self._min_entry()
+            self.evicted += 1
+            if rank < victim[1]:
+                # Ranks below every candidate, it could never be reported
+                return
+            # Space-Saving: the newcomer may have been counted as the victim
+            del self._entries[victim_key]
+            count = error = victim[0]
+        self._seq += 1
+        entry = self._entries[key] = [count + 1, rank, item, error, self._seq]
+        self._push(key, entry)
+
+    def top(self) -> List[Tuple[Any, int, Any]]:
+        """Return the top k as (key, count, item), best first"""
+        return [
+            (key, entry[0], entry[2])
+            for key, entry in sorted(self._entries.items(), key=self._rank)[:self.k]
+        ]
+
+    def error(self, key: Any) -> int:
+        """Maximum overestimate of key's reported count (0 if exact or untracked)"""
+        entry = self._entries.get(key)
+        return entry[3] if entry is not None else 0
+
+    @property
+    def max_error(self) -> int:
+        """Largest overestimate among the reported top k"""
+        return max((self.error(key) for key, _, _ in self.top()), default=0)
+
+    @property
+    def truncated(self) -> bool:
+        return self.evicted > 0 or len(self._entries) > self.k
+
+    @property
+    def counts_exact(self) -> bool:
+        """Whether every reported count is the key's true number of occurrences"""
+        return self.max_error == 0
+
+    def _push(self, key: Any, entry: list):
+        heapq.heappush(self._heap, (entry[1], entry[0], entry[4], key))
+        if len(self._heap) > 4 * self.capacity:
+            # Drop stale heap records
+            self._heap = [(e[1], e[0], e[4], k) for k, e in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _min_entry(self) -> Tuple[Any, list]:
+        """The lowest ranked (key, entry), dropping stale heap records on the way"""
+        while True:
+            rank, count, seq, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry[4] == seq and entry[0] == count and entry[1] == rank:
+                return key, entry
+            heapq.heappop(self._heap)
+
+    @staticmethod
+    def _rank(kv):
+        key, (count, rank, _, _, _) = kv
+        return (-rank, -count, key)
+
+
+class FindingsAggregator:
+    """Per-category TopK tables with exact totals and error-bounded per-key counts"""
+
+    def __init__(
+        self,
+        k: int,
+        merge: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None
+    ):
+        self.k = k
+        self.merge = merge
+        self.categories: Dict[str, TopK] = {}
+
+    def add(self, category: str, key: Any, item: Any = None, severity: str = 'INFO'):
+        table = self.categories.get(category)
+        if table is None:
+            table = self.categories[category] = TopK(self.k, merge=self.merge)
+        table.add(key, item, severity)
+
+    def top(self, category: str) -> List[Tuple[Any, int, Any]]:
+        table = self.categories.get(category)
+        return table.top() if table else []
+
+    def error(self, category: str, key: Any) -> int:
+        table = self.categories.get(category)
+        return table.error(key) if table else 0
+
+    def totals(self) -> Dict[str, Dict[str, Any]]:
+        """Exact occurrence counts per category and the error bound of the per-key counts"""
+        return {
+            category: {
+                'total': table.total,
+                'reported': min(table.k, len(table)),
+                'truncated': table.truncated,
+                'counts_exact': table.counts_exact,
+                'max_count_error': table.max_error
+            }
+            for category, table in sorted(self.categories.items())
+        }
+
+
+def merge_finding_files(existing: Dict[str, Any], new: Dict[str, Any], max_files: int = 5):
+    """Merge a repeated finding, keeping a small sorted sample of the files it was seen in"""
+    files = existing.setdefault('files', [existing['file']])
+    if new['file'] not in files:
+        files.append(new['file'])
+        files.sort()
+        del files[max_files:]
+    existing['file'] = files[0]
@@ -0,0 +1,311 @@
+"""
+Component Fingerprinting
+
+Identifies software components and versions in an extracted firmware tree
+from a precompiled signature set (version strings, package DB files and
+shared-object names) and emits a CycloneDX SBOM.
+"""
+import re
+import mmap
+import uuid
+import logging
+from datetime import datetime, timezone
+from pathlib import Path, PurePosixPath
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+from .detectors import iter_files
+
+logger = logging.getLogger(__name__)
+
+# name -> (vendor, product, component type); vendor/product follow NVD CPE naming
+COMPONENTS = {
+    'busybox': ('busybox', 'busybox', 'application'),
+    'openssl': ('openssl', 'openssl', 'library'),
+    'dropbear': ('dropbear_ssh_project', 'dropbear_ssh', 'application'),
+    'openssh': ('openbsd', 'openssh', 'application'),
+    'curl': ('haxx', 'libcurl', 'library'),
+    'linux_kernel': ('linux', 'linux_kernel', 'operating-system'),
+    'lighttpd': ('lighttpd', 'lighttpd', 'application'),
+    'nginx': ('f5', 'nginx', 'application'),
+    'dnsmasq': ('thekelleys', 'dnsmasq', 'application'),
+    'uclibc': ('uclibc', 'uclibc', 'library'),
+    'glibc': ('gnu', 'glibc', 'library'),
+    'hostapd': ('w1.fi', 'hostapd', 'application'),
+    'wpa_supplicant': ('w1.fi', 'wpa_supplicant', 'application'),
+    'miniupnpd': ('miniupnp_project', 'miniupnpd', 'application'),
+    'zlib': ('zlib', 'zlib', 'library'),
+    'sqlite': ('sqlite', 'sqlite', 'library'),
+    'samba': ('samba', 'samba', 'application'),
+    'mbedtls': ('arm', 'mbed_tls', 'library'),
+    'wolfssl': ('wolfssl', 'wolfssl', 'library'),
+    'libupnp': ('libupnp_project', 'libupnp', 'library'),
+}
+
+# (component, prefix regex, version regex) - compiled into a single scanner
+VERSION_SIGNATURES = [
+    ('busybox', rb'BusyBox v', rb'\d+\.\d+(?:\.\d+)?'),
+    ('openssl', rb'OpenSSL ', rb'\d+\.\d+\.\d+[a-z]{0,2}'),
+    ('dropbear', rb'[Dd]ropbear(?:_| SSH server v| v)', rb'20\d\d\.\d+'),
+    ('openssh', rb'OpenSSH_', rb'\d+\.\d+(?:p\d+)?'),
+    ('curl', rb'libcurl/', rb'\d+\.\d+\.\d+'),
+    ('linux_kernel', rb'Linux version ', rb'\d+\.\d+(?:\.\d+)?'),
+    ('lighttpd', rb'lighttpd/', rb'\d+\.\d+\.\d+'),
+    ('nginx', rb'nginx/', rb'\d+\.\d+\.\d+'),
+    ('dnsmasq', rb'dnsmasq-', rb'\d+\.\d+'),
+    ('uclibc', rb'uClibc(?:-ng)? ', rb'\d+\.\d+\.\d+'),
+    ('glibc', rb'GNU C Library [^\n\x00]{0,60}?version ', rb'\d+\.\d+'),
+    ('hostapd', rb'hostapd v', rb'\d+\.\d+'),
+    ('wpa_supplicant', rb'wpa_supplicant v', rb'\d+\.\d+'),
+    ('miniupnpd', rb'miniupnpd/', rb'\d+\.\d+'),
+    ('zlib', rb'(?:deflate|inflate) ', rb'1\.\d+\.\d+(?:\.\d+)?(?= Copyright)'),
+    ('sqlite', rb'SQLite version ', rb'3\.\d+\.\d+'),
+    ('samba', rb'Samba ', rb'[34]\.\d+\.\d+'),
+    ('mbedtls', rb'(?:mbed TLS|Mbed TLS) ', rb'\d+\.\d+\.\d+'),
+    ('wolfssl', rb'wolfSSL ', rb'\d+\.\d+\.\d+'),
+    ('libupnp', rb'Portable SDK for UPnP devices/', rb'\d+\.\d+\.\d+'),
+]
+
+VERSION_SCANNER = re.compile(b'|'.join(
+    b'(?:' + prefix + b'(?P<v' + str(idx).encode() + b'>' + version + b'))'
+    for idx, (_, prefix, version) in enumerate(VERSION_SIGNATURES)
+))
+_GROUP_COMPONENT = {f'v{idx}': name for idx, (name, _, _) in enumerate(VERSION_SIGNATURES)}
+
+# Shared objects whose file name carries the upstream version (ABI-only
+# sonames such as libssl.so.1.0.0 are left to the version strings)
+SONAME_SIGNATURES = [
+    ('zlib', re.compile(r'^libz\.so\.(\d+\.\d+\.\d+(?:\.\d+)?)$')),
+    ('uclibc', re.compile(r'^libuClibc-(\d+\.\d+\.\d+(?:\.\d+)?)\.so$')),
+    ('glibc', re.compile(r'^libc-(\d+\.\d+)\.so$')),
+    ('sqlite', re.compile(r'^libsqlite3-(3\.\d+\.\d+)\.so$')),
+]
+
+# Package databases (opkg/ipkg/dpkg)
+PACKAGE_DB_FILES = ('lib/opkg/status', 'lib/ipkg/status', 'lib/dpkg/status')
+PACKAGE_CONTROL_GLOB = '*/opkg/info/*.control'
+PACKAGE_ALIASES = {
+    'libopenssl': 'openssl',
+    'libopenssl1.1': 'openssl',
+    'libcurl': 'curl',
+    'libcurl4': 'curl',
+    'dropbear': 'dropbear',
+    'busybox': 'busybox',
+    'dnsmasq': 'dnsmasq',
+    'dnsmasq-full': 'dnsmasq',
+    'lighttpd': 'lighttpd',
+    'nginx': 'nginx',
+    'hostapd': 'hostapd',
+    'wpad': 'hostapd',
+    'wpa-supplicant': 'wpa_supplicant',
+    'miniupnpd': 'miniupnpd',
+    'zlib': 'zlib',
+    'libsqlite3': 'sqlite',
+    'samba36-server': 'samba',
+    'libmbedtls': 'mbedtls',
+    'libwolfssl': 'wolfssl',
+    'openssh-server': 'openssh',
+}
+PACKAGE_VERSION_RE = re.compile(r'^(\d+(?:\.\d+)+[a-z]?(?:p\d+)?)')
+
+# Files larger than this are not searched for version strings
+MAX_FINGERPRINT_FILE_SIZE = 64 * 1024 * 1024
+MAX_EVIDENCE = 5
+
+
+class ComponentScanner:
+    """
+    Single-pass component fingerprinting
+
+    Files are fed one at a time with the same scan(rel_path, size, read_content)
+    interface as MemberScanner, so it works over an extracted tree or a stream.
+    Once should_stop returns True only the shared-object names are still
+    matched and the files are counted as skipped.
+    """
+
+    def __init__(self, should_stop: Optional[Callable[[], bool]] = None):
+        # (name, version) -> component record
+        self._components: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.should_stop = should_stop
+        self.files_scanned = 0
+        self.files_skipped = 0
+
+    def scan(self, rel_path: str, size: int, read_content) -> None:
+        self.files_scanned += 1
+        self._match_soname(rel_path)
+
+        if self.should_stop and self.should_stop():
+            self.files_skipped += 1
+            return
+
+        if self._is_package_db(rel_path):
+            content = read_content()
+            for component, version in parse_package_db(content.decode('utf-8', errors='ignore')):
+                self._record(component, version, rel_path, 'package_db')
+            return
+
+        if 0 < size <= MAX_FINGERPRINT_FILE_SIZE:
+            self.scan_bytes(rel_path, read_content())
+
+    def scan_bytes(self, rel_path: str, content) -> None:
+        """Search a buffer (bytes or mmap) for version strings"""
+        seen = set()
+        for match in VERSION_SCANNER.finditer(content):
+            component = _GROUP_COMPONENT[match.lastgroup]
+            version = match.group(match.lastgroup).decode('ascii', errors='ignore')
+            if (component, version) not in seen:
+                seen.add((component, version))
+                self._record(component, version, rel_path, 'version_string')
+
+    def scan_file(self, root: str, file_path: Path) -> None:
+        """Scan a file on disk, memory-mapping it instead of reading it whole"""
+        rel_path = str(file_path.relative_to(root))
+        size = file_path.stat().st_size
+        if self._is_package_db(rel_path) or size == 0 or size > MAX_FINGERPRINT_FILE_SIZE:
+            self.scan(rel_path, size, file_path.read_bytes)
+            return
+        self.files_scanned += 1
+        self._match_soname(rel_path)
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            self.scan_bytes(rel_path, mm)
+
+    def _match_soname(self, rel_path: str):
+        name = PurePosixPath(rel_path).name
+        for component, regex in SONAME_SIGNATURES:
+            match = regex.match(name)
+            if match:
+                self._record(component, match.group(1), rel_path, 'soname')
+
+    @staticmethod
+    def _is_package_db(rel_path: str) -> bool:
+        path = PurePosixPath(rel_path)
+        return any(str(path).endswith(db) for db in PACKAGE_DB_FILES) \
+            or path.match(PACKAGE_CONTROL_GLOB)
+
+    def _record(self, component: str, version: str, rel_path: str, source: str):
+        key = (component, version)
+        record = self._components.get(key)
+        if record is None:
+            vendor, product, comp_type = COMPONENTS[component]
+            record = self._components[key] = {
+                'name': component,
+                'version': version,
+                'vendor': vendor,
+                'product': product,
+                'type': comp_type,
+                'cpe': f"cpe:2.3:{'o' if comp_type == 'operating-system' else 'a'}:{vendor}:{product}:{version}:*:*:*:*:*:*:*",
+                'purl': f"pkg:generic/{component}@{version}",
+                'evidence': [],
+                'occurrences': 0
+            }
+        record['occurrences'] += 1
+        if len(record['evidence']) < MAX_EVIDENCE:
+            record['evidence'].append({'file': rel_path, 'source': source})
+
+    def components(self) -> List[Dict[str, Any]]:
+        """Identified components, sorted by name and version"""
+        return [self._components[key] for key in sorted(self._components)]
+
+    def coverage(self) -> Dict[str, Any]:
+        """How many of the files fed in had their contents fingerprinted"""
+        return {
+            'files_seen': self.files_scanned,
+            'files_fingerprinted': self.files_scanned - self.files_skipped,
+            'files_skipped': self.files_skipped,
+            'partial': bool(self.files_skipped)
+        }
+
+
+def parse_package_db(text: str) -> List[Tuple[str, str]]:
+    """Extract (component, version) pairs from opkg/dpkg status or control files"""
+    pairs = []
+    for stanza in re.split(r'\n\s*\n', text):
+        fields = {}
+        for line in stanza.splitlines():
+            if ':' in line and not line.startswith(' '):
+                key, _, value = line.partition(':')
+                fields[key.strip().lower()] = value.strip()
+        component = PACKAGE_ALIASES.get(fields.get('package', ''))
+        version = PACKAGE_VERSION_RE.match(fields.get('version', ''))
+        if component and version:
+            pairs.append((component, version.group(1)))
+    return pairs
+
+
+def fingerprint_components(
+    root: str,
+    files: Optional[List[Path]] = None,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Fingerprint components in one pass over an extracted tree
+
+    Args:
+        files: Files to visit, in order (default: every file under root)
+        should_stop: Polled before each file; stops the pass when it returns True
+    """
+    scanner = ComponentScanner()
+    for file_path in (files if files is not None else iter_files(root)):
+        if should_stop and should_stop():
+            break
+        try:
+            scanner.scan_file(root, file_path)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Skipping {file_path}: {e}")
+    return scanner.components()
+
+
+def build_cyclonedx_sbom(
+    components: List[Dict[str, Any]],
+    firmware_name: str,
+    vulnerabilities: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """Build a CycloneDX 1.5 JSON SBOM for the identified components"""
+    bom_components = []
+    for comp in components:
+        bom_components.append({
+            'type': comp['type'],
+            'bom-ref': comp['purl'],
+            'name': comp['name'],
+            'version': comp['version'],
+            'cpe': comp['cpe'],
+            'purl': comp['purl'],
+            'evidence': {
+                'occurrences': [{'location': e['file']} for e in comp['evidence']]
+            }
+        })
+
+    sbom = {
+        'bomFormat': 'CycloneDX',
+        'specVersion': '1.5',
+        'serialNumber': f'urn:uuid:{uuid.uuid4()}',
+        'version': 1,
+        'metadata': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'component': {'type': 'firmware', 'name': firmware_name}
+        },
+        'components': bom_components
+    }
+
+    if vulnerabilities:
+        # One entry per CVE; components sharing it are listed under 'affects'
+        entries: Dict[str, Dict[str, Any]] = {}
+        for v in vulnerabilities:
+            entry = entries.get(v['cve_id'])
+            if entry is None:
+                entry = entries[v['cve_id']] = {
+                    'id': v['cve_id'],
+                    'source': {'name': 'NVD', 'url': f"https://nvd.nist.gov/vuln/detail/{v['cve_id']}"},
+                    'ratings': [{
+                        'score': v.get('cvss_score'),
+                        'severity': str(v.get('severity', 'unknown')).lower(),
+                        'vector': v.get('cvss_vector')
+                    }],
+                    'description': v.get('description'),
+                    'affects': []
+                }
+            affect = {'ref': v['component_ref']}
+            if affect not in entry['affects']:
+                entry['affects'].append(affect)
+        sbom['vulnerabilities'] = list(entries.values())
+
+    return sbom
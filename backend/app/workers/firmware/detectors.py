@@ -0,0 +1,212 @@
+"""
+Firmware Detectors
+
+Per-file detection helpers shared by the filesystem walk in firmware_worker
+and by in-flight scanning of members while they are being extracted.
+"""
+import os
+import re
+from pathlib import Path, PurePosixPath
+from typing import Dict, Any, List, Iterator, Optional, Tuple
+
+from .aggregator import SEVERITY_RANK, FindingsAggregator, merge_finding_files
+from .secret_scanner import SecretsScanner
+
+# (pattern, description, severity) - patterns match from the right like rglob
+SENSITIVE_FILE_PATTERNS = [
+    ('etc/passwd', 'Password file found', 'MEDIUM'),
+    ('etc/shadow', 'Shadow password file found', 'HIGH'),
+    ('etc/ssh/ssh_host_*_key', 'SSH host private key', 'HIGH'),
+    ('root/.ssh/id_rsa', 'Root SSH private key', 'CRITICAL'),
+    ('*.pem', 'PEM certificate/key file', 'MEDIUM'),
+    ('*.key', 'Private key file', 'HIGH'),
+    ('*.crt', 'Certificate file', 'LOW'),
+    ('config.xml', 'Configuration file', 'MEDIUM'),
+]
+
+URL_RE = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+IP_RE = re.compile(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b')
+EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+STRING_CATEGORIES = ('urls', 'ips', 'emails', 'paths')
+STRINGS_TOP_K = 100
+CREDENTIALS_TOP_K = 20
+
+MAX_STRINGS_FILE_SIZE = 10 * 1024 * 1024
+MAX_CREDENTIALS_FILE_SIZE = 1024 * 1024
+MAX_CRYPTO_FILE_SIZE = 100 * 1024
+
+
+def match_sensitive_file(rel_path: str, size: int) -> List[Dict[str, Any]]:
+    """Match a relative path against the sensitive file patterns"""
+    findings = []
+    path = PurePosixPath(rel_path)
+    for pattern, description, severity in SENSITIVE_FILE_PATTERNS:
+        if path.match(pattern):
+            findings.append({
+                'type': 'sensitive_file',
+                'severity': severity,
+                'file': rel_path,
+                'description': description,
+                'size': size
+            })
+    return findings
+
+
+def iter_files(path: str) -> Iterator[Path]:
+    """Walk regular files in a deterministic (sorted) order without following symlinks"""
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = Path(root) / name
+            if file_path.is_file() and not file_path.is_symlink():
+                yield file_path
+
+
+def iter_strings(content: bytes) -> Iterator[Tuple[str, str]]:
+    """Yield (category, value) for URLs, IPs and emails in a file's content"""
+    text = content.decode('utf-8', errors='ignore')
+    for category, regex in (('urls', URL_RE), ('ips', IP_RE), ('emails', EMAIL_RE)):
+        for match in regex.finditer(text):
+            yield category, match.group(0)
+
+
+def new_strings_aggregator() -> FindingsAggregator:
+    return FindingsAggregator(STRINGS_TOP_K)
+
+
+def new_credentials_aggregator() -> FindingsAggregator:
+    return FindingsAggregator(CREDENTIALS_TOP_K, merge=merge_finding_files)
+
+
+def add_strings(aggregator: FindingsAggregator, content: bytes):
+    """Feed every string match of a file into the aggregator"""
+    for category, value in iter_strings(content):
+        aggregator.add(category, value)
+
+
+def strings_result(aggregator: FindingsAggregator) -> Dict[str, List[str]]:
+    """Most frequent strings per category, ties broken alphabetically"""
+    return {
+        category: [value for value, _, _ in aggregator.top(category)]
+        for category in STRING_CATEGORIES
+    }
+
+
+def credentials_result(aggregator: FindingsAggregator) -> List[Dict[str, Any]]:
+    """Top credential findings of every type, ranked by severity and frequency"""
+    findings = []
+    for category in sorted(aggregator.categories):
+        for key, count, finding in aggregator.top(category):
+            findings.append({
+                **finding,
+                'occurrences': count,
+                'occurrences_error': aggregator.error(category, key)
+            })
+    findings.sort(key=lambda f: (-SEVERITY_RANK.get(f['severity'], 0), -f['occurrences'], f['type'], f['file']))
+    return findings
+
+
+def find_crypto_material(rel_path: str, text: str, size: int) -> Dict[str, List[Dict]]:
+    """Detect PEM private keys, certificates and public keys in a single file"""
+    crypto_data = {
+        'private_keys': [],
+        'certificates': [],
+        'public_keys': []
+    }
+
+    if '-----BEGIN' in text and 'PRIVATE KEY-----' in text:
+        crypto_data['private_keys'].append({
+            'file': rel_path,
+            'type': 'RSA' if 'RSA' in text else 'Generic',
+            'size': size
+        })
+
+    if '-----BEGIN CERTIFICATE-----' in text:
+        crypto_data['certificates'].append({'file': rel_path, 'size': size})
+
+    if '-----BEGIN PUBLIC KEY-----' in text:
+        crypto_data['public_keys'].append({'file': rel_path, 'size': size})
+
+    return crypto_data
+
+
+class MemberScanner:
+    """
+    Incremental scanner fed one file at a time
+
+    Produces the same result sections as the post-extraction phases of
+    firmware_worker ('findings', 'strings', 'crypto'). With a budget, file
+    contents stop being read once it is exhausted; path-based checks still
+    run for every file.
+    """
+
+    def __init__(self, scan_types: List[str], budget=None):
+        """
+        Args:
+            scan_types: Enabled scan types
+            budget: Optional AnalysisBudget shared with the other phases
+        """
+        self.scan_types = set(scan_types)
+        self.budget = budget
+        self.files_scanned = 0
+
+        self.sensitive_findings: List[Dict[str, Any]] = []
+        self.credentials = new_credentials_aggregator()
+        self.secrets = SecretsScanner(self.credentials)
+        self.strings = new_strings_aggregator()
+        self.crypto = {'private_keys': [], 'certificates': [], 'public_keys': []}
+
+    def scan(self, rel_path: str, size: int, read_content) -> None:
+        """
+        Scan a single file
+
+        Args:
+            rel_path: Path relative to the firmware root
+            size: File size in bytes
+            read_content: Zero-argument callable returning the file's bytes;
+                only invoked when a detector actually needs the content
+        """
+        self.files_scanned += 1
+        content: Optional[bytes] = None
+
+        if 'credentials' in self.scan_types:
+            self.sensitive_findings.extend(match_sensitive_file(rel_path, size))
+
+        if self.budget is not None and self.budget.exhausted:
+            self.budget.skip()
+            return
+
+        def load() -> bytes:
+            nonlocal content
+            if content is None:
+                content = read_content()
+            return content
+
+        if 'strings' in self.scan_types and size <= MAX_STRINGS_FILE_SIZE:
+            add_strings(self.strings, load())
+
+        if 'credentials' in self.scan_types and 0 < size <= MAX_CREDENTIALS_FILE_SIZE:
+            self.secrets.add(rel_path, load())
+
+        if 'crypto' in self.scan_types and size <= MAX_CRYPTO_FILE_SIZE:
+            text = load().decode('utf-8', errors='ignore')
+            for key, values in find_crypto_material(rel_path, text, size).items():
+                self.crypto[key].extend(values)
+
+        if self.budget is not None and content is not None:
+            self.budget.charge(len(content))
+
+    def results(self) -> Dict[str, Any]:
+        """Return the accumulated result sections"""
+        self.secrets.flush()
+        return {
+            'findings': self.sensitive_findings + credentials_result(self.credentials),
+            'strings': strings_result(self.strings),
+            'crypto': self.crypto,
+            'totals': {
+                'strings': self.strings.totals(),
+                'credentials': self.credentials.totals()
+            },
+            'files_scanned': self.files_scanned
+        }
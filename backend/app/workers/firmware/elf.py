@@ -0,0 +1,419 @@
+"""
+ELF Binary Inventory
+
+Pure-Python ELF parser reporting architecture and hardening properties
+(NX, PIE, RELRO, stack canary, stripped, linked libraries) for every ELF in
+an extracted firmware tree. Only the ELF header, program headers, section
+headers and the dynamic string table are read - never whole binaries.
+"""
+import json
+import struct
+import hashlib
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Callable, Optional
+
+from .detectors import iter_files
+
+logger = logging.getLogger(__name__)
+
+MAGIC_ELF = b'\x7fELF'
+
+# e_type
+ET_EXEC = 2
+ET_DYN = 3
+
+# Program header types
+PT_LOAD = 1
+PT_DYNAMIC = 2
+PT_INTERP = 3
+PT_GNU_STACK = 0x6474e551
+PT_GNU_RELRO = 0x6474e552
+PF_X = 0x1
+
+# Dynamic tags
+DT_NULL = 0
+DT_NEEDED = 1
+DT_STRTAB = 5
+DT_STRSZ = 10
+DT_SONAME = 14
+DT_RPATH = 15
+DT_BIND_NOW = 24
+DT_RUNPATH = 29
+DT_FLAGS = 30
+DT_FLAGS_1 = 0x6ffffffb
+DF_BIND_NOW = 0x8
+DF_1_NOW = 0x1
+DF_1_PIE = 0x08000000
+
+# Section types
+SHT_SYMTAB = 2
+
+E_MACHINE = {
+    0x03: 'x86',
+    0x08: 'mips',
+    0x14: 'powerpc',
+    0x15: 'powerpc64',
+    0x28: 'arm',
+    0x2a: 'superh',
+    0x3e: 'x86_64',
+    0xb7: 'aarch64',
+    0xf3: 'riscv',
+    0x5e: 'xtensa',
+    0x102: 'loongarch',
+}
+
+CANARY_SYMBOLS = (b'__stack_chk_fail', b'__stack_chk_guard', b'__intel_security_cookie')
+
+# Upper bounds on what is read from a single binary
+MAX_HEADER_TABLE = 64 * 1024
+MAX_STRTAB = 4 * 1024 * 1024
+
+
+class ElfParseError(Exception):
+    """Raised for truncated or malformed ELF files"""
+
+
+def is_elf_file(path: str) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(4) == MAGIC_ELF
+    except OSError:
+        return False
+
+
+def parse_elf(path: str) -> Dict[str, Any]:
+    """
+    Parse an ELF file's headers
+
+    Returns:
+        {
+            'arch', 'bits', 'endian', 'type',
+            'nx', 'pie', 'relro': 'full' | 'partial' | 'none',
+            'canary', 'stripped', 'interpreter', 'soname',
+            'needed': [linked libraries], 'rpath'
+        }
+    """
+    with open(path, 'rb') as f:
+        return _ElfReader(f).parse()
+
+
+class _ElfReader:
+    def __init__(self, f):
+        self.f = f
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        self.f.seek(offset)
+        data = self.f.read(size)
+        if len(data) != size:
+            raise ElfParseError(f"truncated read at {offset:#x}")
+        return data
+
+    def parse(self) -> Dict[str, Any]:
+        ident = self.read_at(0, 16)
+        if ident[:4] != MAGIC_ELF:
+            raise ElfParseError('not an ELF file')
+
+        self.is64 = ident[4] == 2
+        self.endian = '<' if ident[5] == 1 else '>'
+        e = self.endian
+        if self.is64:
+            hdr = struct.unpack(e + 'HHIQQQIHHHHHH', self.read_at(16, 48))
+        else:
+            hdr = struct.unpack(e + 'HHIIIIIHHHHHH', self.read_at(16, 36))
+        (e_type, e_machine, _, _, e_phoff, e_shoff, _,
+         _, e_phentsize, e_phnum, e_shentsize, e_shnum, _) = hdr
+
+        info = {
+            'arch': E_MACHINE.get(e_machine, f'unknown({e_machine:#x})'),
+            'bits': 64 if self.is64 else 32,
+            'endian': 'little' if e == '<' else 'big',
+            'type': {ET_EXEC: 'executable', ET_DYN: 'shared_object'}.get(e_type, 'other'),
+            'nx': False,
+            'pie': False,
+            'relro': 'none',
+            'canary': False,
+            'stripped': True,
+            'interpreter': None,
+            'soname': None,
+            'needed': [],
+            'rpath': None,
+        }
+
+        segments = self._program_headers(e_phoff, e_phentsize, e_phnum)
+        has_gnu_stack = False
+        has_relro = False
+        dynamic = None
+        for p_type, p_flags, p_offset, p_vaddr, p_filesz in segments:
+            if p_type == PT_GNU_STACK:
+                has_gnu_stack = True
+                info['nx'] = not (p_flags & PF_X)
+            elif p_type == PT_GNU_RELRO:
+                has_relro = True
+            elif p_type == PT_DYNAMIC:
+                dynamic = (p_offset, p_filesz)
+            elif p_type == PT_INTERP and 0 < p_filesz < 4096:
+                info['interpreter'] = self.read_at(p_offset, p_filesz).rstrip(b'\x00').decode(errors='replace')
+
+        if not has_gnu_stack:
+            # Without PT_GNU_STACK the kernel maps the stack executable on most arches
+            info['nx'] = False
+
+        bind_now = False
+        flags_1 = 0
+        dynstr = b''
+        if dynamic:
+            tags = self._dynamic_entries(*dynamic)
+            for tag, value in tags:
+                if tag == DT_BIND_NOW:
+                    bind_now = True
+                elif tag == DT_FLAGS and value & DF_BIND_NOW:
+                    bind_now = True
+                elif tag == DT_FLAGS_1:
+                    flags_1 = value
+            if flags_1 & DF_1_NOW:
+                bind_now = True
+
+            strtab = next((v for t, v in tags if t == DT_STRTAB), None)
+            strsz = next((v for t, v in tags if t == DT_STRSZ), 0)
+            strtab_offset = self._vaddr_to_offset(segments, strtab) if strtab is not None else None
+            if strtab_offset is not None and 0 < strsz <= MAX_STRTAB:
+                dynstr = self.read_at(strtab_offset, strsz)
+                for tag, value in tags:
+                    if tag == DT_NEEDED:
+                        info['needed'].append(_cstr(dynstr, value))
+                    elif tag == DT_SONAME:
+                        info['soname'] = _cstr(dynstr, value)
+                    elif tag in (DT_RPATH, DT_RUNPATH):
+                        info['rpath'] = _cstr(dynstr, value)
+
+        if has_relro:
+            info['relro'] = 'full' if bind_now else 'partial'
+
+        if e_type == ET_DYN:
+            # Position independent; executables built as PIE also carry an
+            # interpreter or DF_1_PIE, plain shared libraries do not.
+            info['pie'] = True
+            if info['interpreter'] or flags_1 & DF_1_PIE:
+                info['type'] = 'executable'
+
+        symtab_strings = self._section_symbols(e_shoff, e_shentsize, e_shnum)
+        if symtab_strings is not None:
+            info['stripped'] = False
+        info['canary'] = any(
+            sym in dynstr or (symtab_strings is not None and sym in symtab_strings)
+            for sym in CANARY_SYMBOLS
+        )
+        return info
+
+    def _program_headers(self, phoff: int, phentsize: int, phnum: int) -> List[tuple]:
+        if not phoff or not phnum or phentsize * phnum > MAX_HEADER_TABLE:
+            return []
+        table = self.read_at(phoff, phentsize * phnum)
+        e = self.endian
+        segments = []
+        for i in range(phnum):
+            entry = table[i * phentsize:(i + 1) * phentsize]
+            if self.is64:
+                p_type, p_flags, p_offset, p_vaddr, _, p_filesz, _, _ = struct.unpack(e + 'IIQQQQQQ', entry[:56])
+            else:
+                p_type, p_offset, p_vaddr, _, p_filesz, _, p_flags, _ = struct.unpack(e + 'IIIIIIII', entry[:32])
+            segments.append((p_type, p_flags, p_offset, p_vaddr, p_filesz))
+        return segments
+
+    def _dynamic_entries(self, offset: int, size: int) -> List[tuple]:
+        size = min(size, MAX_HEADER_TABLE)
+        data = self.read_at(offset, size)
+        fmt = self.endian + ('qQ' if self.is64 else 'iI')
+        step = struct.calcsize(fmt)
+        entries = []
+        for i in range(0, len(data) - step + 1, step):
+            tag, value = struct.unpack(fmt, data[i:i + step])
+            if tag == DT_NULL:
+                break
+            entries.append((tag, value))
+        return entries
+
+    @staticmethod
+    def _vaddr_to_offset(segments: List[tuple], vaddr: int) -> Optional[int]:
+        for p_type, _, p_offset, p_vaddr, p_filesz in segments:
+            if p_type == PT_LOAD and p_vaddr <= vaddr < p_vaddr + p_filesz:
+                return vaddr - p_vaddr + p_offset
+        return None
+
+    def _section_symbols(self, shoff: int, shentsize: int, shnum: int) -> Optional[bytes]:
+        """Return the .symtab string table if the binary is not stripped, else None"""
+        if not shoff or not shnum or shentsize * shnum > MAX_HEADER_TABLE:
+            return None
+        try:
+            table = self.read_at(shoff, shentsize * shnum)
+        except ElfParseError:
+            return None
+        e = self.endian
+        sections = []
+        for i in range(shnum):
+            entry = table[i * shentsize:(i + 1) * shentsize]
+            if self.is64:
+                _, sh_type, _, _, sh_offset, sh_size, sh_link, _, _, _ = struct.unpack(e + 'IIQQQQIIQQ', entry[:64])
+            else:
+                _, sh_type, _, _, sh_offset, sh_size, sh_link, _, _, _ = struct.unpack(e + 'IIIIIIIIII', entry[:40])
+            sections.append((sh_type, sh_offset, sh_size, sh_link))
+
+        for sh_type, _, _, sh_link in sections:
+            if sh_type == SHT_SYMTAB and sh_link < len(sections):
+                _, str_offset, str_size, _ = sections[sh_link]
+                try:
+                    return self.read_at(str_offset, min(str_size, MAX_STRTAB))
+                except ElfParseError:
+                    return b''
+        return None
+
+
+def _cstr(table: bytes, offset: int) -> str:
+    end = table.find(b'\x00', offset)
+    return table[offset:end if end >= 0 else len(table)].decode(errors='replace')
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ElfResultCache:
+    """
+    ELF parse results keyed by file SHA-256
+
+    An in-process LRU sits in front of an optional Redis client so that
+    binaries shared across images (busybox, libc, ...) are parsed once.
+    """
+
+    KEY_PREFIX = 'firmware:elf:'
+
+    def __init__(self, redis_client=None, max_entries: int = 10000, ttl: int = 30 * 86400):
+        self.redis = redis_client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        if sha256 in self._local:
+            self._local.move_to_end(sha256)
+            self.hits += 1
+            return self._local[sha256]
+        if self.redis is not None:
+            try:
+                cached = self.redis.get(self.KEY_PREFIX + sha256)
+                if cached:
+                    info = json.loads(cached)
+                    self._remember(sha256, info)
+                    self.hits += 1
+                    return info
+            except Exception as e:
+                logger.debug(f"ELF cache lookup failed: {e}")
+        self.misses += 1
+        return None
+
+    def set(self, sha256: str, info: Dict[str, Any]):
+        self._remember(sha256, info)
+        if self.redis is not None:
+            try:
+                self.redis.set(self.KEY_PREFIX + sha256, json.dumps(info), ex=self.ttl)
+            except Exception as e:
+                logger.debug(f"ELF cache store failed: {e}")
+
+    def _remember(self, sha256: str, info: Dict[str, Any]):
+        self._local[sha256] = info
+        self._local.move_to_end(sha256)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+
+# Process-wide cache shared by all firmware tasks
+_default_cache = ElfResultCache()
+
+
+def get_elf_cache(redis_client=None) -> ElfResultCache:
+    if redis_client is not None and _default_cache.redis is None:
+        _default_cache.redis = redis_client
+    return _default_cache
+
+
+def analyze_elf_file(path: str, root: str, cache: Optional[ElfResultCache] = None) -> Optional[Dict[str, Any]]:
+    """Parse one file (cached by hash); returns None for non-ELF files"""
+    if not is_elf_file(path):
+        return None
+    sha256 = file_sha256(path)
+    info = cache.get(sha256) if cache else None
+    if info is None:
+        try:
+            info = parse_elf(path)
+        except (ElfParseError, struct.error, OSError) as e:
+            info = {'error': str(e)}
+        if cache:
+            cache.set(sha256, info)
+    return {
+        'file': str(Path(path).relative_to(root)),
+        'sha256': sha256,
+        'size': Path(path).stat().st_size,
+        **info
+    }
+
+
+def build_elf_inventory(
+    root: str,
+    cache: Optional[ElfResultCache] = None,
+    max_workers: int = 8,
+    files: Optional[List[Path]] = None,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> Dict[str, Any]:
+    """
+    Inventory every ELF under root, parsing files in parallel
+
+    Args:
+        files: Candidate files in the order to parse them (default: every file)
+        should_stop: Polled before each file; once it returns True the
+            remaining files are left out and counted in summary['skipped']
+
+    Returns:
+        {
+            'binaries': [per-binary results, sorted by path],
+            'summary': {counts per hardening property and architecture}
+        }
+    """
+    candidates = files if files is not None else list(iter_files(root))
+    skipped = [0]
+
+    def analyze(path: Path) -> Optional[Dict[str, Any]]:
+        if should_stop and should_stop():
+            skipped[0] += 1
+            return None
+        return analyze_elf_file(str(path), root, cache)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(analyze, candidates)
+        binaries = sorted((r for r in results if r), key=lambda r: r['file'])
+
+    parsed = [b for b in binaries if 'error' not in b]
+    summary = {
+        'total': len(binaries),
+        'parse_errors': len(binaries) - len(parsed),
+        'architectures': {},
+        'no_nx': sum(1 for b in parsed if not b['nx']),
+        'no_pie': sum(1 for b in parsed if b['type'] == 'executable' and not b['pie']),
+        'no_relro': sum(1 for b in parsed if b['relro'] == 'none'),
+        'partial_relro': sum(1 for b in parsed if b['relro'] == 'partial'),
+        'no_canary': sum(1 for b in parsed if not b['canary']),
+        'not_stripped': sum(1 for b in parsed if not b['stripped']),
+        'skipped': skipped[0],
+    }
+    for b in parsed:
+        summary['architectures'][b['arch']] = summary['architectures'].get(b['arch'], 0) + 1
+
+    return {'binaries': binaries, 'summary': summary}
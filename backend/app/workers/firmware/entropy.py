@@ -0,0 +1,314 @@
+"""
+Entropy Analysis
+
+Per-block Shannon entropy over a memory-mapped firmware image, computed with
+NumPy a chunk of blocks at a time. Blocks are classified as padding, plain
+data, compressed or encrypted and merged into regions, giving a quick map of
+the image before any signature scan runs.
+"""
+import os
+import mmap
+import logging
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_SIZE = 4096
+# Blocks processed per vectorised step (bounds the bincount scratch memory)
+BLOCKS_PER_CHUNK = 4096
+# Points kept in the stored profile
+PROFILE_POINTS = 512
+MAX_REGIONS = 256
+
+# Normalised entropy (bits per byte / 8) thresholds
+HIGH_ENTROPY = 0.95
+# Chi-square of the byte histogram against uniform, below which a high
+# entropy block looks like ciphertext rather than compressed data
+ENCRYPTED_CHI2_FACTOR = 1.25
+
+CLASS_PADDING = 'padding'
+CLASS_DATA = 'data'
+CLASS_COMPRESSED = 'compressed'
+CLASS_ENCRYPTED = 'encrypted'
+_CLASSES = (CLASS_PADDING, CLASS_DATA, CLASS_COMPRESSED, CLASS_ENCRYPTED)
+_ENCRYPTED_INDEX = _CLASSES.index(CLASS_ENCRYPTED)
+
+# Share of the non-padding bytes needed for an image-level verdict
+VERDICT_THRESHOLD = 0.9
+
+# Interior padding shorter than this stays inside its data region: ext2,
+# JFFS2 and UBI images have constant (unused or erased) blocks of their own
+MIN_PADDING_GAP = 1024 * 1024
+
+# Container magics. LZMA and xz streams are as uniform as ciphertext, so an
+# image holding one of these is reported as compressed rather than encrypted.
+# Four-byte magics turn up by chance every few hundred MB of random data, so a
+# match only counts at offset 0, in the first block of a region (e.g. right
+# after padding) or inside a block that does not look encrypted.
+CONTAINER_SIGNATURES = {
+    'squashfs': (b'hsqs', b'sqsh'),
+    'xz': (b'\xfd7zXZ\x00',),
+    'lzma': (b'\x5d\x00\x00\x80\x00', b'\x6d\x00\x00\x80\x00'),
+    'uimage': (b'\x27\x05\x19\x56',),
+    'cramfs': (b'\x45\x3d\xcd\x28',),
+    'ubi': (b'UBI#',),
+    'trx': (b'HDR0',),
+    'zip': (b'PK\x03\x04',),
+}
+# Matches of one magic inspected before giving up on it
+MAX_SIGNATURE_HITS = 4096
+
+
+def block_statistics(data: np.ndarray, block_size: int):
+    """
+    Entropy, chi-square and padding flag for every full block of data
+
+    Args:
+        data: uint8 array whose length is a multiple of block_size
+
+    Returns:
+        (entropy, chi2, constant) arrays, one value per block
+    """
+    blocks = data.reshape(-1, block_size)
+    n_blocks = blocks.shape[0]
+
+    # One bincount over (block index * 256 + byte value) builds every histogram at once
+    offsets = (np.arange(n_blocks, dtype=np.int64) * 256)[:, None]
+    counts = np.bincount((blocks + offsets).ravel(), minlength=n_blocks * 256)
+    counts = counts.reshape(n_blocks, 256).astype(np.float64)
+
+    probs = counts / block_size
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_probs = np.where(probs > 0, np.log2(probs), 0.0)
+    entropy = -(probs * log_probs).sum(axis=1) / 8.0
+
+    expected = block_size / 256.0
+    chi2 = ((counts - expected) ** 2 / expected).sum(axis=1)
+    constant = (counts == block_size).any(axis=1)
+    return entropy, chi2, constant
+
+
+def classify_blocks(entropy: np.ndarray, chi2: np.ndarray, constant: np.ndarray) -> np.ndarray:
+    """Map block statistics to indices into _CLASSES"""
+    classes = np.full(entropy.shape, 1, dtype=np.int8)
+    high = entropy >= HIGH_ENTROPY
+    # Uniform histograms have chi2 around 255 (the degrees of freedom)
+    uniform = chi2 <= 255 * ENCRYPTED_CHI2_FACTOR
+    classes[high & ~uniform] = 2
+    classes[high & uniform] = 3
+    classes[constant] = 0
+    return classes
+
+
+def compute_entropy_profile(
+    file_path: str,
+    block_size: int = DEFAULT_BLOCK_SIZE
+) -> Dict[str, Any]:
+    """
+    Compute the entropy map of a raw image
+
+    Returns:
+        {
+            'block_size': Block size in bytes,
+            'blocks': Number of blocks analysed,
+            'mean_entropy': Mean normalised entropy (0-1),
+            'profile': Downsampled per-block entropy (max of each bucket),
+            'regions': [{'start', 'end', 'class', 'entropy'}] runs of equal class,
+            'bytes_by_class': Bytes per class,
+            'padding_ratio': Share of the image that is padding,
+            'signatures': First offset of each container magic found,
+            'verdict': 'encrypted' | 'compressed' | 'mixed' | 'plain' | 'empty'
+        }
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return _empty_profile(block_size)
+
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        entropy, classes = _scan_blocks(mm, size, block_size)
+        signatures = find_container_signatures(mm, classes, block_size)
+
+    block_sizes = np.full(len(classes), block_size, dtype=np.int64)
+    block_sizes[-1] = size - block_size * (len(classes) - 1)
+
+    bytes_by_class = {
+        name: int(block_sizes[classes == idx].sum())
+        for idx, name in enumerate(_CLASSES)
+    }
+
+    return {
+        'block_size': block_size,
+        'blocks': int(len(entropy)),
+        'mean_entropy': round(float(np.average(entropy, weights=block_sizes)), 4),
+        'profile': _downsample(entropy),
+        'regions': _regions(entropy, classes, block_size, size),
+        'bytes_by_class': bytes_by_class,
+        'padding_ratio': round(bytes_by_class[CLASS_PADDING] / size, 4),
+        'signatures': signatures,
+        'verdict': _verdict(bytes_by_class, signatures)
+    }
+
+
+def find_container_signatures(
+    buffer,
+    classes: Optional[np.ndarray] = None,
+    block_size: int = DEFAULT_BLOCK_SIZE
+) -> Dict[str, int]:
+    """
+    First plausible offset of every known container magic in the buffer
+
+    Args:
+        classes: Block classes from _scan_blocks (optional); when given,
+            matches in the middle of an encrypted-looking region are ignored
+    """
+    found = {}
+    for name, magics in CONTAINER_SIGNATURES.items():
+        offsets = []
+        for magic in magics:
+            offset = buffer.find(magic)
+            hits = 0
+            while offset >= 0 and hits < MAX_SIGNATURE_HITS:
+                if classes is None or _plausible_signature(offset, classes, block_size):
+                    offsets.append(offset)
+                    break
+                hits += 1
+                offset = buffer.find(magic, offset + 1)
+        if offsets:
+            found[name] = min(offsets)
+    return found
+
+
+def _plausible_signature(offset: int, classes: np.ndarray, block_size: int) -> bool:
+    """A magic counts at offset 0, at the start of a region or outside encrypted blocks"""
+    block = offset // block_size
+    if offset == 0 or classes[block] != _ENCRYPTED_INDEX:
+        return True
+    return block > 0 and classes[block - 1] != classes[block]
+
+
+def _scan_blocks(buffer, size: int, block_size: int):
+    """
+    Block entropies and classes of a buffer, a chunk of blocks at a time
+
+    Kept separate so every NumPy view of the mmap is released on return.
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    entropy_parts: List[np.ndarray] = []
+    class_parts: List[np.ndarray] = []
+    chunk_bytes = block_size * BLOCKS_PER_CHUNK
+
+    for start in range(0, size, chunk_bytes):
+        chunk = data[start:start + chunk_bytes]
+        full = len(chunk) - len(chunk) % block_size
+        if full:
+            entropy, chi2, constant = block_statistics(chunk[:full], block_size)
+            entropy_parts.append(entropy)
+            class_parts.append(classify_blocks(entropy, chi2, constant))
+        if full < len(chunk):
+            # Trailing partial block is measured against its own length; too
+            # short for the chi-square test to mean anything below 256 bytes
+            tail = chunk[full:]
+            entropy, chi2, constant = block_statistics(tail, len(tail))
+            entropy_parts.append(entropy)
+            if len(tail) >= 256:
+                class_parts.append(classify_blocks(entropy, chi2, constant))
+            else:
+                class_parts.append(np.where(constant, 0, 1).astype(np.int8))
+
+    return np.concatenate(entropy_parts), np.concatenate(class_parts)
+
+
+def data_regions(
+    profile: Dict[str, Any],
+    min_size: int = DEFAULT_BLOCK_SIZE,
+    min_gap: int = MIN_PADDING_GAP
+) -> List[Dict[str, int]]:
+    """
+    (start, end) ranges worth carving out of a profiled image
+
+    Leading and trailing padding is trimmed and the image is only split at
+    padding runs of at least min_gap bytes; shorter runs are kept so a
+    filesystem is never cut at its own empty blocks.
+    """
+    regions = profile.get('regions', [])
+    if not regions:
+        return []
+    size = regions[-1]['end']
+    cuts = [
+        (region['start'], region['end'])
+        for region in regions
+        if region['class'] == CLASS_PADDING and (
+            region['start'] == 0
+            or region['end'] == size
+            or region['end'] - region['start'] >= min_gap
+        )
+    ]
+
+    ranges: List[Dict[str, int]] = []
+    position = 0
+    for cut_start, cut_end in cuts + [(size, size)]:
+        if cut_start - position >= min_size:
+            ranges.append({'start': position, 'end': cut_start})
+        position = max(position, cut_end)
+    return ranges
+
+
+def _regions(entropy: np.ndarray, classes: np.ndarray, block_size: int, size: int) -> List[Dict[str, Any]]:
+    """Run-length encode the class of every block"""
+    boundaries = np.flatnonzero(np.diff(classes)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(classes)]))
+
+    regions = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        regions.append({
+            'start': start * block_size,
+            'end': min(end * block_size, size),
+            'class': _CLASSES[int(classes[start])],
+            'entropy': round(float(entropy[start:end].mean()), 4)
+        })
+
+    if len(regions) > MAX_REGIONS:
+        # Keep the largest regions, in offset order
+        regions = sorted(
+            sorted(regions, key=lambda r: r['start'] - r['end'])[:MAX_REGIONS],
+            key=lambda r: r['start']
+        )
+    return regions
+
+
+def _downsample(entropy: np.ndarray) -> List[float]:
+    """Max-pool the block entropies into at most PROFILE_POINTS buckets"""
+    if len(entropy) <= PROFILE_POINTS:
+        return np.round(entropy, 3).tolist()
+    edges = np.linspace(0, len(entropy), PROFILE_POINTS + 1).astype(np.int64)
+    return np.round(np.maximum.reduceat(entropy, edges[:-1]), 3).tolist()
+
+
+def _verdict(bytes_by_class: Dict[str, int], signatures: Dict[str, int]) -> str:
+    content = sum(v for k, v in bytes_by_class.items() if k != CLASS_PADDING)
+    if content == 0:
+        return 'empty'
+    if bytes_by_class[CLASS_ENCRYPTED] >= VERDICT_THRESHOLD * content and not signatures:
+        return 'encrypted'
+    if bytes_by_class[CLASS_ENCRYPTED] + bytes_by_class[CLASS_COMPRESSED] >= VERDICT_THRESHOLD * content:
+        return 'compressed'
+    if bytes_by_class[CLASS_DATA] >= VERDICT_THRESHOLD * content:
+        return 'plain'
+    return 'mixed'
+
+
+def _empty_profile(block_size: int) -> Dict[str, Any]:
+    return {
+        'block_size': block_size,
+        'blocks': 0,
+        'mean_entropy': 0.0,
+        'profile': [],
+        'regions': [],
+        'bytes_by_class': {name: 0 for name in _CLASSES},
+        'padding_ratio': 0.0,
+        'signatures': {},
+        'verdict': 'empty'
+    }
@@ -0,0 +1,645 @@
+"""
+Firmware Extractors
+
+In-process streaming extractors for tar, gzip/bzip2/xz, zip, uImage and TRX
+containers, with binwalk as a fallback for everything else.
+"""
+import os
+import io
+import re
+import bz2
+import gzip
+import lzma
+import struct
+import shutil
+import tarfile
+import zipfile
+import logging
+import subprocess
+import time
+from pathlib import Path, PurePosixPath
+from typing import Dict, Any, List, Callable, Optional
+
+from .entropy import data_regions
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+# Magic numbers
+MAGIC_GZIP = b'\x1f\x8b'
+MAGIC_BZIP2 = b'BZh'
+MAGIC_XZ = b'\xfd7zXZ\x00'
+MAGIC_ZIP = b'PK\x03\x04'
+MAGIC_ZIP_EMPTY = b'PK\x05\x06'
+MAGIC_UIMAGE = b'\x27\x05\x19\x56'
+MAGIC_TRX = b'HDR0'
+MAGIC_USTAR = b'ustar'
+
+# uImage header: magic, hcrc, time, size, load, ep, dcrc, os, arch, type, comp, name
+UIMAGE_HEADER = struct.Struct('>IIIIIIIBBBB32s')
+UIMAGE_COMPRESSION = {0: 'none', 1: 'gzip', 2: 'bzip2', 3: 'lzma', 4: 'lzo', 5: 'lz4', 6: 'zstd'}
+
+# TRX v1 header: magic, len, crc32, flags, version, 3 partition offsets
+TRX_HEADER = struct.Struct('<4sIIHH3I')
+
+COMPRESSED_STREAMS = {
+    'gzip': gzip.open,
+    'bzip2': bz2.open,
+    'xz': lzma.open,
+}
+
+MAX_NESTING = 3
+
+# Raw images with at least this share of padding are carved into their data
+# regions (see entropy.data_regions) before binwalk runs
+PADDING_SKIP_RATIO = 0.25
+
+
+class EncryptedImage(Exception):
+    """Raised when the entropy profile shows an image that cannot be unpacked"""
+
+
+class ExtractionLimitExceeded(Exception):
+    """Raised when an archive exceeds the configured extraction budget"""
+
+
+class ExtractionBudget:
+    """Size and inode limits protecting the worker against zip bombs"""
+
+    def __init__(
+        self,
+        max_total_bytes: int = 2 * 1024 * 1024 * 1024,
+        max_member_bytes: int = 512 * 1024 * 1024,
+        max_members: int = 100000,
+        max_ratio: float = 200.0,
+        binwalk_timeout: int = 300,
+        inline_scan_bytes: int = 1024 * 1024
+    ):
+        """
+        Args:
+            max_total_bytes: Maximum bytes written for the whole firmware
+            max_member_bytes: Maximum size of a single extracted member
+            max_members: Maximum number of files/directories created (inodes)
+            max_ratio: Maximum extracted size relative to the input file size
+            binwalk_timeout: Timeout in seconds for the binwalk fallback
+            inline_scan_bytes: Members up to this size are handed to the
+                member callback together with their content
+        """
+        self.max_total_bytes = max_total_bytes
+        self.max_member_bytes = max_member_bytes
+        self.max_members = max_members
+        self.max_ratio = max_ratio
+        self.binwalk_timeout = binwalk_timeout
+        self.inline_scan_bytes = inline_scan_bytes
+
+    @classmethod
+    def from_params(cls, params: dict) -> 'ExtractionBudget':
+        """Build a budget from the task's 'extraction_budget' parameters (sizes in MB)"""
+        config = params.get('extraction_budget') or {}
+        budget = cls()
+        if config.get('max_total_mb'):
+            budget.max_total_bytes = int(config['max_total_mb']) * 1024 * 1024
+        if config.get('max_member_mb'):
+            budget.max_member_bytes = int(config['max_member_mb']) * 1024 * 1024
+        if config.get('max_members'):
+            budget.max_members = int(config['max_members'])
+        if config.get('max_ratio'):
+            budget.max_ratio = float(config['max_ratio'])
+        if config.get('binwalk_timeout'):
+            budget.binwalk_timeout = int(config['binwalk_timeout'])
+        return budget
+
+
+class ExtractedMember:
+    """A single file written by the extractor"""
+
+    __slots__ = ('path', 'abs_path', 'size', 'data')
+
+    def __init__(self, path: str, abs_path: str, size: int, data: Optional[bytes] = None):
+        self.path = path          # Path relative to the extraction root
+        self.abs_path = abs_path  # Absolute path on disk
+        self.size = size
+        self.data = data          # Content, for members up to inline_scan_bytes
+
+
+def read_magic(firmware_file: str, length: int = 512) -> bytes:
+    """Read the leading bytes of a file"""
+    with open(firmware_file, 'rb') as f:
+        return f.read(length)
+
+
+def detect_format(firmware_file: str) -> str:
+    """
+    Detect the container format from magic bytes
+
+    Returns:
+        'tar' | 'zip' | 'gzip' | 'bzip2' | 'xz' | 'uimage' | 'trx' | 'raw'
+        (compressed tarballs are reported as 'tar')
+    """
+    head = read_magic(firmware_file)
+
+    if head.startswith(MAGIC_ZIP) or head.startswith(MAGIC_ZIP_EMPTY):
+        return 'zip'
+    if head.startswith(MAGIC_UIMAGE):
+        return 'uimage'
+    if head.startswith(MAGIC_TRX):
+        return 'trx'
+    if head[257:262] == MAGIC_USTAR:
+        return 'tar'
+
+    for fmt, magic in (('gzip', MAGIC_GZIP), ('bzip2', MAGIC_BZIP2), ('xz', MAGIC_XZ)):
+        if head.startswith(magic):
+            # Peek into the decompressed stream to spot compressed tarballs
+            try:
+                with COMPRESSED_STREAMS[fmt](firmware_file, 'rb') as f:
+                    inner = f.read(512)
+                if inner[257:262] == MAGIC_USTAR:
+                    return 'tar'
+            except (OSError, EOFError, lzma.LZMAError):
+                pass
+            return fmt
+
+    return 'raw'
+
+
+def detect_filesystem_type(binwalk_output: str) -> str:
+    """Detect filesystem type from binwalk output"""
+    fs_patterns = {
+        'squashfs': r'Squashfs filesystem',
+        'cramfs': r'CramFS filesystem',
+        'jffs2': r'JFFS2 filesystem',
+        'ubifs': r'UBIFS',
+        'ext': r'Ext[234] filesystem'
+    }
+
+    for fs_name, pattern in fs_patterns.items():
+        if re.search(pattern, binwalk_output, re.IGNORECASE):
+            return fs_name
+
+    return 'unknown'
+
+
+class FirmwareExtractor:
+    """
+    Streaming firmware extractor
+
+    Archives are read in a single pass and members are written one at a time,
+    so size and inode budgets are enforced while extracting rather than after.
+    """
+
+    FILESYSTEM_TYPES = {
+        'tar': 'tar_archive',
+        'zip': 'zip_archive',
+        'gzip': 'gzip_stream',
+        'bzip2': 'bzip2_stream',
+        'xz': 'xz_stream',
+        'uimage': 'uimage',
+        'trx': 'trx',
+    }
+
+    def __init__(
+        self,
+        dest_dir: str,
+        budget: Optional[ExtractionBudget] = None,
+        on_member: Optional[Callable[[ExtractedMember], None]] = None,
+        on_progress: Optional[Callable[[int, int, str], None]] = None,
+        entropy: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Args:
+            dest_dir: Extraction root directory
+            budget: Size/inode limits (defaults to ExtractionBudget())
+            on_member: Called for every extracted file, e.g. to scan it in-flight
+            on_progress: Called as on_progress(files, bytes, member_path)
+            entropy: Entropy profile of the image (compute_entropy_profile);
+                lets raw images skip padding and fail fast when encrypted
+        """
+        self.dest_dir = Path(dest_dir)
+        self.budget = budget or ExtractionBudget()
+        self.on_member = on_member
+        self.on_progress = on_progress
+        self.entropy = entropy
+
+        self.members = 0
+        self.files = 0
+        self.bytes_written = 0
+        self.skipped: List[Dict[str, str]] = []
+        self.binwalk_output = ''
+        self._byte_limit = self.budget.max_total_bytes
+
+    def extract(self, firmware_file: str) -> Dict[str, Any]:
+        """
+        Extract a firmware file into dest_dir
+
+        Returns:
+            {
+                'status': 'success' | 'failed',
+                'extracted_path': Path to extracted files,
+                'total_files': Number of files extracted,
+                'filesystem_type': Detected filesystem type,
+                'format': Detected container format,
+                'bytes_extracted': Total bytes written,
+                'skipped_members': Members rejected (links, devices, unsafe paths)
+            }
+        """
+        self.dest_dir.mkdir(parents=True, exist_ok=True)
+        input_size = os.path.getsize(firmware_file)
+        self._byte_limit = min(
+            self.budget.max_total_bytes,
+            max(int(input_size * self.budget.max_ratio), 64 * 1024 * 1024)
+        )
+
+        fmt = detect_format(firmware_file)
+        logger.info(f"Extracting {firmware_file} (format={fmt})")
+
+        try:
+            extracted_path = self._extract_any(firmware_file, self.dest_dir, fmt, depth=0)
+        except ExtractionLimitExceeded as e:
+            logger.warning(f"Extraction aborted for {firmware_file}: {e}")
+            return self._failed(f"Extraction budget exceeded: {e}")
+        except EncryptedImage as e:
+            logger.warning(f"Not extracting {firmware_file}: {e}")
+            return {**self._failed(str(e)), 'encrypted': True}
+        except subprocess.TimeoutExpired:
+            return self._failed(f"Extraction timeout (>{self.budget.binwalk_timeout}s)")
+        except (tarfile.TarError, zipfile.BadZipFile, OSError, EOFError, lzma.LZMAError) as e:
+            logger.error(f"Extraction failed: {e}")
+            return self._failed(str(e))
+
+        if extracted_path is None or self.files == 0:
+            return self._failed('No files extracted from firmware')
+
+        if fmt == 'raw':
+            fs_type = detect_filesystem_type(self.binwalk_output)
+        else:
+            fs_type = self.FILESYSTEM_TYPES.get(fmt, 'unknown')
+
+        return {
+            'status': 'success',
+            'extracted_path': str(extracted_path),
+            'total_files': self.files,
+            'filesystem_type': fs_type,
+            'format': fmt,
+            'bytes_extracted': self.bytes_written,
+            'skipped_members': self.skipped[:100]
+        }
+
+    def materialise(self, member_path: str, stream, size: Optional[int]) -> Optional[Path]:
+        """
+        Write one member read from stream under dest_dir, within the budget
+
+        Returns:
+            Path of the written file, or None if the member path is unsafe
+            (recorded in skipped_members)
+
+        Raises:
+            ExtractionLimitExceeded: The member or the running total is over budget
+        """
+        target = self._safe_target(self.dest_dir, member_path)
+        if target is not None:
+            self._write_member(target, stream, size)
+        return target
+
+    def _failed(self, error: str) -> Dict[str, Any]:
+        return {
+            'status': 'failed',
+            'error': error,
+            'extracted_path': None,
+            'bytes_extracted': self.bytes_written,
+            'skipped_members': self.skipped[:100]
+        }
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+
+    def _extract_any(self, source: str, dest: Path, fmt: str, depth: int) -> Optional[Path]:
+        """Extract source into dest using the extractor for fmt"""
+        if depth > MAX_NESTING:
+            raise ExtractionLimitExceeded(f"nesting deeper than {MAX_NESTING} levels")
+
+        if fmt == 'tar':
+            self._extract_tar(source, dest)
+        elif fmt == 'zip':
+            self._extract_zip(source, dest)
+        elif fmt in COMPRESSED_STREAMS:
+            self._extract_compressed(source, dest, fmt, depth)
+        elif fmt in ('uimage', 'trx'):
+            extract = self._extract_uimage if fmt == 'uimage' else self._extract_trx
+            try:
+                extract(source, dest, depth)
+            except struct.error:
+                # The magic matched but the header is cut short
+                logger.warning(f"Truncated {fmt} header in {source}, falling back to binwalk")
+                self._skip(os.path.basename(source), f'truncated_{fmt}_header')
+                if depth:
+                    self._carve(Path(source), dest)
+                    return dest
+                return self._extract_binwalk(source, dest)
+        elif depth == 0 and self.entropy:
+            return self._extract_raw_image(source, dest)
+        else:
+            return self._extract_binwalk(source, dest)
+        return dest
+
+    def _extract_nested(self, blob: Path, depth: int):
+        """Extract a blob produced by a container extractor if it is itself a container"""
+        fmt = detect_format(str(blob))
+        nested_dest = blob.parent / f"_{blob.name}.extracted"
+        if fmt != 'raw':
+            self._extract_any(str(blob), nested_dest, fmt, depth + 1)
+            return
+        # Leave the blob in place for analysis and let binwalk carve what it can
+        self._carve(blob, nested_dest)
+
+    def _carve(self, blob: Path, dest: Path):
+        """Best-effort binwalk pass over a nested blob; failures leave the blob as is"""
+        if not shutil.which('binwalk'):
+            return
+        try:
+            self._extract_binwalk(str(blob), dest)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"binwalk could not carve {blob.name}: {e}")
+
+    # ------------------------------------------------------------------
+    # Native extractors
+    # ------------------------------------------------------------------
+
+    def _extract_tar(self, source: str, dest: Path):
+        """Single-pass streaming extraction of (compressed) tar archives"""
+        with tarfile.open(source, 'r|*') as tar:
+            for member in tar:
+                if member.isdir():
+                    target = self._safe_target(dest, member.name)
+                    if target is not None:
+                        self._count_inode(member.name)
+                        target.mkdir(parents=True, exist_ok=True)
+                    continue
+                if not member.isfile():
+                    # Symlinks, hardlinks and device nodes may point outside the
+                    # extraction root; they are recorded but never created.
+                    self._skip(member.name, 'link_or_special')
+                    continue
+                target = self._safe_target(dest, member.name)
+                if target is None:
+                    continue
+                src = tar.extractfile(member)
+                if src is None:
+                    continue
+                with src:
+                    self._write_member(target, src, member.size)
+
+    def _extract_zip(self, source: str, dest: Path):
+        """Streaming extraction of zip archives, one member at a time"""
+        with zipfile.ZipFile(source) as zf:
+            for info in zf.infolist():
+                target = self._safe_target(dest, info.filename)
+                if target is None:
+                    continue
+                if info.is_dir():
+                    self._count_inode(info.filename)
+                    target.mkdir(parents=True, exist_ok=True)
+                    continue
+                # The declared size can lie; _write_member counts real bytes too
+                if info.file_size > self.budget.max_member_bytes:
+                    raise ExtractionLimitExceeded(
+                        f"{info.filename} declares {info.file_size} bytes"
+                    )
+                with zf.open(info) as src:
+                    self._write_member(target, src, info.file_size)
+
+    def _extract_compressed(self, source: str, dest: Path, fmt: str, depth: int):
+        """Decompress a single gzip/bzip2/xz stream, then extract its payload"""
+        name = Path(source).name
+        for suffix in ('.gz', '.bz2', '.xz', '.tgz'):
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+                break
+        target = self._safe_target(dest, name or 'payload.bin')
+        with COMPRESSED_STREAMS[fmt](source, 'rb') as src:
+            self._write_member(target, src, None)
+        self._extract_nested(target, depth)
+
+    def _extract_uimage(self, source: str, dest: Path, depth: int):
+        """Split a U-Boot uImage into its (decompressed) payload and trailing data"""
+        with open(source, 'rb') as f:
+            header = f.read(UIMAGE_HEADER.size)
+            fields = UIMAGE_HEADER.unpack(header)
+            data_size = fields[3]
+            compression = UIMAGE_COMPRESSION.get(fields[10], 'unknown')
+            image_name = fields[11].split(b'\x00', 1)[0].decode('ascii', errors='ignore')
+            logger.info(f"uImage '{image_name}': {data_size} bytes, compression={compression}")
+
+            payload = _LimitedReader(f, data_size)
+            target = self._safe_target(dest, 'uimage_payload.bin')
+            if compression == 'gzip':
+                self._write_member(target, gzip.GzipFile(fileobj=payload), None)
+            elif compression == 'bzip2':
+                self._write_member(target, bz2.BZ2File(payload), None)
+            elif compression == 'lzma':
+                self._write_member(target, lzma.LZMAFile(payload, format=lzma.FORMAT_ALONE), None)
+            else:
+                self._write_member(target, payload, data_size)
+            self._extract_nested(target, depth)
+
+            # Root filesystems are commonly appended right after the kernel image
+            f.seek(UIMAGE_HEADER.size + data_size)
+            if f.read(1):
+                f.seek(UIMAGE_HEADER.size + data_size)
+                trailer = self._safe_target(dest, 'uimage_trailer.bin')
+                self._write_member(trailer, f, None)
+                self._extract_nested(trailer, depth)
+
+    def _extract_trx(self, source: str, dest: Path, depth: int):
+        """Split a Broadcom TRX image into its partitions (loader, kernel, rootfs)"""
+        with open(source, 'rb') as f:
+            fields = TRX_HEADER.unpack(f.read(TRX_HEADER.size))
+            total_len = min(fields[1], os.path.getsize(source))
+            offsets = sorted(o for o in fields[5:8] if 0 < o < total_len)
+            bounds = offsets + [total_len]
+
+            for idx, start in enumerate(offsets):
+                length = bounds[idx + 1] - start
+                if length <= 0:
+                    continue
+                f.seek(start)
+                target = self._safe_target(dest, f"trx_part{idx}.bin")
+                self._write_member(target, _LimitedReader(f, length), length)
+                self._extract_nested(target, depth)
+
+    def _extract_raw_image(self, source: str, dest: Path) -> Optional[Path]:
+        """
+        Extract a raw image guided by its entropy profile
+
+        Encrypted images are rejected without running binwalk. Images that are
+        mostly padding have each data region carved out and scanned on its own,
+        so binwalk never walks the padding; if none of the regions yields
+        anything, binwalk runs over the whole image instead.
+        """
+        profile = self.entropy
+        if profile['verdict'] == 'encrypted':
+            raise EncryptedImage(
+                f"Firmware image appears to be encrypted "
+                f"(mean entropy {profile['mean_entropy'] * 8:.2f} bits/byte, no container signatures)"
+            )
+
+        regions = data_regions(profile)
+        if profile['padding_ratio'] < PADDING_SKIP_RATIO or not regions:
+            return self._extract_binwalk(source, dest)
+
+        logger.info(
+            f"Skipping {profile['padding_ratio']:.0%} padding, scanning {len(regions)} data regions"
+        )
+        dest.mkdir(parents=True, exist_ok=True)
+        carve_dir = dest / '.regions'
+        carve_dir.mkdir(exist_ok=True)
+        deadline = time.monotonic() + self.budget.binwalk_timeout
+        extracted = 0
+
+        try:
+            for region in regions:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired('binwalk', self.budget.binwalk_timeout)
+                name = f"0x{region['start']:08x}"
+                blob = carve_dir / f"{name}.bin"
+                with open(source, 'rb') as src, open(blob, 'wb') as out:
+                    src.seek(region['start'])
+                    shutil.copyfileobj(_LimitedReader(src, region['end'] - region['start']), out, CHUNK_SIZE)
+                try:
+                    if self._extract_binwalk(str(blob), dest / f"region_{name}", timeout=remaining):
+                        extracted += 1
+                except OSError as e:
+                    logger.warning(f"binwalk found nothing in region {name}: {e}")
+                finally:
+                    blob.unlink()
+        finally:
+            shutil.rmtree(carve_dir, ignore_errors=True)
+
+        if not extracted:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired('binwalk', self.budget.binwalk_timeout)
+            logger.info("No data region could be extracted on its own, running binwalk over the whole image")
+            return self._extract_binwalk(source, dest / 'image', timeout=remaining)
+        return dest
+
+    def _extract_binwalk(self, source: str, dest: Path, timeout: Optional[float] = None) -> Optional[Path]:
+        """Fallback: carve and extract with binwalk, then account for its output"""
+        dest.mkdir(parents=True, exist_ok=True)
+        cmd = ['binwalk', '-e', '-C', str(dest), source]
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            timeout=timeout or self.budget.binwalk_timeout
+        )
+        self.binwalk_output += result.stdout
+
+        if result.returncode != 0:
+            raise OSError(result.stderr.strip() or f"binwalk exited with {result.returncode}")
+
+        # binwalk creates a '_<name>.extracted' subdirectory
+        extracted_subdirs = [d for d in dest.iterdir() if d.is_dir()]
+        if not extracted_subdirs:
+            return None
+
+        root = extracted_subdirs[0]
+        for item in root.rglob('*'):
+            if item.is_symlink() or not item.is_file():
+                continue
+            size = item.stat().st_size
+            self._account(str(item.relative_to(root)), size)
+            self._emit(ExtractedMember(str(item.relative_to(root)), str(item), size))
+        return root
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _safe_target(self, dest: Path, name: str) -> Optional[Path]:
+        """Resolve a member name under dest, rejecting absolute and traversal paths"""
+        parts = [p for p in PurePosixPath(name.replace('\\', '/')).parts if p not in ('', '.', '/')]
+        if not parts or '..' in parts:
+            self._skip(name, 'unsafe_path')
+            return None
+        return dest.joinpath(*parts)
+
+    def _skip(self, name: str, reason: str):
+        self.skipped.append({'name': name, 'reason': reason})
+
+    def _count_inode(self, name: str):
+        self.members += 1
+        if self.members > self.budget.max_members:
+            raise ExtractionLimitExceeded(f"more than {self.budget.max_members} members")
+
+    def _account(self, name: str, size: int):
+        """Charge an already-written member against the budget"""
+        self._count_inode(name)
+        self.files += 1
+        if size > self.budget.max_member_bytes:
+            raise ExtractionLimitExceeded(f"{name} exceeds {self.budget.max_member_bytes} bytes")
+        self.bytes_written += size
+        if self.bytes_written > self._byte_limit:
+            raise ExtractionLimitExceeded(f"more than {self._byte_limit} bytes extracted")
+
+    def _write_member(self, target: Path, src, declared_size: Optional[int]):
+        """Copy a member stream to disk in chunks, enforcing byte budgets as it goes"""
+        name = str(target.relative_to(self.dest_dir))
+        self._count_inode(name)
+        self.files += 1
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        keep_inline = declared_size is not None and declared_size <= self.budget.inline_scan_bytes
+        inline = io.BytesIO() if keep_inline else None
+        written = 0
+
+        with open(target, 'wb') as out:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                self.bytes_written += len(chunk)
+                if written > self.budget.max_member_bytes:
+                    raise ExtractionLimitExceeded(
+                        f"{name} exceeds {self.budget.max_member_bytes} bytes"
+                    )
+                if self.bytes_written > self._byte_limit:
+                    raise ExtractionLimitExceeded(f"more than {self._byte_limit} bytes extracted")
+                out.write(chunk)
+                if inline is not None:
+                    inline.write(chunk)
+
+        data = inline.getvalue() if inline is not None else None
+        self._emit(ExtractedMember(name, str(target), written, data))
+
+    def _emit(self, member: ExtractedMember):
+        if self.on_member:
+            try:
+                self.on_member(member)
+            except Exception as e:
+                logger.warning(f"Member callback failed for {member.path}: {e}")
+        if self.on_progress:
+            self.on_progress(self.files, self.bytes_written, member.path)
+
+
+class _LimitedReader:
+    """File-like view over the next `limit` bytes of an underlying stream"""
+
+    def __init__(self, fileobj, limit: int):
+        self._f = fileobj
+        self._remaining = limit
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b''
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def readable(self) -> bool:
+        return True
@@ -0,0 +1,152 @@
+"""
+Analysis Depth Profiles
+
+'quick', 'standard' and 'deep' are time and byte budgets for the scanning
+phases. Files are visited most interesting first (key material, configs in
+etc, binaries in bin/sbin, web roots), so when a budget runs out the
+results are partial but cover the files that matter most.
+"""
+import time
+from pathlib import Path, PurePosixPath
+from typing import Dict, Any, List, Optional, Tuple
+
+from .detectors import iter_files
+
+# time_budget in seconds, byte_budget in bytes read by the detectors (None = unlimited)
+DEPTH_PROFILES = {
+    'quick': {'time_budget': 30, 'byte_budget': 128 * 1024 * 1024},
+    'standard': {'time_budget': 300, 'byte_budget': 1024 * 1024 * 1024},
+    'deep': {'time_budget': 1800, 'byte_budget': None},
+}
+DEFAULT_DEPTH = 'standard'
+
+# Lower is scanned first
+PRIORITY_KEY_MATERIAL = 0
+PRIORITY_CONFIG = 1
+PRIORITY_BINARY = 2
+PRIORITY_WEB = 3
+PRIORITY_LIBRARY = 4
+PRIORITY_OTHER = 5
+PRIORITY_DOCS = 6
+
+KEY_MATERIAL_PATTERNS = (
+    'etc/shadow', 'etc/passwd', '*.pem', '*.key', '*.crt', '*.p12', '*.pfx',
+    '*id_rsa*', '*id_dsa*', '*id_ecdsa*', '*id_ed25519*', '*_host_*key*', '*authorized_keys',
+)
+BINARY_DIRS = {'bin', 'sbin'}
+WEB_DIRS = {'www', 'htdocs', 'web', 'webroot', 'html', 'cgi-bin', 'webs'}
+WEB_SUFFIXES = {'.cgi', '.php', '.asp', '.lua'}
+DOC_SUFFIXES = {'.txt', '.md', '.html', '.htm', '.gz', '.png', '.jpg', '.gif', '.svg', '.ico', '.css'}
+DOC_DIRS = {'doc', 'docs', 'man', 'locale', 'i18n', 'share'}
+
+
+def file_priority(rel_path: str) -> int:
+    """Rank a path by how likely it is to hold findings"""
+    path = PurePosixPath(rel_path)
+    parts = [p.lower() for p in path.parts[:-1]]
+
+    if any(path.match(pattern) for pattern in KEY_MATERIAL_PATTERNS):
+        return PRIORITY_KEY_MATERIAL
+    if 'etc' in parts:
+        return PRIORITY_CONFIG
+    if parts and parts[-1] in BINARY_DIRS:
+        return PRIORITY_BINARY
+    if WEB_DIRS.intersection(parts) or path.suffix.lower() in WEB_SUFFIXES:
+        return PRIORITY_WEB
+    if '.so' in path.suffixes or path.name.endswith('.so'):
+        return PRIORITY_LIBRARY
+    if DOC_DIRS.intersection(parts) or path.suffix.lower() in DOC_SUFFIXES:
+        return PRIORITY_DOCS
+    return PRIORITY_OTHER
+
+
+def prioritised_files(root: str) -> List[Tuple[str, Path, int]]:
+    """All regular files under root as (rel_path, path, size), most interesting first"""
+    files = []
+    for file_path in iter_files(root):
+        rel_path = str(file_path.relative_to(root))
+        try:
+            size = file_path.stat().st_size
+        except OSError:
+            continue
+        files.append((file_priority(rel_path), rel_path, file_path, size))
+    files.sort(key=lambda f: (f[0], f[1]))
+    return [(rel_path, file_path, size) for _, rel_path, file_path, size in files]
+
+
+class AnalysisBudget:
+    """Time and byte budget shared by the scanning phases of one analysis"""
+
+    def __init__(
+        self,
+        depth: str = DEFAULT_DEPTH,
+        time_budget: Optional[float] = None,
+        byte_budget: Optional[int] = None
+    ):
+        self.depth = depth
+        self.time_budget = time_budget
+        self.byte_budget = byte_budget
+        self.started = time.monotonic()
+        self.bytes_scanned = 0
+        self.files_scanned = 0
+        self.files_skipped = 0
+        self.skipped_phases: List[str] = []
+        self._exhausted_reason: Optional[str] = None
+
+    @classmethod
+    def from_params(cls, params: dict) -> 'AnalysisBudget':
+        """
+        Build the budget from params['analysis_depth'] and optional
+        params['analysis_budget'] = {time_seconds, max_mb} overrides
+        """
+        depth = params.get('analysis_depth', DEFAULT_DEPTH)
+        profile = DEPTH_PROFILES.get(depth, DEPTH_PROFILES[DEFAULT_DEPTH])
+        overrides = params.get('analysis_budget') or {}
+        time_budget = overrides.get('time_seconds', profile['time_budget'])
+        byte_budget = profile['byte_budget']
+        if overrides.get('max_mb'):
+            byte_budget = int(overrides['max_mb']) * 1024 * 1024
+        return cls(depth, time_budget, byte_budget)
+
+    def start(self):
+        """(Re)start the clock once the phases the budget covers begin"""
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def exhausted(self) -> bool:
+        if self._exhausted_reason:
+            return True
+        if self.time_budget is not None and self.elapsed >= self.time_budget:
+            self._exhausted_reason = 'time'
+        elif self.byte_budget is not None and self.bytes_scanned >= self.byte_budget:
+            self._exhausted_reason = 'bytes'
+        return self._exhausted_reason is not None
+
+    def charge(self, size: int):
+        """Account for one scanned file"""
+        self.files_scanned += 1
+        self.bytes_scanned += size
+
+    def skip(self, count: int = 1):
+        self.files_skipped += count
+
+    def skip_phase(self, phase: str):
+        self.skipped_phases.append(phase)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'depth': self.depth,
+            'time_budget': self.time_budget,
+            'byte_budget': self.byte_budget,
+            'elapsed': round(self.elapsed, 2),
+            'bytes_scanned': self.bytes_scanned,
+            'files_scanned': self.files_scanned,
+            'files_skipped': self.files_skipped,
+            'skipped_phases': self.skipped_phases,
+            'exhausted': self._exhausted_reason,
+            'partial': bool(self.files_skipped or self.skipped_phases)
+        }
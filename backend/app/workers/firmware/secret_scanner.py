@@ -0,0 +1,222 @@
+"""
+Secrets Scanner
+
+Every credential rule is compiled into a single alternation and run once per
+batch of text files. Files are recognised as text by content rather than by
+extension, so extensionless configs (etc/config/*, etc/shadow) are covered.
+Candidate values of the generic rules are scored by Shannon entropy;
+placeholders and low-entropy tokens are dropped.
+"""
+import math
+import re
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+from .aggregator import FindingsAggregator
+
+# (name, pattern, severity, description). Patterns name the secret value
+# (?P<v>...) and, for account files, the user (?P<user>...).
+SECRET_RULES = [
+    ('private_key',
+     r'-----BEGIN (?:RSA |EC |DSA |OPENSSH |ENCRYPTED )?PRIVATE KEY-----',
+     'CRITICAL', 'Embedded private key'),
+    ('aws_key',
+     r'\b(?P<v>AKIA[0-9A-Z]{16})\b',
+     'CRITICAL', 'AWS access key ID'),
+    ('aws_secret',
+     r'(?i:aws_?secret_?access_?key)\s*[:=]\s*["\']?(?P<v>[A-Za-z0-9/+=]{40})',
+     'CRITICAL', 'AWS secret access key'),
+    ('jwt',
+     r'\b(?P<v>eyJ[A-Za-z0-9_-]{8,}\.eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,})',
+     'HIGH', 'JSON Web Token'),
+    ('empty_password',
+     r'(?m:^(?P<user>[a-z_][a-z0-9_.-]{0,31})::\d*:)',
+     'CRITICAL', 'Account without a password'),
+    ('shadow_hash',
+     r'(?m:^(?P<user>[a-z_][a-z0-9_.-]{0,31}):(?P<v>\$(?:1|2[abxy]?|5|6|y|md5)\$[^:\s]{8,}|[A-Za-z0-9./]{13}):)',
+     'HIGH', 'Password hash'),
+    ('password',
+     r'(?i:pass(?:word|wd))\s*[:=]\s*["\']?(?P<v>[^"\'\s]{4,})["\']?',
+     'HIGH', None),
+    ('config_password',
+     r'(?m:^[ \t]*option[ \t]+(?:password|passwd|key|psk|secret)[ \t]+["\'](?P<v>[^"\'\n]{4,})["\'])',
+     'HIGH', 'Password in UCI configuration'),
+    ('api_key',
+     r'(?i:api[_-]?key)\s*[:=]\s*["\']?(?P<v>[a-zA-Z0-9_\-]{20,})["\']?',
+     'HIGH', None),
+    ('secret',
+     r'(?i:secret)\s*[:=]\s*["\']?(?P<v>[^"\'\s]{10,})["\']?',
+     'MEDIUM', None),
+    ('token',
+     r'(?i:token)\s*[:=]\s*["\']?(?P<v>[a-zA-Z0-9_\-.]{20,})["\']?',
+     'MEDIUM', None),
+]
+
+# Generic assignment rules whose values are entropy-scored
+GENERIC_RULES = {'password', 'config_password', 'api_key', 'secret', 'token'}
+# Below this many bits per character a key/token/secret value is a word, not a secret
+MIN_TOKEN_ENTROPY = 3.0
+
+# Known formats a generic value can turn out to be
+VALUE_FORMATS = [
+    ('aws_key', re.compile(r'AKIA[0-9A-Z]{16}')),
+    ('jwt', re.compile(r'eyJ[A-Za-z0-9_-]{8,}\.eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,}')),
+]
+
+PLACEHOLDER_RE = re.compile(
+    r'^(?:[$%<{@]|\*+$|x+$|\.+$|(?:none|null|nil|true|false|changeme|example|your_?\w*|xxx\w*)$)',
+    re.IGNORECASE
+)
+
+
+def _compile_rules() -> Tuple[re.Pattern, Dict[str, Tuple[str, str, Optional[str]]]]:
+    parts = []
+    rules = {}
+    for name, pattern, severity, description in SECRET_RULES:
+        pattern = pattern.replace('(?P<v>', f'(?P<v_{name}>').replace('(?P<user>', f'(?P<u_{name}>')
+        parts.append(f'(?P<r_{name}>{pattern})')
+        rules[f'r_{name}'] = (name, severity, description)
+    return re.compile('|'.join(parts)), rules
+
+
+SECRETS_SCANNER, _RULES = _compile_rules()
+
+# Printable ASCII plus common whitespace/escape bytes
+_TEXT_BYTES = bytes(range(0x20, 0x7f)) + b'\t\n\r\f\b\x1b'
+SNIFF_BYTES = 8192
+MAX_CONTROL_RATIO = 0.05
+
+# Files are separated so that line anchors and matches never span two files
+BATCH_SEPARATOR = '\n\x00\n'
+BATCH_BYTES = 4 * 1024 * 1024
+BATCH_FILES = 256
+
+
+def looks_like_text(head: bytes) -> bool:
+    """Content sniffing: no NUL bytes and few control characters (UTF-8 allowed)"""
+    if not head or b'\x00' in head:
+        return False
+    binary = head.translate(None, _TEXT_BYTES)
+    # Bytes >= 0x80 are fine as long as the sample decodes as UTF-8
+    high = sum(1 for b in binary if b >= 0x80)
+    if high:
+        try:
+            head.decode('utf-8')
+        except UnicodeDecodeError as e:
+            # A multi-byte sequence cut off at the end of the sample is fine
+            if e.start < len(head) - 4:
+                return False
+    return (len(binary) - high) <= MAX_CONTROL_RATIO * len(head)
+
+
+def shannon_entropy(value: str) -> float:
+    """Shannon entropy in bits per character"""
+    if not value:
+        return 0.0
+    length = len(value)
+    return -sum(count / length * math.log2(count / length) for count in Counter(value).values())
+
+
+def _confidence(entropy: float) -> str:
+    if entropy >= 4.0:
+        return 'high'
+    if entropy >= MIN_TOKEN_ENTROPY:
+        return 'medium'
+    return 'low'
+
+
+def evaluate_match(match: re.Match, rel_path: str) -> Optional[Dict[str, Any]]:
+    """Turn a match of the combined scanner into a finding, or None if it is noise"""
+    name, severity, description = _RULES[match.lastgroup]
+    value = match.group(f'v_{name}') if f'v_{name}' in match.re.groupindex else None
+    matched = match.group(match.lastgroup)
+
+    if value is not None and name in GENERIC_RULES:
+        if PLACEHOLDER_RE.match(value):
+            return None
+        # A generic assignment may hold a key of a known format
+        for format_name, regex in VALUE_FORMATS:
+            if regex.fullmatch(value):
+                name, severity, description = _RULES[f'r_{format_name}']
+                break
+        else:
+            entropy = shannon_entropy(value)
+            if name not in ('password', 'config_password') and entropy < MIN_TOKEN_ENTROPY:
+                return None
+            return _finding(name, severity, description, rel_path, matched, entropy, _confidence(entropy))
+
+    entropy = shannon_entropy(value) if value else 0.0
+    finding = _finding(name, severity, description, rel_path, matched, entropy, 'high')
+    user_group = f'u_{name}'
+    if user_group in match.re.groupindex and match.group(user_group):
+        finding['user'] = match.group(user_group)
+    return finding
+
+
+def _finding(
+    name: str,
+    severity: str,
+    description: Optional[str],
+    rel_path: str,
+    matched: str,
+    entropy: float,
+    confidence: str
+) -> Dict[str, Any]:
+    return {
+        'type': f'hardcoded_{name}',
+        'severity': severity,
+        'file': rel_path,
+        'matched': matched[:100],  # Limit length
+        'description': description or f'Potential hardcoded {name} detected',
+        'entropy': round(entropy, 2),
+        'confidence': confidence
+    }
+
+
+class SecretsScanner:
+    """
+    Batching front end of the combined scanner
+
+    Text files are queued and scanned BATCH_FILES / BATCH_BYTES at a time with
+    one finditer over their concatenation; findings go into the aggregator.
+    """
+
+    def __init__(self, aggregator: FindingsAggregator):
+        self.aggregator = aggregator
+        self.files_scanned = 0
+        self._paths: List[str] = []
+        self._texts: List[str] = []
+        self._bytes = 0
+
+    def add(self, rel_path: str, content: bytes) -> bool:
+        """Queue a file if it sniffs as text; returns whether it was queued"""
+        if not looks_like_text(content[:SNIFF_BYTES]):
+            return False
+        self._paths.append(rel_path)
+        self._texts.append(content.decode('utf-8', errors='ignore'))
+        self._bytes += len(content)
+        self.files_scanned += 1
+        if len(self._paths) >= BATCH_FILES or self._bytes >= BATCH_BYTES:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Scan everything queued so far"""
+        if not self._texts:
+            return
+        starts = []
+        offset = 0
+        for text in self._texts:
+            starts.append(offset)
+            offset += len(text) + len(BATCH_SEPARATOR)
+
+        batch = BATCH_SEPARATOR.join(self._texts)
+        for match in SECRETS_SCANNER.finditer(batch):
+            rel_path = self._paths[bisect_right(starts, match.start()) - 1]
+            finding = evaluate_match(match, rel_path)
+            if finding:
+                self.aggregator.add(finding['type'], finding['matched'], finding, finding['severity'])
+
+        self._paths, self._texts, self._bytes = [], [], 0
+
@@ -0,0 +1,241 @@
+"""
+Streaming Archive Analysis
+
+Iterates over tar/zip members as streams and feeds them straight into the
+detectors without extracting the archive. Only members a later phase needs
+on disk (ELF binaries by default) are materialised.
+"""
+import tarfile
+import zipfile
+import logging
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterator, List, Optional
+
+from .extractors import (
+    CHUNK_SIZE,
+    ExtractionBudget,
+    ExtractionLimitExceeded,
+    FirmwareExtractor,
+    detect_format,
+)
+from .detectors import MemberScanner
+
+logger = logging.getLogger(__name__)
+
+STREAMABLE_FORMATS = {'tar', 'zip'}
+
+MAGIC_ELF = b'\x7fELF'
+
+
+def is_elf(rel_path: str, head: bytes) -> bool:
+    """Default materialisation predicate: keep ELF binaries for deeper analysis"""
+    return head.startswith(MAGIC_ELF)
+
+
+class ArchiveMember:
+    """A regular file inside an archive, readable once as a stream"""
+
+    __slots__ = ('path', 'size', 'stream')
+
+    def __init__(self, path: str, size: int, stream):
+        self.path = path
+        self.size = size
+        self.stream = stream
+
+
+def iter_archive_members(firmware_file: str, fmt: Optional[str] = None) -> Iterator[Any]:
+    """
+    Yield ('dir', path) for directories and ArchiveMember objects for regular
+    files, in archive order. Links and special files are skipped.
+    """
+    fmt = fmt or detect_format(firmware_file)
+
+    if fmt == 'tar':
+        with tarfile.open(firmware_file, 'r|*') as tar:
+            for member in tar:
+                if member.isdir():
+                    yield ('dir', member.name)
+                elif member.isfile():
+                    stream = tar.extractfile(member)
+                    if stream is not None:
+                        with stream:
+                            yield ArchiveMember(member.name, member.size, stream)
+    elif fmt == 'zip':
+        with zipfile.ZipFile(firmware_file) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    yield ('dir', info.filename)
+                    continue
+                with zf.open(info) as stream:
+                    yield ArchiveMember(info.filename, info.file_size, stream)
+    else:
+        raise ValueError(f"Streaming analysis not supported for format: {fmt}")
+
+
+class StreamingAnalyzer:
+    """
+    Extraction-free analysis of tar/zip firmware bundles
+
+    Each member is read at most once. Members matching `materialise` are
+    written under materialise_dir (preserving relative paths) so later phases
+    can work on them; everything else never touches the disk, so any phase
+    that needs the other members (e.g. component fingerprinting) has to be
+    passed in as a consumer.
+    """
+
+    def __init__(
+        self,
+        scanner: MemberScanner,
+        materialise_dir: str,
+        budget: Optional[ExtractionBudget] = None,
+        materialise: Callable[[str, bytes], bool] = is_elf,
+        on_progress: Optional[Callable[[int, int, str], None]] = None,
+        consumers: Optional[List[Any]] = None
+    ):
+        """
+        Args:
+            consumers: Additional scanners with the MemberScanner scan()
+                interface (e.g. ComponentScanner) fed every member
+        """
+        self.scanner = scanner
+        self.consumers = list(consumers or [])
+        self.materialise_dir = Path(materialise_dir)
+        self.budget = budget or ExtractionBudget()
+        self.materialise = materialise
+        self.on_progress = on_progress
+
+        # Reuse the extractor's path sanitising and budget accounting
+        self._sink = FirmwareExtractor(materialise_dir, budget=self.budget)
+
+        self.total_files = 0
+        self.total_dirs = 0
+        self.bytes_read = 0
+        self.materialised = 0
+
+    def analyze(self, firmware_file: str) -> Dict[str, Any]:
+        """
+        Stream an archive through the scanner
+
+        Returns:
+            Extraction-compatible dict; 'extracted_path' points at the
+            directory holding the materialised members
+        """
+        fmt = detect_format(firmware_file)
+        self.materialise_dir.mkdir(parents=True, exist_ok=True)
+
+        try:
+            for entry in iter_archive_members(firmware_file, fmt):
+                if isinstance(entry, tuple):
+                    self.total_dirs += 1
+                    continue
+                self._scan_member(entry)
+        except ExtractionLimitExceeded as e:
+            logger.warning(f"Streaming analysis aborted for {firmware_file}: {e}")
+            return {
+                'status': 'failed',
+                'error': f"Extraction budget exceeded: {e}",
+                'extracted_path': None
+            }
+        except (tarfile.TarError, zipfile.BadZipFile, OSError, EOFError, ValueError) as e:
+            logger.error(f"Streaming analysis failed: {e}")
+            return {'status': 'failed', 'error': str(e), 'extracted_path': None}
+
+        if self.total_files == 0:
+            return {
+                'status': 'failed',
+                'error': 'No files found in archive',
+                'extracted_path': None
+            }
+
+        return {
+            'status': 'success',
+            'mode': 'stream',
+            'extracted_path': str(self.materialise_dir),
+            'total_files': self.total_files,
+            'filesystem_type': FirmwareExtractor.FILESYSTEM_TYPES.get(fmt, 'unknown'),
+            'format': fmt,
+            'bytes_scanned': self.bytes_read,
+            'materialised_files': self.materialised,
+            'skipped_members': self._sink.skipped[:100],
+            'filesystem_info': {
+                'total_files': self.total_files,
+                'total_directories': self.total_dirs,
+                'total_size': self.bytes_read,
+                'total_size_mb': round(self.bytes_read / (1024 * 1024), 2)
+            }
+        }
+
+    def _scan_member(self, member: ArchiveMember):
+        self.total_files += 1
+        if self.total_files > self.budget.max_members:
+            raise ExtractionLimitExceeded(f"more than {self.budget.max_members} members")
+        if member.size > self.budget.max_member_bytes:
+            raise ExtractionLimitExceeded(
+                f"{member.path} exceeds {self.budget.max_member_bytes} bytes"
+            )
+
+        rel_path = '/'.join(p for p in member.path.replace('\\', '/').split('/') if p not in ('', '.'))
+        head = member.stream.read(min(member.size, CHUNK_SIZE)) if member.size else b''
+
+        if self.materialise(rel_path, head):
+            target = self._sink.materialise(member.path, _Prefixed(head, member.stream), member.size)
+            if target is not None:
+                self.materialised += 1
+                self.bytes_read += member.size
+
+                def read_from_disk() -> bytes:
+                    with open(target, 'rb') as f:
+                        return f.read()
+
+                self._feed(rel_path, member.size, read_from_disk)
+                self._report(rel_path)
+                return
+
+        content = [head]
+
+        def read_from_stream() -> bytes:
+            # Only called by the scanner while this member is current
+            if len(content) == 1 and len(head) < member.size:
+                content.append(member.stream.read())
+            return b''.join(content)
+
+        self._feed(rel_path, member.size, read_from_stream)
+        self.bytes_read += member.size
+        self._report(rel_path)
+
+    def _feed(self, rel_path: str, size: int, read_content: Callable[[], bytes]):
+        """Hand a member to the scanner and every consumer, reading it at most once"""
+        content: List[bytes] = []
+
+        def read_once() -> bytes:
+            if not content:
+                content.append(read_content())
+            return content[0]
+
+        self.scanner.scan(rel_path, size, read_once)
+        for consumer in self.consumers:
+            consumer.scan(rel_path, size, read_once)
+
+    def _report(self, rel_path: str):
+        if self.on_progress:
+            self.on_progress(self.total_files, self.bytes_read, rel_path)
+
+
+class _Prefixed:
+    """Stream that replays already-read leading bytes before the rest"""
+
+    def __init__(self, head: bytes, stream):
+        self._head = head
+        self._stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        if self._head:
+            if size < 0 or size >= len(self._head):
+                data, self._head = self._head, b''
+                if size >= 0:
+                    size -= len(data)
+                    return data + (self._stream.read(size) if size else b'')
+                return data + self._stream.read()
+            data, self._head = self._head[:size], self._head[size:]
+            return data
+        return self._stream.read(size)
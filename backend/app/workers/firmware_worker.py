@@ -4,16 +4,40 @@ Firmware Analysis Worker
 Provides firmware unpacking, filesystem analysis, and security scanning for IoT devices.
 """
 import os
-import subprocess
 import logging
-import re
 import time
 from pathlib import Path
-from typing import Dict, Any, List, Callable
-import shutil
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+from app.core.task_executor import task_executor
+from app.services.workspace import KIND_EXTRACT, WorkspaceQuotaExceeded, workspace_manager
+from app.workers.firmware import (
+    ComponentScanner,
+    ExtractionBudget,
+    ExtractedMember,
+    FirmwareExtractor,
+    MemberScanner,
+    StreamingAnalyzer,
+    build_cyclonedx_sbom,
+    build_elf_inventory,
+    compute_entropy_profile,
+    fingerprint_components,
+    get_elf_cache,
+    detect_format,
+)
+from app.workers.firmware.streaming import STREAMABLE_FORMATS
+from app.workers.firmware.aggregator import SEVERITY_RANK
+from app.workers.firmware.profiles import AnalysisBudget, prioritised_files
+from app.workers.vuln_scan import lookup_component_cves
 
 logger = logging.getLogger(__name__)
 
+# Minimum seconds between extraction progress log entries
+PROGRESS_INTERVAL = 2.0
+
+# Parallel ELF header parsers
+ELF_WORKERS = 8
+
 
 def firmware_worker(
     task_id: str,
@@ -27,8 +51,16 @@ def firmware_worker(
         task_id: Task UUID
         params: {
             'firmware_file': Path to uploaded firmware file
-            'analysis_depth': 'quick' | 'standard' | 'deep'
+            'analysis_depth': 'quick' | 'standard' | 'deep' - time/byte budget profile
+            'analysis_budget': Optional {time_seconds, max_mb} overrides of the profile
             'scan_types': List of scan types to perform
+                ('strings', 'credentials', 'crypto', 'binaries', 'components', 'vulnerabilities')
+            'scan_during_extraction': Scan members while they are extracted
+            'extraction_mode': 'extract' (default) | 'stream' - stream tar/zip
+                members straight into the detectors without extracting them
+            'extraction_budget': Optional size/inode limits (see ExtractionBudget)
+            'severity_filter': CVE severities to report (vulnerabilities scan)
+            'nvd_api_key': Optional NVD API key (vulnerabilities scan)
         }
         progress_callback: Function to report progress
     
@@ -40,23 +72,80 @@ def firmware_worker(
     firmware_file = params.get('firmware_file')
     analysis_depth = params.get('analysis_depth', 'standard')
     scan_types = params.get('scan_types', ['strings', 'credentials', 'crypto'])
+    scan_during_extraction = params.get('scan_during_extraction', False)
+    extraction_mode = params.get('extraction_mode', 'extract')
     
     if not firmware_file or not os.path.exists(firmware_file):
         raise ValueError(f"Firmware file not found: {firmware_file}")
     
+    # Time/byte budget of the scanning phases (see DEPTH_PROFILES); its clock
+    # starts once scanning does, not while the image is profiled or extracted
+    analysis_budget = AnalysisBudget.from_params(params)
+    
+    # The upload must survive evictions made to fit this task's extraction
+    workspace_manager.pin_path(firmware_file)
+    
     results = {
         'firmware_info': {},
         'extraction': {},
         'findings': [],
         'strings': {},
         'crypto': {},
-        'vulnerabilities': []
+        'vulnerabilities': [],
+        'binaries': {},
+        'entropy': {},
+        'components': [],
+        'sbom': {},
+        'totals': {}
     }
     
     try:
+        # Phase 0: Entropy map of the raw image
+        progress_callback(5, "Computing entropy profile...", "INFO", {})
+        entropy_profile = compute_entropy_profile(firmware_file)
+        results['entropy'] = entropy_profile
+        if entropy_profile['verdict'] == 'encrypted':
+            progress_callback(8, "Firmware image appears to be encrypted", "WARNING", {
+                'mean_entropy': entropy_profile['mean_entropy']
+            })
+        
         # Phase 1: Extract firmware
-        progress_callback(10, "Extracting firmware with binwalk...", "INFO", {})
-        extraction_result = extract_firmware(firmware_file, task_id)
+        budget = ExtractionBudget.from_params(params)
+        stream_mode = extraction_mode == 'stream' and detect_format(firmware_file) in STREAMABLE_FORMATS
+        if extraction_mode == 'stream' and not stream_mode:
+            progress_callback(10, "Streaming mode only supports tar/zip bundles, extracting instead", "WARNING", {})
+        
+        wants_components = 'components' in scan_types or 'vulnerabilities' in scan_types
+        component_scanner = None
+        if stream_mode or scan_during_extraction:
+            # Members are scanned as they are extracted
+            analysis_budget.start()
+        if stream_mode:
+            progress_callback(10, "Streaming archive members into detectors...", "INFO", {})
+            scanner = MemberScanner(scan_types, analysis_budget)
+            # Only ELF members reach the disk, so package DBs and version
+            # files have to be fingerprinted while they stream past
+            if wants_components:
+                component_scanner = ComponentScanner(should_stop=lambda: analysis_budget.exhausted)
+            extraction_result = stream_firmware(
+                firmware_file,
+                task_id,
+                scanner,
+                budget=budget,
+                progress_callback=progress_callback,
+                consumers=[component_scanner] if component_scanner else None
+            )
+        else:
+            progress_callback(10, "Extracting firmware...", "INFO", {})
+            scanner = MemberScanner(scan_types, analysis_budget) if scan_during_extraction else None
+            extraction_result = extract_firmware(
+                firmware_file,
+                task_id,
+                budget=budget,
+                on_member=_inline_scan_callback(scanner) if scanner else None,
+                progress_callback=progress_callback,
+                entropy=entropy_profile
+            )
         results['extraction'] = extraction_result
         results['firmware_info'] = get_firmware_info(firmware_file)
         
@@ -65,41 +154,105 @@ def firmware_worker(
             return results
         
         extracted_path = extraction_result['extracted_path']
+        if not scanner:
+            analysis_budget.start()
         
-        # Phase 2: Analyze filesystem
-        progress_callback(30, "Analyzing filesystem structure...", "INFO", {})
-        filesystem_info = analyze_filesystem(extracted_path)
-        results['extraction']['filesystem_info'] = filesystem_info
+        # Phase 2: Analyze filesystem (streaming mode collects it from member headers)
+        if not stream_mode:
+            progress_callback(30, "Analyzing filesystem structure...", "INFO", {})
+            filesystem_info = analyze_filesystem(extracted_path)
+            results['extraction']['filesystem_info'] = filesystem_info
         
-        # Phase 3: Scan for sensitive files
-        if 'credentials' in scan_types:
-            progress_callback(40, "Scanning for sensitive files...", "INFO", {})
-            sensitive_findings = scan_sensitive_files(extracted_path)
-            results['findings'].extend(sensitive_findings)
+        files = prioritised_files(extracted_path)
+        if not scanner:
+            # Phases 3-6: sensitive files, strings, credentials, crypto in one
+            # pass over the tree, most interesting files first
+            progress_callback(40, f"Scanning {len(files)} files ({analysis_depth} profile)...", "INFO", {})
+            scanner = MemberScanner(scan_types, analysis_budget)
+            scan_filesystem(files, scanner, progress_callback)
+        else:
+            progress_callback(70, f"Scanned {scanner.files_scanned} files during extraction", "INFO", {})
         
-        # Phase 4: Extract strings
+        scan_results = scanner.results()
+        results['findings'].extend(scan_results['findings'])
         if 'strings' in scan_types:
-            progress_callback(60, "Extracting strings...", "INFO", {})
-            strings_result = extract_strings_from_binaries(extracted_path, analysis_depth)
-            results['strings'] = strings_result
+            results['strings'] = scan_results['strings']
+        results['totals'] = scan_results['totals']
+        if 'crypto' in scan_types:
+            results['crypto'] = scan_results['crypto']
         
-        # Phase 5: Detect credentials
-        if 'credentials' in scan_types:
-            progress_callback(70, "Detecting hardcoded credentials...", "INFO", {})
-            credential_findings = detect_credentials(extracted_path)
-            results['findings'].extend(credential_findings)
+        # Phase 7: ELF binary inventory and hardening checks
+        if 'binaries' in scan_types:
+            if analysis_budget.exhausted:
+                analysis_budget.skip_phase('binaries')
+            else:
+                progress_callback(90, "Checking ELF binary hardening...", "INFO", {})
+                results['binaries'] = build_elf_inventory(
+                    extracted_path,
+                    cache=get_elf_cache(task_executor.redis_sync),
+                    max_workers=ELF_WORKERS,
+                    files=[file_path for _, file_path, _ in files],
+                    should_stop=lambda: analysis_budget.exhausted
+                )
+                summary = results['binaries']['summary']
+                progress_callback(
+                    92,
+                    f"Inventoried {summary['total']} ELF binaries "
+                    f"({summary['no_nx']} without NX, {summary['no_canary']} without stack canary)",
+                    "INFO",
+                    summary
+                )
         
-        # Phase 6: Scan crypto material
-        if 'crypto' in scan_types:
-            progress_callback(85, "Scanning for cryptographic material...", "INFO", {})
-            crypto_result = scan_crypto_material(extracted_path)
-            results['crypto'] = crypto_result
+        # Phase 8: Component fingerprinting and known vulnerabilities
+        if wants_components and component_scanner is None and analysis_budget.exhausted:
+            analysis_budget.skip_phase('components')
+        elif wants_components:
+            if component_scanner is not None:
+                components = component_scanner.components()
+                coverage = {'mode': 'stream', **component_scanner.coverage()}
+                results['component_coverage'] = coverage
+                if coverage['partial']:
+                    progress_callback(
+                        93,
+                        f"Budget exhausted while streaming: {coverage['files_skipped']} of "
+                        f"{coverage['files_seen']} members not fingerprinted, SBOM is partial",
+                        "WARNING",
+                        coverage
+                    )
+            else:
+                progress_callback(93, "Fingerprinting software components...", "INFO", {})
+                components = fingerprint_components(
+                    extracted_path,
+                    files=[file_path for _, file_path, _ in files],
+                    should_stop=lambda: analysis_budget.exhausted
+                )
+            results['components'] = components
+            progress_callback(94, f"Identified {len(components)} components", "INFO", {})
+            
+            if 'vulnerabilities' in scan_types and components:
+                progress_callback(95, "Checking for known vulnerabilities...", "INFO", {})
+                results['vulnerabilities'] = scan_component_vulnerabilities(
+                    components,
+                    severity_filter=params.get('severity_filter', ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']),
+                    api_key=params.get('nvd_api_key'),
+                    progress_callback=progress_callback
+                )
+            
+            results['sbom'] = build_cyclonedx_sbom(
+                components,
+                os.path.basename(firmware_file),
+                results['vulnerabilities']
+            )
         
-        # Phase 7: Known vulnerabilities (if requested)
-        if 'vulnerabilities' in scan_types:
-            progress_callback(95, "Checking for known vulnerabilities...", "INFO", {})
-            # TODO: Implement CVE scanning
-            pass
+        results['analysis_budget'] = analysis_budget.summary()
+        if results['analysis_budget']['partial']:
+            progress_callback(
+                99,
+                f"'{analysis_depth}' budget exhausted: partial results, "
+                f"{analysis_budget.files_skipped} files not scanned",
+                "WARNING",
+                results['analysis_budget']
+            )
         
         progress_callback(100, f"Analysis complete: {len(results['findings'])} findings", "INFO", {})
         
@@ -107,13 +260,26 @@ def firmware_worker(
         logger.error(f"Firmware analysis failed: {e}", exc_info=True)
         progress_callback(100, f"Analysis failed: {str(e)}", "ERROR", {})
         raise
+    finally:
+        # Keep the tree for reuse until the retention policy evicts it
+        workspace_manager.release(KIND_EXTRACT, task_id)
+        workspace_manager.unpin_path(firmware_file)
     
     return results
 
 
-def extract_firmware(firmware_file: str, task_id: str) -> Dict[str, Any]:
+def extract_firmware(
+    firmware_file: str,
+    task_id: str,
+    budget: Optional[ExtractionBudget] = None,
+    on_member: Optional[Callable[[ExtractedMember], None]] = None,
+    progress_callback: Optional[Callable] = None,
+    entropy: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
     """
-    Extract firmware using binwalk or tar (for .tar/.tar.gz files)
+    Extract firmware with the in-process streaming extractors
+    (tar, gzip, zip, uImage, TRX), falling back to binwalk; raw images
+    use the entropy profile to skip padding and reject encrypted data
     
     Returns:
         {
@@ -124,100 +290,162 @@ def extract_firmware(firmware_file: str, task_id: str) -> Dict[str, Any]:
         }
     """
     try:
-        # Create extraction directory
-        extract_dir = f"/tmp/firmware_extracted/{task_id}"
-        os.makedirs(extract_dir, exist_ok=True)
-        
-        # Check if it's a tar/tar.gz file (try tar first for ALL gzipped files)
-        import tarfile
-        firmware_path = Path(firmware_file)
-        
-        # Try to detect if it's a tar archive by attempting to open it
-        is_tar_archive = False
-        try:
-            with tarfile.open(firmware_file, 'r:*') as tar:
-                # If successful, it's a tar archive
-                is_tar_archive = True
-        except (tarfile.TarError, OSError):
-            # Not a tar archive, will use binwalk
-            pass
-        
-        if is_tar_archive or firmware_path.suffix in ['.tar', '.tgz'] or firmware_path.name.endswith('.tar.gz'):
-            # Extract tar archive directly
-            logger.info(f"Extracting tar archive: {firmware_file}")
-            with tarfile.open(firmware_file, 'r:*') as tar:
-                tar.extractall(path=extract_dir)
-            
-            # Count extracted files
-            total_files = sum(1 for _ in Path(extract_dir).rglob('*') if _.is_file())
-            
-            if total_files == 0:
-                return {
-                    'status': 'failed',
-                    'error': 'No files extracted from tar archive',
-                    'extracted_path': None
-                }
-            
-            return {
-                'status': 'success',
-                'extracted_path': extract_dir,
-                'total_files': total_files,
-                'filesystem_type': 'tar_archive'
-            }
-        
-        # Use binwalk for firmware images (.bin, .img, etc.)
-        cmd = ['binwalk', '-e', '-C', extract_dir, firmware_file]
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minutes timeout
+        extract_dir, budget = _allocate_workspace(task_id, budget)
+        extractor = FirmwareExtractor(
+            extract_dir,
+            budget=budget,
+            on_member=on_member,
+            on_progress=_member_progress(progress_callback, "Extracted"),
+            entropy=entropy
         )
-        
-        if result.returncode != 0:
-            return {
-                'status': 'failed',
-                'error': result.stderr,
-                'extracted_path': None
-            }
-        
-        # Find the extracted directory (binwalk creates subdirectory)
-        extracted_subdirs = [d for d in Path(extract_dir).iterdir() if d.is_dir()]
-        if not extracted_subdirs:
-            return {
-                'status': 'failed',
-                'error': 'No extracted files found',
-                'extracted_path': None
-            }
-        
-        actual_extract_path = str(extracted_subdirs[0])
-        
-        # Count extracted files
-        total_files = sum(1 for _ in Path(actual_extract_path).rglob('*') if _.is_file())
-        
-        # Detect filesystem type from binwalk output
-        fs_type = detect_filesystem_type(result.stdout)
-        
-        return {
-            'status': 'success',
-            'extracted_path': actual_extract_path,
-            'total_files': total_files,
-            'filesystem_type': fs_type
-        }
-        
-    except subprocess.TimeoutExpired:
+        return extractor.extract(firmware_file)
+    except Exception as e:
+        logger.error(f"Extraction failed: {e}")
         return {
             'status': 'failed',
-            'error': 'Extraction timeout (>5min)',
+            'error': str(e),
             'extracted_path': None
         }
-    except Exception as e:
-        logger.error(f"Extraction failed: {e}")
+
+
+def stream_firmware(
+    firmware_file: str,
+    task_id: str,
+    scanner: MemberScanner,
+    budget: Optional[ExtractionBudget] = None,
+    progress_callback: Optional[Callable] = None,
+    consumers: Optional[List[Any]] = None
+) -> Dict[str, Any]:
+    """
+    Analyze a tar/zip bundle without extracting it
+    
+    Members are fed to the scanner (and any extra consumers, such as a
+    ComponentScanner) as streams; only ELF binaries are written to disk so
+    later phases can analyze them.
+    
+    Returns:
+        Same shape as extract_firmware, plus 'filesystem_info'
+    """
+    try:
+        materialise_dir, budget = _allocate_workspace(task_id, budget)
+    except WorkspaceQuotaExceeded as e:
+        logger.error(f"Streaming analysis failed: {e}")
         return {
             'status': 'failed',
             'error': str(e),
             'extracted_path': None
         }
+    analyzer = StreamingAnalyzer(
+        scanner,
+        materialise_dir,
+        budget=budget,
+        on_progress=_member_progress(progress_callback, "Scanned"),
+        consumers=consumers
+    )
+    return analyzer.analyze(firmware_file)
+
+
+def _allocate_workspace(
+    task_id: str,
+    budget: Optional[ExtractionBudget]
+) -> Tuple[str, ExtractionBudget]:
+    """
+    Allocate the task's extraction workspace and cap the budget at its quota
+    
+    Raises:
+        WorkspaceQuotaExceeded: No room left even after evicting old workspaces
+    """
+    budget = budget or ExtractionBudget()
+    workspace = workspace_manager.allocate(
+        KIND_EXTRACT,
+        task_id,
+        reserve_bytes=budget.max_total_bytes,
+        reserve_inodes=budget.max_members
+    )
+    budget.max_total_bytes = workspace.reserved_bytes
+    budget.max_members = workspace.reserved_inodes
+    return str(workspace.path), budget
+
+
+def _member_progress(
+    progress_callback: Optional[Callable],
+    verb: str,
+    progress: int = 15
+) -> Callable[[int, int, str], None]:
+    """Per-member progress hook that throttles what ends up in the task log"""
+    last_report = [0.0]
+    
+    def on_progress(files: int, bytes_done: int, member_path: str):
+        now = time.time()
+        if progress_callback and now - last_report[0] >= PROGRESS_INTERVAL:
+            last_report[0] = now
+            progress_callback(
+                progress,
+                f"{verb} {files} files ({bytes_done / (1024 * 1024):.1f} MB): {member_path}",
+                "INFO",
+                {'files': files, 'bytes': bytes_done, 'current': member_path}
+            )
+    return on_progress
+
+
+def _inline_scan_callback(scanner: MemberScanner) -> Callable[[ExtractedMember], None]:
+    """Adapt a MemberScanner to the extractor's per-member callback"""
+    def on_member(member: ExtractedMember):
+        def read_content() -> bytes:
+            if member.data is not None:
+                return member.data
+            with open(member.abs_path, 'rb') as f:
+                return f.read()
+        scanner.scan(member.path, member.size, read_content)
+    return on_member
+
+
+def scan_component_vulnerabilities(
+    components: List[Dict[str, Any]],
+    severity_filter: List[str],
+    api_key: Optional[str] = None,
+    progress_callback: Optional[Callable] = None
+) -> List[Dict[str, Any]]:
+    """
+    Look up CVEs for fingerprinted components
+
+    Goes through the same NVD lookup and filtering as vuln_scan_worker, with
+    one query per unique (product, version) rather than per file. The CPE the
+    fingerprint already carries is queried as is instead of being re-resolved
+    from the product name.
+    """
+    queries = {
+        comp['purl']: (comp['product'].replace('_', ' '), comp['version'], comp.get('cpe'))
+        for comp in components
+    }
+
+    def on_lookup(done: int, total: int, product: str, version: str):
+        if progress_callback:
+            progress_callback(95, f"Looked up CVEs for {product} {version} ({done}/{total})", "INFO", {})
+
+    cves_by_query = lookup_component_cves(
+        list(queries.values()), severity_filter, api_key=api_key, progress_callback=on_lookup
+    )
+
+    vulnerabilities = []
+    for comp in components:
+        for cve in cves_by_query.get(queries[comp['purl']], []):
+            vulnerabilities.append({
+                'cve_id': cve['cve_id'],
+                'severity': cve['severity'],
+                'cvss_score': cve.get('cvss_score'),
+                'cvss_vector': cve.get('cvss_vector'),
+                'description': cve.get('description'),
+                'published_date': cve.get('published_date'),
+                'references': cve.get('references', []),
+                'component': comp['name'],
+                'version': comp['version'],
+                'component_ref': comp['purl'],
+                'files': [e['file'] for e in comp['evidence']]
+            })
+
+    vulnerabilities.sort(key=lambda v: (-SEVERITY_RANK.get(v['severity'], 0), v['component'], v['cve_id']))
+    return vulnerabilities
 
 
 def get_firmware_info(firmware_file: str) -> Dict[str, Any]:
@@ -230,23 +458,6 @@ def get_firmware_info(firmware_file: str) -> Dict[str, Any]:
     }
 
 
-def detect_filesystem_type(binwalk_output: str) -> str:
-    """Detect filesystem type from binwalk output"""
-    fs_patterns = {
-        'squashfs': r'Squashfs filesystem',
-        'cramfs': r'CramFS filesystem',
-        'jffs2': r'JFFS2 filesystem',
-        'ubifs': r'UBIFS',
-        'ext': r'Ext[234] filesystem'
-    }
-    
-    for fs_name, pattern in fs_patterns.items():
-        if re.search(pattern, binwalk_output, re.IGNORECASE):
-            return fs_name
-    
-    return 'unknown'
-
-
 def analyze_filesystem(path: str) -> Dict[str, Any]:
     """Analyze filesystem structure"""
     total_files = 0
@@ -271,165 +482,26 @@ def analyze_filesystem(path: str) -> Dict[str, Any]:
     }
 
 
-def scan_sensitive_files(path: str) -> List[Dict[str, Any]]:
-    """Scan for sensitive system files"""
-    findings = []
-    
-    sensitive_files = [
-        ('etc/passwd', 'Password file found', 'MEDIUM'),
-        ('etc/shadow', 'Shadow password file found', 'HIGH'),
-        ('etc/ssh/ssh_host_*_key', 'SSH host private key', 'HIGH'),
-        ('root/.ssh/id_rsa', 'Root SSH private key', 'CRITICAL'),
-        ('*.pem', 'PEM certificate/key file', 'MEDIUM'),
-        ('*.key', 'Private key file', 'HIGH'),
-        ('*.crt', 'Certificate file', 'LOW'),
-        ('config.xml', 'Configuration file', 'MEDIUM'),
-    ]
-    
-    for pattern, description, severity in sensitive_files:
-        matches = list(Path(path).rglob(pattern))
-        for match in matches:
-            findings.append({
-                'type': 'sensitive_file',
-                'severity': severity,
-                'file': str(match.relative_to(path)),
-                'description': description,
-                'size': match.stat().st_size if match.exists() else 0
-            })
-    
-    return findings
-
-
-def extract_strings_from_binaries(path: str, depth: str) -> Dict[str, List[str]]:
-    """Extract strings from binary files"""
-    # Simplified version - in production would use 'strings' command
-    strings_data = {
-        'urls': [],
-        'ips': [],
-        'emails': [],
-        'paths': []
-    }
-    
-    # Limit based on depth
-    max_files = {'quick': 50, 'standard': 200, 'deep': 1000}.get(depth, 200)
-    
-    file_count = 0
-    for binary_file in Path(path).rglob('*'):
-        if file_count >= max_files:
-            break
-        
-        if not binary_file.is_file() or binary_file.stat().st_size > 10 * 1024 * 1024:  # Skip >10MB
-            continue
-        
-        try:
-            # Simple string extraction (production would use 'strings' command)
-            with open(binary_file, 'rb') as f:
-                content = f.read()
-                text = content.decode('utf-8', errors='ignore')
-                
-                # Extract URLs
-                urls = re.findall(r'https?://[^\s<>"{}|\\^`\[\]]+', text)
-                strings_data['urls'].extend(urls[:10])  # Limit per file
-                
-                # Extract IPs
-                ips = re.findall(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b', text)
-                strings_data['ips'].extend(ips[:10])
-                
-                # Extract emails
-                emails = re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text)
-                strings_data['emails'].extend(emails[:5])
-                
-            file_count += 1
-        except:
-            continue
-    
-    # Deduplicate
-    for key in strings_data:
-        strings_data[key] = list(set(strings_data[key]))[:100]  # Limit to 100 unique items
-    
-    return strings_data
-
-
-def detect_credentials(path: str) -> List[Dict[str, Any]]:
-    """Detect hardcoded credentials using regex patterns"""
-    findings = []
-    
-    patterns = {
-        'password': (r'password\s*[:=]\s*["\']?([^"\'\s]{4,})["\']?', 'HIGH'),
-        'api_key': (r'(?:api[_-]?key|apikey)\s*[:=]\s*["\']?([a-zA-Z0-9]{20,})["\']?', 'HIGH'),
-        'secret': (r'secret\s*[:=]\s*["\']?([^"\'\s]{10,})["\']?', 'MEDIUM'),
-        'token': (r'token\s*[:=]\s*["\']?([a-zA-Z0-9]{20,})["\']?', 'MEDIUM'),
-        'aws_key': (r'AKIA[0-9A-Z]{16}', 'CRITICAL'),
-    }
-    
-    # Search in text files
-    text_extensions = {'.conf', '.cfg', '.xml', '.txt', '.sh', '.py', '.js', '.ini'}
-    
-    for file_path in Path(path).rglob('*'):
-        if not file_path.is_file() or file_path.suffix not in text_extensions:
-            continue
-        
-        if file_path.stat().st_size > 1024 * 1024:  # Skip >1MB files
-            continue
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                
-                for cred_type, (pattern, severity) in patterns.items():
-                    matches = re.finditer(pattern, content, re.IGNORECASE)
-                    for match in matches:
-                        findings.append({
-                            'type': f'hardcoded_{cred_type}',
-                            'severity': severity,
-                            'file': str(file_path.relative_to(path)),
-                            'matched': match.group(0)[:100],  # Limit length
-                            'description': f'Potential hardcoded {cred_type} detected'
-                        })
-        except:
-            continue
+def scan_filesystem(
+    files: List[Tuple[str, Path, int]],
+    scanner: MemberScanner,
+    progress_callback: Optional[Callable] = None
+) -> None:
+    """
+    Feed prioritised files to the scanner
     
-    return findings[:50]  # Limit to 50 findings
-
-
-def scan_crypto_material(path: str) -> Dict[str, List[Dict]]:
-    """Scan for cryptographic material (keys, certificates)"""
-    crypto_data = {
-        'private_keys': [],
-        'certificates': [],
-        'public_keys': []
-    }
+    Once the scanner's budget is exhausted the remaining files only get the
+    path-based checks and are counted as skipped.
+    """
+    report = _member_progress(progress_callback, "Scanned", progress=50)
     
-    for file_path in Path(path).rglob('*'):
-        if not file_path.is_file() or file_path.stat().st_size > 100 * 1024:  # Skip >100KB
-            continue
+    for idx, (rel_path, file_path, size) in enumerate(files):
+        def read_content(file_path=file_path) -> bytes:
+            try:
+                return file_path.read_bytes()
+            except OSError:
+                return b''
         
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                
-                # Detect private keys
-                if '-----BEGIN' in content and 'PRIVATE KEY-----' in content:
-                    crypto_data['private_keys'].append({
-                        'file': str(file_path.relative_to(path)),
-                        'type': 'RSA' if 'RSA' in content else 'Generic',
-                        'size': file_path.stat().st_size
-                    })
-                
-                # Detect certificates
-                if '-----BEGIN CERTIFICATE-----' in content:
-                    crypto_data['certificates'].append({
-                        'file': str(file_path.relative_to(path)),
-                        'size': file_path.stat().st_size
-                    })
-                
-                # Detect public keys
-                if '-----BEGIN PUBLIC KEY-----' in content:
-                    crypto_data['public_keys'].append({
-                        'file': str(file_path.relative_to(path)),
-                        'size': file_path.stat().st_size
-                    })
-        except:
-            continue
-    
-    return crypto_data
+        scanner.scan(rel_path, size, read_content)
+        if scanner.budget is not None:
+            report(idx + 1, scanner.budget.bytes_scanned, rel_path)
@@ -11,8 +11,7 @@ from typing import Dict, Any, Callable, List
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 import time
 
-from app.models import ScanResult
-from app.core.database import get_sync_db
+from app.services.bulk_persistence import insert_scan_result
 from app.workers.payloads import (
     SQL_PAYLOADS, SQL_DETECTION_PATTERNS,
     XSS_PAYLOADS, XSS_DETECTION_PATTERNS,
@@ -369,26 +368,7 @@ def _save_scan_result(
     results: Dict[str, Any]
 ):
     """保存扫描结果到数据库"""
-    db = next(get_sync_db())
-    
-    try:
-        scan_result = ScanResult(
-            task_id=task_id,
-            scan_type="fuzzing_http",
-            target=target_url,
-            result=results
-        )
-        db.add(scan_result)
-        db.commit()
-        db.refresh(scan_result)
-        
-        logger.info(f"Saved fuzzing result {scan_result.id} for task {task_id}")
-        
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to save scan result: {e}")
-    finally:
-        db.close()
+    insert_scan_result(task_id, "fuzzing_http", target_url, results)
 
 
 def _check_connectivity(url: str, timeout: int = 5) -> bool:
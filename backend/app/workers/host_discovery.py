@@ -0,0 +1,403 @@
+"""
+异步主机发现引擎
+
+用 asyncio 并发探测大量主机: 对常见IoT端口发起TCP连接 (连接成功或被RST拒绝
+都说明主机在线)，可用时同时发送ICMP回显请求 (优先使用无需root的
+SOCK_DGRAM ICMP套接字，其次原始套接字)。每个主机记录RTT统计。
+
+一个 /24 网段在数秒内完成: 不在线的主机只消耗 1 + retries 轮超时，
+在线主机的后续轮次只探测已有响应的端口。
+"""
+import asyncio
+import ipaddress
+import itertools
+import logging
+import random
+import resource
+import socket
+import statistics
+import struct
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.task_executor import TaskCancelled
+from app.workers.nmap_shards import expand_targets
+
+logger = logging.getLogger(__name__)
+
+# 常见IoT设备端口: Web管理、SSH/Telnet、RTSP摄像头、MQTT、TR-069、Modbus、UPnP、打印机
+DEFAULT_TCP_PORTS = [80, 443, 22, 23, 8080, 8443, 554, 1883, 7547, 502, 49152, 9100]
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+
+class DiscoveryCancelled(TaskCancelled):
+    """主机发现因任务取消而终止"""
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+class IcmpPinger:
+    """
+    共享的异步ICMP回显套接字 (仅IPv4)
+
+    一个套接字服务所有主机，回复按 (源地址, 序号) 匹配到等待中的探测。
+    """
+
+    def __init__(self, sock: socket.socket, raw: bool):
+        self.sock = sock
+        self.raw = raw
+        # 同一进程内可能有多个扫描任务同时使用原始套接字 (都会收到全部回显应答)，
+        # 标识符和起始序号随机生成，避免按 (源地址, 序号) 匹配到其他任务的应答
+        self.ident = random.getrandbits(16)
+        self._seq = itertools.count(random.getrandbits(16))
+        self._pending: Dict[Tuple[str, int], Tuple[asyncio.Future, float]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def open(cls) -> Optional["IcmpPinger"]:
+        """创建ICMP套接字；没有权限时返回 None"""
+        for sock_type, raw in ((socket.SOCK_DGRAM, False), (socket.SOCK_RAW, True)):
+            try:
+                sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            except OSError:
+                continue
+            sock.setblocking(False)
+            return cls(sock, raw)
+        return None
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        loop.add_reader(self.sock.fileno(), self._on_readable)
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+        for future, _ in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    async def ping(self, ip: str, timeout: float) -> Optional[float]:
+        """发送一个回显请求，返回RTT (毫秒)；超时返回 None"""
+        seq = next(self._seq) & 0xFFFF
+        header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, self.ident, seq)
+        payload = b"securitylab-ping"
+        packet = struct.pack(
+            "!BBHHH", ICMP_ECHO_REQUEST, 0, _checksum(header + payload), self.ident, seq
+        ) + payload
+
+        future = self._loop.create_future()
+        key = (ip, seq)
+        self._pending[key] = (future, time.perf_counter())
+        try:
+            self.sock.sendto(packet, (ip, 0))
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            self._pending.pop(key, None)
+
+    def _on_readable(self):
+        while True:
+            try:
+                data, (src, _) = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            received = time.perf_counter()
+            if self.raw:
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8:
+                continue
+            icmp_type, _, _, ident, seq = struct.unpack("!BBHHH", data[:8])
+            # 无特权套接字的标识符由内核改写并过滤，原始套接字需自行校验
+            if icmp_type != ICMP_ECHO_REPLY or (self.raw and ident != self.ident):
+                continue
+            entry = self._pending.get((src, seq))
+            if entry and not entry[0].done():
+                entry[0].set_result((received - entry[1]) * 1000)
+
+
+class HostStats:
+    """单个主机的探测结果和RTT统计"""
+
+    def __init__(self, ip: str, hostname: str = ""):
+        self.ip = ip
+        self.hostname = hostname
+        self.attempts: List[Dict[str, Any]] = []
+        self.open_ports: set = set()
+        self.responsive_ports: set = set()
+        self.icmp_reply = False
+        self.error: Optional[str] = None
+
+    @property
+    def up(self) -> bool:
+        return any(a["success"] for a in self.attempts)
+
+    def record(self, latency_ms: Optional[float], method: Optional[str]):
+        self.attempts.append({
+            "attempt": len(self.attempts) + 1,
+            "success": latency_ms is not None,
+            "latency_ms": round(latency_ms, 2) if latency_ms is not None else None,
+            "method": method,
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        rtts = [a["latency_ms"] for a in self.attempts if a["success"]]
+        sent = len(self.attempts)
+        result = {
+            "ip": self.ip,
+            "hostname": self.hostname,
+            "state": "up" if rtts else "down",
+            "sent": sent,
+            "received": len(rtts),
+            "loss_rate": round((sent - len(rtts)) / sent * 100, 2) if sent else 100.0,
+            "min_latency_ms": min(rtts) if rtts else None,
+            "avg_latency_ms": round(statistics.fmean(rtts), 2) if rtts else None,
+            "max_latency_ms": max(rtts) if rtts else None,
+            "stddev_latency_ms": round(statistics.pstdev(rtts), 2) if rtts else None,
+            "icmp": self.icmp_reply,
+            "open_ports": sorted(self.open_ports),
+            "attempts": self.attempts,
+        }
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+class HostDiscovery:
+    """
+    异步主机发现
+
+    每个主机按轮次探测: 每轮同时发送ICMP回显和TCP连接，最早的响应作为该轮RTT。
+    第一轮探测全部端口；无响应的主机重试 retries 轮后判定离线；
+    在线主机继续探测到 count 轮，只使用已有响应的端口 (和ICMP)。
+    """
+
+    def __init__(
+        self,
+        ports: Optional[List[int]] = None,
+        timeout: float = 1.0,
+        count: int = 4,
+        retries: int = 1,
+        interval: float = 0.2,
+        concurrency: int = 1024,
+        use_icmp: bool = True
+    ):
+        """
+        Args:
+            ports: TCP探测端口 (默认 DEFAULT_TCP_PORTS)
+            timeout: 单个探测的超时 (秒)
+            count: 在线主机的探测轮数 (RTT统计样本数)
+            retries: 无响应主机的额外重试轮数
+            interval: 同一主机两轮之间的间隔 (秒)
+            concurrency: 同时进行的TCP连接数上限 (受文件描述符上限约束)
+            use_icmp: 是否尝试ICMP探测
+        """
+        self.ports = list(ports or DEFAULT_TCP_PORTS)
+        self.timeout = timeout
+        self.count = max(1, count)
+        self.retries = max(0, retries)
+        self.interval = interval
+        self.use_icmp = use_icmp
+
+        soft_limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+        if soft_limit != resource.RLIM_INFINITY:
+            concurrency = min(concurrency, max(16, soft_limit - 64))
+        self.concurrency = max(1, concurrency)
+
+    def discover(
+        self,
+        target: str,
+        on_host: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None
+    ) -> Dict[str, Any]:
+        """
+        同步入口 (在worker线程中运行独立事件循环)
+
+        Args:
+            target: 目标 (IP、主机名、CIDR、nmap八位组范围，空格/逗号分隔)
+            on_host: 每个主机探测完成时回调 (HostStats.to_dict())
+            on_progress: 进度回调 (已完成主机数, 主机总数)
+            should_cancel: 返回 True 时停止探测并抛出 DiscoveryCancelled
+
+        Returns:
+            {hosts, hosts_total, hosts_up, icmp, elapsed}
+        """
+        return asyncio.run(self.run(target, on_host, on_progress, should_cancel))
+
+    async def run(
+        self,
+        target: str,
+        on_host: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None
+    ) -> Dict[str, Any]:
+        """异步入口，参数同 discover()"""
+        hosts = expand_targets(target)
+        if hosts is None:
+            raise ValueError(f"目标范围过大: {target}")
+
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        pinger = IcmpPinger.open() if self.use_icmp else None
+        if pinger is not None:
+            pinger.start(loop)
+        elif self.use_icmp:
+            logger.info("ICMP socket unavailable, using TCP probes only")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in enumerate(hosts):
+            queue.put_nowait(item)
+        results: Dict[int, Dict[str, Any]] = {}
+
+        async def worker():
+            while True:
+                try:
+                    idx, host = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                stats = await self._probe_host(host, pinger, semaphore)
+                result = stats.to_dict()
+                results[idx] = result
+                if on_host:
+                    on_host(result)
+                if on_progress:
+                    on_progress(len(results), len(hosts))
+
+        # 每个主机一轮最多占用 len(ports) 个TCP连接 (ICMP共用一个套接字，不计入)
+        workers = max(1, min(len(hosts), self.concurrency // len(self.ports)))
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        work = asyncio.gather(*tasks)
+        watcher = asyncio.create_task(self._watch_cancel(should_cancel)) if should_cancel else None
+        try:
+            if watcher is not None:
+                await asyncio.wait([watcher, work], return_when=asyncio.FIRST_COMPLETED)
+                if watcher.done():
+                    watcher.result()
+            await work
+        finally:
+            for task in (watcher, *tasks):
+                if task is not None and not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if pinger is not None:
+                pinger.close()
+
+        ordered = [results[idx] for idx in sorted(results)]
+        return {
+            "hosts": ordered,
+            "hosts_total": len(hosts),
+            "hosts_up": sum(1 for r in ordered if r["state"] == "up"),
+            "icmp": "raw" if pinger and pinger.raw else "dgram" if pinger else None,
+            "elapsed": round(time.perf_counter() - started, 3),
+        }
+
+    async def _watch_cancel(self, should_cancel: Callable[[], bool]):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(1.0)
+            # 取消标志在Redis中，放到线程池里查询以免阻塞事件循环
+            if await loop.run_in_executor(None, should_cancel):
+                raise DiscoveryCancelled("主机发现已取消")
+
+    async def _probe_host(
+        self,
+        host: str,
+        pinger: Optional[IcmpPinger],
+        semaphore: asyncio.Semaphore
+    ) -> HostStats:
+        ip, hostname, error = await self._resolve(host)
+        stats = HostStats(ip or host, hostname)
+        stats.error = error
+        if ip is None:
+            return stats
+        icmp = pinger if pinger is not None and ipaddress.ip_address(ip).version == 4 else None
+
+        for round_no in range(self.count):
+            if round_no:
+                await asyncio.sleep(self.interval)
+            ports = sorted(stats.responsive_ports) if stats.up else self.ports
+            await self._probe_round(stats, ports, icmp, semaphore)
+            if not stats.up and round_no >= self.retries:
+                break
+        return stats
+
+    async def _resolve(self, host: str) -> Tuple[Optional[str], str, Optional[str]]:
+        """解析主机名，返回 (IP, 主机名, 错误)"""
+        try:
+            ipaddress.ip_address(host)
+            return host, "", None
+        except ValueError:
+            pass
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            return None, host, f"无法解析主机名: {e}"
+        # 优先IPv4 (ICMP仅支持IPv4)
+        infos.sort(key=lambda info: info[0] != socket.AF_INET)
+        return infos[0][4][0], host, None
+
+    async def _probe_round(
+        self,
+        stats: HostStats,
+        ports: List[int],
+        pinger: Optional[IcmpPinger],
+        semaphore: asyncio.Semaphore
+    ):
+        """一轮探测: ICMP和所有端口并发，记录最早的响应"""
+        probes = [self._limited(semaphore, self._tcp_probe(stats, port)) for port in ports]
+        if pinger is not None:
+            probes.append(self._icmp_probe(stats, pinger))
+
+        best: Optional[Tuple[float, str]] = None
+        for outcome in await asyncio.gather(*probes):
+            if outcome is not None and (best is None or outcome[0] < best[0]):
+                best = outcome
+        if best:
+            stats.record(*best)
+        else:
+            stats.record(None, None)
+
+    @staticmethod
+    async def _limited(semaphore: asyncio.Semaphore, coro):
+        async with semaphore:
+            return await coro
+
+    async def _icmp_probe(self, stats: HostStats, pinger: IcmpPinger) -> Optional[Tuple[float, str]]:
+        rtt = await pinger.ping(stats.ip, self.timeout)
+        if rtt is None:
+            return None
+        stats.icmp_reply = True
+        return rtt, "icmp"
+
+    async def _tcp_probe(self, stats: HostStats, port: int) -> Optional[Tuple[float, str]]:
+        """TCP连接探测: 连接成功 (端口开放) 或被拒绝 (RST) 都算响应"""
+        started = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(stats.ip, port), self.timeout
+            )
+        except ConnectionRefusedError:
+            stats.responsive_ports.add(port)
+            return (time.perf_counter() - started) * 1000, f"tcp/{port}"
+        except (asyncio.TimeoutError, OSError):
+            return None
+        rtt = (time.perf_counter() - started) * 1000
+        writer.transport.abort()
+        stats.open_ports.add(port)
+        stats.responsive_ports.add(port)
+        return rtt, f"tcp/{port}"
@@ -0,0 +1,243 @@
+"""
+Nmap两阶段流水线扫描
+
+第一阶段快速发现存活主机 (异步TCP/ICMP探测或 nmap -sn)，每发现一个主机即放入
+队列；第二阶段的nmap进程从队列取主机立即做端口/服务扫描 (附加 -Pn，不再重复
+主机发现)，不等待整个网段探测完成，也不在离线主机上浪费时间。
+"""
+import logging
+import queue
+import re
+import shlex
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.task_executor import TaskCancelled
+from app.workers.host_discovery import HostDiscovery
+from app.workers.nmap_runner import NmapRunner
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_CONNECT = "connect"
+DISCOVERY_NMAP = "sn"
+
+# 单个nmap进程一次最多取走的已发现主机数 (队列中积压的主机合并扫描，减少进程启动开销)
+DEFAULT_BATCH_SIZE = 8
+
+_TIMING = re.compile(r"^-T[0-5]$")
+_DONE = object()
+
+
+def scan_arguments(arguments: str) -> str:
+    """第二阶段参数: 主机已确认在线，跳过主机发现"""
+    args = shlex.split(arguments)
+    if "-Pn" not in args:
+        args.append("-Pn")
+    return shlex.join(args)
+
+
+def discovery_arguments(arguments: str) -> str:
+    """nmap -sn 发现阶段参数 (沿用扫描参数中的速度模板)"""
+    timing = [arg for arg in shlex.split(arguments) if _TIMING.match(arg)]
+    return shlex.join(["-sn", *timing[-1:]])
+
+
+def run_pipeline(
+    target: str,
+    arguments: str,
+    discovery: str = DISCOVERY_CONNECT,
+    on_alive: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_host: Optional[Callable[[Dict[str, Any], List[Dict[str, Any]]], None]] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    should_cancel: Optional[Callable[[], bool]] = None,
+    max_parallel: int = 4,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    runner: Optional[NmapRunner] = None
+) -> Dict[str, Any]:
+    """
+    执行两阶段扫描
+
+    Args:
+        target: 扫描目标
+        arguments: 第二阶段nmap参数 (见 nmap_scan._build_nmap_args)
+        discovery: 发现方式 (connect: 异步TCP/ICMP探测; sn: nmap -sn)
+        on_alive: 发现存活主机时回调 {ip, hostname, latency_ms}
+        on_host: 主机扫描完成回调 (主机信息, 端口列表)，签名与 run_shards 相同，调用已串行化
+        on_progress: 进度回调 {fraction, discovered, scanned, discovery_done, task, percent, remaining}
+        should_cancel: 返回 True 时停止发现并终止全部nmap进程
+        max_parallel: 第二阶段同时运行的nmap进程数上限
+        batch_size: 单个nmap进程一次最多扫描的主机数
+        runner: nmap运行器 (可选)
+
+    Returns:
+        {hosts, hosts_discovered, hosts_total, discovery, first_host_after, discovery_elapsed}
+    """
+    if discovery not in (DISCOVERY_CONNECT, DISCOVERY_NMAP):
+        raise ValueError(f"Unknown discovery method: {discovery}")
+
+    runner = runner or NmapRunner()
+    workers = max(1, max_parallel)
+    started = time.perf_counter()
+    alive: "queue.Queue" = queue.Queue()
+    lock = threading.Lock()
+    failed = threading.Event()
+    state = {
+        "discovered": 0,
+        "scanned": 0,
+        "probed": 0,
+        "total": None,
+        "discovery_done": False,
+        "discovery_elapsed": None,
+        "first_host_after": None,
+        "fraction": 0.0,
+    }
+    hosts: List[Dict[str, Any]] = []
+
+    def cancelled() -> bool:
+        return failed.is_set() or bool(should_cancel and should_cancel())
+
+    def report(progress: Optional[Dict[str, Any]] = None):
+        if not on_progress:
+            return
+        # 发现阶段占 20%，扫描阶段按 已扫描/已发现 占 80%
+        discovery_fraction = 1.0 if state["discovery_done"] else (
+            state["probed"] / state["total"] if state["total"] else 0.0
+        )
+        scan_fraction = min(1.0, state["scanned"] / state["discovered"]) if state["discovered"] else 0.0
+        if not state["discovery_done"]:
+            scan_fraction *= discovery_fraction
+        # 新发现的主机会拉低扫描占比，整体进度保持单调
+        state["fraction"] = max(state["fraction"], 0.2 * discovery_fraction + 0.8 * scan_fraction)
+        on_progress({
+            "task": "",
+            "percent": 0.0,
+            "remaining": None,
+            **(progress or {}),
+            "fraction": state["fraction"],
+            "discovered": state["discovered"],
+            "scanned": state["scanned"],
+            "discovery_done": state["discovery_done"],
+        })
+
+    def found(ip: str, hostname: str = "", latency_ms: Optional[float] = None):
+        with lock:
+            state["discovered"] += 1
+            if on_alive:
+                on_alive({"ip": ip, "hostname": hostname, "latency_ms": latency_ms})
+        alive.put(ip)
+
+    def discover():
+        try:
+            if discovery == DISCOVERY_CONNECT:
+                def on_discovered(host):
+                    if host["state"] == "up":
+                        found(host["ip"], host["hostname"], host["min_latency_ms"])
+
+                def on_probed(done, total):
+                    with lock:
+                        state["probed"], state["total"] = done, total
+                        report()
+
+                HostDiscovery(count=1).discover(
+                    target,
+                    on_host=on_discovered,
+                    on_progress=on_probed,
+                    should_cancel=cancelled
+                )
+            else:
+                def on_discovered(host):
+                    if host["state"] == "up":
+                        found(host["ip"], host["hostname"])
+
+                runner.run(
+                    target,
+                    discovery_arguments(arguments),
+                    on_host=on_discovered,
+                    should_cancel=cancelled
+                )
+        except Exception:
+            failed.set()
+            raise
+        finally:
+            with lock:
+                state["discovery_done"] = True
+                state["discovery_elapsed"] = round(time.perf_counter() - started, 3)
+                report()
+            for _ in range(workers):
+                alive.put(_DONE)
+
+    def take_batch() -> Optional[List[str]]:
+        """阻塞取一个主机，再顺带取走队列中已积压的主机"""
+        first = alive.get()
+        if first is _DONE:
+            return None
+        batch = [first]
+        while len(batch) < batch_size:
+            try:
+                item = alive.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                alive.put(_DONE)
+                break
+            batch.append(item)
+        return batch
+
+    def scan():
+        args = scan_arguments(arguments)
+        while not failed.is_set():
+            batch = take_batch()
+            if batch is None:
+                return
+
+            def batch_host(host_info):
+                with lock:
+                    hosts.append(host_info)
+                    state["scanned"] += 1
+                    if state["first_host_after"] is None:
+                        state["first_host_after"] = round(time.perf_counter() - started, 3)
+                    if on_host:
+                        on_host(host_info, host_info["ports"])
+                    report()
+
+            def batch_progress(progress):
+                with lock:
+                    report(progress)
+
+            try:
+                runner.run(
+                    batch,
+                    args,
+                    on_host=batch_host,
+                    on_progress=batch_progress,
+                    should_cancel=cancelled,
+                    total_hosts=len(batch)
+                )
+            except Exception:
+                failed.set()
+                raise
+
+    with ThreadPoolExecutor(max_workers=workers + 1, thread_name_prefix="nmap-pipeline") as pool:
+        futures = [pool.submit(discover)] + [pool.submit(scan) for _ in range(workers)]
+        errors = []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+
+    if errors:
+        # 某一阶段失败会终止其余进程，优先报告真正的失败原因
+        real = [e for e in errors if not isinstance(e, TaskCancelled)]
+        raise (real or errors)[0]
+
+    return {
+        "hosts": hosts,
+        "hosts_discovered": state["discovered"],
+        "hosts_total": state["total"],
+        "discovery": discovery,
+        "first_host_after": state["first_host_after"],
+        "discovery_elapsed": state["discovery_elapsed"],
+    }
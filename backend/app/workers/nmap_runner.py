@@ -0,0 +1,358 @@
+"""
+Nmap子进程运行器
+
+以子进程方式运行nmap (-oX - --stats-every)，用 XMLPullParser 增量解析标准输出
+中的XML (读到多少解析多少，不等缓冲区填满): 每个主机扫描完成即回调，
+<taskprogress> 转换为真实进度；取消时终止nmap进程组。
+"""
+import ipaddress
+import logging
+import os
+import re
+import shlex
+import shutil
+import signal
+import subprocess
+import threading
+import xml.etree.ElementTree as ET
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from app.core.task_executor import TaskCancelled
+
+logger = logging.getLogger(__name__)
+
+# 扫描阶段 (按nmap执行顺序)
+PHASE_PORT = "port"
+PHASE_SERVICE = "service"
+PHASE_OS = "os"
+PHASE_SCRIPT = "script"
+
+# nmap八位组范围写法 (192.168.1.1-20, 10.0.*.1, 10.0.0,1.1)
+_OCTET_RANGE = re.compile(r"^[\d.,*\-]+$")
+
+
+class NmapRunError(RuntimeError):
+    """nmap进程异常退出或输出无法解析"""
+
+
+class NmapScanCancelled(TaskCancelled):
+    """扫描因任务取消而终止"""
+
+
+def expected_phases(arguments: List[str]) -> List[str]:
+    """根据nmap参数推断会执行的扫描阶段"""
+    aggressive = "-A" in arguments
+    phases = [PHASE_PORT]
+    if aggressive or "-sV" in arguments:
+        phases.append(PHASE_SERVICE)
+    if aggressive or "-O" in arguments:
+        phases.append(PHASE_OS)
+    if aggressive or "-sC" in arguments or any(arg.startswith("--script") for arg in arguments):
+        phases.append(PHASE_SCRIPT)
+    return phases
+
+
+def task_phase(task: str) -> Optional[str]:
+    """<taskprogress task="..."> 所属的扫描阶段；主机发现、DNS解析等辅助任务返回 None"""
+    if task == "Service scan":
+        return PHASE_SERVICE
+    if task.startswith("OS detection"):
+        return PHASE_OS
+    if task.startswith("NSE") or task == "Script Scan":
+        return PHASE_SCRIPT
+    if task.endswith("Scan") and "Ping" not in task:
+        return PHASE_PORT
+    return None
+
+
+def estimate_host_count(targets: Iterable[str]) -> Optional[int]:
+    """估算目标主机数 (IP/CIDR可计算；nmap八位组范围等无法计算时返回 None)"""
+    total = 0
+    for target in targets:
+        try:
+            total += ipaddress.ip_network(target, strict=False).num_addresses
+        except ValueError:
+            if _OCTET_RANGE.match(target):
+                return None
+            total += 1  # 主机名
+    return total
+
+
+def parse_host(elem: ET.Element) -> Dict[str, Any]:
+    """解析 <host> 元素 (结构与原 python-nmap 解析结果一致)"""
+    ip = ""
+    mac = ""
+    for address in elem.findall("address"):
+        addrtype = address.get("addrtype")
+        if addrtype in ("ipv4", "ipv6") and not ip:
+            ip = address.get("addr", "")
+        elif addrtype == "mac":
+            mac = address.get("addr", "")
+
+    hostname_elem = elem.find("hostnames/hostname")
+    status = elem.find("status")
+    host_info = {
+        "ip": ip,
+        "hostname": hostname_elem.get("name", "") if hostname_elem is not None else "",
+        "state": status.get("state", "") if status is not None else "",
+        "ports": [],
+    }
+    if mac:
+        host_info["mac"] = mac
+
+    for port in elem.findall("ports/port"):
+        state = port.find("state")
+        service = port.find("service")
+        service = service if service is not None else ET.Element("service")
+        cpe = service.find("cpe")
+        host_info["ports"].append({
+            "port": int(port.get("portid")),
+            "protocol": port.get("protocol", "tcp"),
+            "state": state.get("state", "") if state is not None else "",
+            "service": service.get("name", ""),
+            "version": service.get("version", ""),
+            "product": service.get("product", ""),
+            "extrainfo": service.get("extrainfo", ""),
+            "cpe": cpe.text if cpe is not None and cpe.text else "",
+        })
+    host_info["ports"].sort(key=lambda p: (p["protocol"], p["port"]))
+    return host_info
+
+
+class ScanProgress:
+    """
+    由 <taskprogress> 和已完成的主机数估算整体进度
+
+    当前阶段进度 = (已完成阶段数 + 阶段百分比) / 阶段总数；
+    整体进度 = (已完成主机 + 当前阶段进度 × 剩余主机) / 主机总数。
+    """
+
+    def __init__(self, phases: List[str], total_hosts: Optional[int] = None):
+        self.phases = phases
+        self.total_hosts = total_hosts
+        self.hosts_done = 0
+        self.task = ""
+        self.percent = 0.0
+        self.remaining: Optional[int] = None
+        self._fraction = 0.0
+
+    def update_task(self, task: str, percent: float, remaining: Optional[int] = None):
+        self.task = task
+        self.percent = percent
+        self.remaining = remaining
+
+    def host_done(self):
+        self.hosts_done += 1
+
+    def fraction(self) -> float:
+        """0.0 ~ 1.0，单调不减"""
+        phase = task_phase(self.task)
+        phase_fraction = 0.0
+        if phase in self.phases:
+            phase_fraction = (self.phases.index(phase) + self.percent / 100) / len(self.phases)
+
+        if self.total_hosts:
+            remaining_hosts = max(0, self.total_hosts - self.hosts_done)
+            fraction = (self.hosts_done + phase_fraction * remaining_hosts) / self.total_hosts
+        else:
+            fraction = phase_fraction
+        self._fraction = max(self._fraction, min(1.0, fraction))
+        return self._fraction
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "fraction": self.fraction(),
+            "task": self.task,
+            "percent": self.percent,
+            "remaining": self.remaining,
+            "hosts_done": self.hosts_done,
+            "total_hosts": self.total_hosts,
+        }
+
+
+class NmapRunner:
+    """nmap子进程运行器 (每次 run() 独立，可在多个线程中并发使用)"""
+
+    STATS_INTERVAL = "2s"
+    CANCEL_POLL_INTERVAL = 1.0
+    TERMINATE_TIMEOUT = 5.0
+    READ_SIZE = 65536
+
+    def __init__(self, nmap_path: Optional[str] = None):
+        self.nmap_path = nmap_path or shutil.which("nmap")
+        if not self.nmap_path:
+            raise NmapRunError("nmap program was not found in path")
+
+    def run(
+        self,
+        targets: Union[str, List[str]],
+        arguments: str,
+        on_host: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        total_hosts: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        运行一次nmap扫描
+
+        Args:
+            targets: 目标 (空格分隔的字符串或列表)，通过 -iL - 由标准输入传入
+            arguments: nmap参数 (见 nmap_scan._build_nmap_args)
+            on_host: 每个主机扫描完成时回调 (主机信息)
+            on_progress: 进度回调 (ScanProgress.snapshot())
+            should_cancel: 返回 True 时终止nmap进程并抛出 NmapScanCancelled
+            total_hosts: 目标主机数 (可选，默认按目标估算)
+
+        Returns:
+            {hosts, hosts_up, hosts_down, elapsed, command}
+        """
+        if isinstance(targets, str):
+            targets = targets.split()
+        args = shlex.split(arguments)
+        command = [
+            self.nmap_path, *args,
+            "-oX", "-",
+            "--stats-every", self.STATS_INTERVAL,
+            "-iL", "-",
+        ]
+        progress = ScanProgress(
+            expected_phases(args),
+            total_hosts if total_hosts is not None else estimate_host_count(targets)
+        )
+
+        logger.info(f"Running: {' '.join(command)} ({len(targets)} targets)")
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True
+        )
+
+        stderr_tail: deque = deque(maxlen=20)
+        stderr_thread = threading.Thread(
+            target=lambda: stderr_tail.extend(line.decode(errors="replace").rstrip() for line in process.stderr),
+            daemon=True
+        )
+        stderr_thread.start()
+
+        cancelled = threading.Event()
+        finished = threading.Event()
+        if should_cancel is not None:
+            threading.Thread(
+                target=self._watch_cancel,
+                args=(process, should_cancel, cancelled, finished),
+                daemon=True
+            ).start()
+
+        # nmap按需读取 -iL - 的目标，大目标列表超过管道缓冲区时写入会阻塞到
+        # nmap读走为止；由单独线程写入，主线程同时读取标准输出，避免互相等待
+        threading.Thread(
+            target=self._feed_targets,
+            args=(process, targets),
+            daemon=True
+        ).start()
+
+        hosts: List[Dict[str, Any]] = []
+        summary = {"hosts_up": 0, "hosts_down": 0, "elapsed": None}
+        parse_error = None
+        completed = False
+        try:
+            for elem, root in self._iter_elements(process):
+                if elem.tag == "taskprogress":
+                    remaining = elem.get("remaining")
+                    progress.update_task(
+                        elem.get("task", ""),
+                        float(elem.get("percent", 0)),
+                        int(remaining) if remaining else None
+                    )
+                    if on_progress:
+                        on_progress(progress.snapshot())
+                elif elem.tag == "host":
+                    host_info = parse_host(elem)
+                    hosts.append(host_info)
+                    progress.host_done()
+                    if on_host:
+                        on_host(host_info)
+                    if on_progress:
+                        on_progress(progress.snapshot())
+                    root.clear()
+                elif elem.tag == "finished":
+                    summary["elapsed"] = float(elem.get("elapsed", 0))
+                elif elem.tag == "hosts":
+                    summary["hosts_up"] = int(elem.get("up", 0))
+                    summary["hosts_down"] = int(elem.get("down", 0))
+            completed = True
+        except ET.ParseError as e:
+            parse_error = e
+        finally:
+            # 解析出错或回调抛出异常时不等待nmap跑完
+            if not completed and process.poll() is None:
+                self._signal(process, signal.SIGKILL)
+            returncode = process.wait()
+            finished.set()
+            stderr_thread.join(timeout=1)
+
+        if cancelled.is_set():
+            raise NmapScanCancelled("Nmap扫描已取消")
+        if returncode != 0:
+            raise NmapRunError(f"nmap exited with code {returncode}: {' '.join(stderr_tail)}")
+        if parse_error is not None:
+            raise NmapRunError(f"Failed to parse nmap XML output: {parse_error}")
+
+        return {"hosts": hosts, **summary, "command": " ".join(command)}
+
+    @staticmethod
+    def _feed_targets(process: subprocess.Popen, targets: List[str]):
+        """将目标逐行写入nmap标准输入 (nmap提前退出或被终止时停止)"""
+        try:
+            with process.stdin:
+                process.stdin.write(("\n".join(targets) + "\n").encode())
+        except (OSError, ValueError):
+            pass
+
+    def _iter_elements(self, process: subprocess.Popen):
+        """逐块读取标准输出并增量解析，产出 (完成的元素, 根元素)"""
+        parser = ET.XMLPullParser(events=("start", "end"))
+        root = None
+        while True:
+            chunk = process.stdout.read1(self.READ_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    continue
+                yield elem, root
+        parser.close()
+
+    @staticmethod
+    def _signal(process: subprocess.Popen, sig: int):
+        """向nmap所在进程组发送信号"""
+        try:
+            os.killpg(process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _watch_cancel(
+        self,
+        process: subprocess.Popen,
+        should_cancel: Callable[[], bool],
+        cancelled: threading.Event,
+        finished: threading.Event
+    ):
+        """轮询取消标志，取消时先 SIGTERM，超时后 SIGKILL"""
+        while not finished.wait(self.CANCEL_POLL_INTERVAL):
+            if not should_cancel():
+                continue
+            cancelled.set()
+            logger.info(f"Cancelling nmap process {process.pid}")
+            self._signal(process, signal.SIGTERM)
+            try:
+                process.wait(timeout=self.TERMINATE_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self._signal(process, signal.SIGKILL)
+            return
@@ -3,12 +3,16 @@ Nmap扫描Worker
 
 实现端口扫描和服务识别功能
 """
-import nmap
 import logging
-from typing import Dict, Any, Callable
+from typing import Dict, Any, Callable, List, Optional
 
-from app.models import ScanResult
-from app.core.database import get_sync_db
+from app.core.config import settings
+from app.core.task_executor import TaskCancelled, task_executor
+from app.services.bulk_persistence import insert_scan_result
+from app.services.scan_cache import get_scan_cache
+from app.workers.nmap_pipeline import DISCOVERY_CONNECT, run_pipeline
+from app.workers.nmap_runner import NmapRunError
+from app.workers.nmap_shards import plan_shards, run_shards
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +25,13 @@ def nmap_scan_worker(
     """
     Nmap扫描任务
     
+    nmap以子进程运行，XML输出增量解析: 进度来自nmap的 --stats-every 统计，
+    每个主机扫描完成即发布其端口；任务被取消时终止nmap进程。
+    目标展开后按主机或端口范围分片，最多 NMAP_MAX_PARALLEL 个nmap进程并发，
+    结果按主机合并为一个扫描结果。
+    流水线模式 (pipeline) 下先快速发现存活主机，每发现一个即开始服务扫描。
+    相同目标和参数的扫描结果在新鲜度窗口 (SCAN_CACHE_MAX_AGE) 内直接复用。
+    
     Args:
         task_id: 任务ID
         params: 参数字典，包含:
@@ -32,6 +43,10 @@ def nmap_scan_worker(
             - osDetection: 是否检测操作系统
             - verboseOutput: 是否详细输出
             - skipHostDiscovery: 是否禁用主机发现
+            - parallelism: 并发nmap进程数 (可选，不超过 NMAP_MAX_PARALLEL，默认取该上限)
+            - pipeline: 是否使用发现+扫描两阶段流水线 (可选，默认False)
+            - discovery: 流水线发现方式 connect/sn (可选，默认connect)
+            - forceRescan: 忽略缓存的扫描结果，强制重新扫描 (可选，默认False)
         progress_callback: 进度回调函数
         
     Returns:
@@ -42,6 +57,7 @@ def nmap_scan_worker(
     
     if not target:
         raise ValueError("Missing required parameter: target")
+    parallelism = _resolve_parallelism(params)
     
     logger.info(f"Starting nmap scan for {target} (type={scan_type})")
     progress_callback(0, f"开始Nmap扫描: {target}", "INFO")
@@ -50,70 +66,131 @@ def nmap_scan_worker(
     arguments = _build_nmap_args(params)
     progress_callback(10, f"扫描参数: {arguments}", "INFO")
     
+    # 扫描模式 (流水线模式只扫描发现阶段应答的主机，结果与完整扫描分开缓存)
+    pipeline = bool(params.get("pipeline"))
+    discovery = params.get("discovery") or DISCOVERY_CONNECT
+    cache_mode = f"pipeline:{discovery}" if pipeline else ""
+    
+    # 扫描缓存
+    scan_cache = get_scan_cache(task_executor.redis_sync)
+    if params.get("forceRescan"):
+        scan_cache.record_bypass()
+        progress_callback(10, "已指定强制重新扫描，忽略缓存的扫描结果", "INFO")
+    else:
+        cached = scan_cache.get(target, arguments, cache_mode)
+        if cached is not None:
+            return _serve_cached_result(task_id, target, scan_type, cached, progress_callback)
+    
+    # 分片 (流水线模式按发现的主机动态分配，不预先分片)
+    shards = [] if pipeline else plan_shards(
+        target, arguments, parallelism, settings.NMAP_MIN_HOSTS_PER_SHARD
+    )
+    if pipeline:
+        progress_callback(
+            10,
+            f"流水线模式: 主机发现 ({discovery}) 与服务扫描同时进行，"
+            f"最多 {parallelism} 个nmap进程并发",
+            "INFO"
+        )
+    elif len(shards) > 1:
+        progress_callback(
+            10,
+            f"目标拆分为 {len(shards)} 个分片，最多 {parallelism} 个nmap进程并发",
+            "INFO"
+        )
+    
+    # 初始化结果
+    results = {
+        'target': target,
+        'scan_type': scan_type,
+        'hosts': [],
+        'ports_found': 0,
+        'services_identified': 0
+    }
+    
+    def scan_progress(fraction: float) -> int:
+        return 10 + int(fraction * 80)
+    
+    last_progress = {"fraction": 0.0}
+    
+    def on_progress(progress: Dict[str, Any]):
+        last_progress.update(progress)
+        if not progress["task"]:
+            return
+        remaining = f"，剩余约 {progress['remaining']} 秒" if progress["remaining"] else ""
+        if pipeline:
+            shard_info = f" [已扫描 {progress['scanned']}/{progress['discovered']} 个存活主机]"
+        elif progress["shards"] > 1:
+            shard_info = f" [分片 {progress['shards_done']}/{progress['shards']}]"
+        else:
+            shard_info = ""
+        progress_callback(
+            scan_progress(progress["fraction"]),
+            f"{progress['task']}: {progress['percent']:.1f}%{remaining}{shard_info}",
+            "INFO"
+        )
+    
+    def on_alive(host: Dict[str, Any]):
+        latency = f" ({host['latency_ms']:.2f}ms)" if host["latency_ms"] is not None else ""
+        progress_callback(
+            scan_progress(last_progress["fraction"]),
+            f"发现存活主机: {host['ip']}{latency}",
+            "INFO"
+        )
+    
+    def on_host(host_info: Dict[str, Any], new_ports: List[Dict[str, Any]]):
+        for port_data in new_ports:
+            version_info = f"{port_data['product']} {port_data['version']}".strip()
+            progress_callback(
+                scan_progress(last_progress["fraction"]),
+                f"发现端口: {host_info['ip']} {port_data['port']}/{port_data['protocol']} - "
+                f"{port_data['service']} {version_info}".rstrip(),
+                "INFO"
+            )
+        
+        progress_callback(
+            scan_progress(last_progress["fraction"]),
+            f"主机完成: {host_info['ip']} ({host_info['state']})，{len(host_info['ports'])} 个端口",
+            "INFO",
+            {"host": host_info}
+        )
+    
     # 执行扫描
+    should_cancel = lambda: task_executor.is_cancelled(task_id)
     try:
-        nm = nmap.PortScanner()
-        nm.scan(hosts=target, arguments=arguments)
-        
-        # 初始化结果
-        results = {
-            'target': target,
-            'scan_type': scan_type,
-            'hosts': [],
-            'ports_found': 0,
-            'services_identified': 0
-        }
-        
-        # 解析扫描结果
-        for host in nm.all_hosts():
-            progress_callback(30, f"解析主机结果: {host}", "INFO")
-            
-            host_info = {
-                'ip': host,
-                'hostname': nm[host].hostname(),
-                'state': nm[host].state(),
-                'ports': []
-            }
-            
-            # 解析端口信息
-            for proto in nm[host].all_protocols():
-                ports = nm[host][proto].keys()
+        if pipeline:
+            outcome = run_pipeline(
+                target,
+                arguments,
+                discovery=discovery,
+                on_alive=on_alive,
+                on_host=on_host,
+                on_progress=on_progress,
+                should_cancel=should_cancel,
+                max_parallel=parallelism
+            )
+            results['hosts'] = outcome.pop('hosts')
+            results['pipeline'] = outcome
+        else:
+            results['hosts'] = run_shards(
+                shards,
+                on_host=on_host,
+                on_progress=on_progress,
+                should_cancel=should_cancel,
+                max_parallel=parallelism
+            )
+        for host_info in results['hosts']:
+            for port_data in host_info['ports']:
+                results['ports_found'] += 1
                 
-                for port in sorted(ports):
-                    port_info = nm[host][proto][port]
-                    
-                    port_data = {
-                        'port': port,
-                        'protocol': proto,
-                        'state': port_info['state'],
-                        'service': port_info['name'],
-                        'version': port_info.get('version', ''),
-                        'product': port_info.get('product', ''),
-                        'extrainfo': port_info.get('extrainfo', '')
-                    }
-                    
-                    host_info['ports'].append(port_data)
-                    results['ports_found'] += 1
-                    
-                    # 统计识别的服务
-                    if port_info.get('version') or port_info.get('product'):
-                        results['services_identified'] += 1
-                    
-                    # 进度日志
-                    service_name = port_info['name']
-                    version_info = f" {port_info.get('product', '')} {port_info.get('version', '')}".strip()
-                    
-                    progress_callback(
-                        50 + (len(host_info['ports']) % 40),
-                        f"发现端口: {port}/{proto} - {service_name}{version_info}",
-                        "INFO"
-                    )
-            
-            results['hosts'].append(host_info)
+                # 统计识别的服务
+                if port_data['version'] or port_data['product']:
+                    results['services_identified'] += 1
         
         # 保存扫描结果到数据库
         progress_callback(95, "保存扫描结果到数据库", "INFO")
-        _save_scan_result(task_id, target, scan_type, results)
+        scan_result_id = _save_scan_result(task_id, target, scan_type, results)
+        scan_cache.set(target, arguments, results, task_id, scan_result_id, cache_mode)
         
         # 完成
         summary = f"扫描完成: 发现{results['ports_found']}个端口, 识别{results['services_identified']}个服务"
@@ -122,7 +199,15 @@ def nmap_scan_worker(
         logger.info(f"Nmap scan completed for {target}: {results['ports_found']} ports found")
         return results
         
-    except nmap.PortScannerError as e:
+    except TaskCancelled:
+        progress_callback(
+            scan_progress(last_progress["fraction"]),
+            "扫描已取消",
+            "WARNING"
+        )
+        logger.info(f"Nmap scan for {target} cancelled")
+        raise
+    except NmapRunError as e:
         error_msg = f"Nmap扫描失败: {str(e)}"
         progress_callback(0, error_msg, "ERROR")
         logger.error(error_msg)
@@ -134,6 +219,24 @@ def nmap_scan_worker(
         raise
 
 
+def _resolve_parallelism(params: Dict[str, Any]) -> int:
+    """
+    并发nmap进程数
+    
+    任务在API进程内的执行器中运行，任务参数只能在配置上限 NMAP_MAX_PARALLEL 以内调低。
+    """
+    requested = params.get("parallelism")
+    if requested is None:
+        return settings.NMAP_MAX_PARALLEL
+    try:
+        parallelism = int(requested)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid parallelism: {requested!r}")
+    if parallelism < 1:
+        raise ValueError(f"parallelism must be at least 1, got {parallelism}")
+    return min(parallelism, settings.NMAP_MAX_PARALLEL)
+
+
 def _build_nmap_args(params: Dict[str, Any]) -> str:
     """
     构建nmap命令参数
@@ -197,7 +300,7 @@ def _save_scan_result(
     target: str,
     scan_type: str,
     results: Dict[str, Any]
-):
+) -> Optional[str]:
     """
     保存扫描结果到数据库
     
@@ -206,25 +309,49 @@ def _save_scan_result(
         target: 扫描目标
         scan_type: 扫描类型
         results: 扫描结果数据
+        
+    Returns:
+        扫描结果记录ID (写入失败时为 None)
     """
-    db = next(get_sync_db())
+    # 写入失败时只记录日志，允许任务继续完成
+    return insert_scan_result(task_id, f"nmap_{scan_type}", target, results)
+
+
+def _serve_cached_result(
+    task_id: str,
+    target: str,
+    scan_type: str,
+    cached: Dict[str, Any],
+    progress_callback: Callable
+) -> dict:
+    """
+    使用缓存的扫描结果完成任务
     
-    try:
-        scan_result = ScanResult(
-            task_id=task_id,
-            scan_type=f"nmap_{scan_type}",
-            target=target,
-            result=results  # JSONB字段，直接存储整个结果
-        )
-        db.add(scan_result)
-        db.commit()
-        db.refresh(scan_result)
-        
-        logger.info(f"Saved scan result {scan_result.id} for task {task_id}")
-        
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to save scan result: {e}")
-        # 不抛出异常，允许任务继续完成
-    finally:
-        db.close()
+    结果复制一份保存为本任务的扫描结果，后续漏洞扫描、报告按任务ID查询时与真实扫描一致。
+    """
+    results = dict(cached["result"])
+    results["cache"] = {
+        "hit": True,
+        "source_task_id": cached["task_id"],
+        "source_scan_result_id": cached["scan_result_id"],
+        "scanned_at": cached["scanned_at"],
+        "age": cached["age"],
+    }
+    progress_callback(
+        50,
+        f"使用 {cached['age'] // 60} 分钟前的缓存扫描结果 (来源任务 {cached['task_id']})，"
+        f"如需重新扫描请指定 forceRescan",
+        "INFO",
+        {"cache": results["cache"]}
+    )
+    
+    progress_callback(95, "保存扫描结果到数据库", "INFO")
+    _save_scan_result(task_id, target, scan_type, results)
+    
+    summary = (
+        f"扫描完成 (缓存): 发现{results.get('ports_found', 0)}个端口, "
+        f"识别{results.get('services_identified', 0)}个服务"
+    )
+    progress_callback(100, summary, "INFO")
+    logger.info(f"Nmap scan for {target} served from cache (age {cached['age']}s)")
+    return results
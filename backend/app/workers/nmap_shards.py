@@ -0,0 +1,327 @@
+"""
+Nmap分片并行扫描
+
+将目标 (CIDR、nmap八位组范围、IP/主机名列表) 展开为主机列表，按主机
+或端口范围切分为若干分片，多个nmap子进程并发执行，结果按主机合并。
+"""
+import ipaddress
+import itertools
+import logging
+import re
+import shlex
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.workers.nmap_runner import NmapRunner, NmapScanCancelled
+
+logger = logging.getLogger(__name__)
+
+# 超过该数量的目标不展开，交给单个nmap进程处理
+MAX_EXPANDED_HOSTS = 65536
+# 主机数不足时改为按端口切分，每个分片至少包含的端口数
+MIN_PORTS_PER_SHARD = 1024
+
+_OCTET_PART = re.compile(r"^(\d{1,3})(?:-(\d{1,3}))?$")
+_OCTET_TARGET = re.compile(r"^[\d,\-*]+(?:\.[\d,\-*]+){3}$")
+_PORT_SPEC = re.compile(r"^[\d,\-]+$")
+
+
+def expand_targets(target: str, limit: int = MAX_EXPANDED_HOSTS) -> Optional[List[str]]:
+    """
+    展开扫描目标为主机列表 (保持顺序、去重)
+
+    支持空格/逗号分隔的IP、主机名、CIDR (不含网络地址和广播地址) 和
+    nmap八位组范围 (192.168.1.1-20, 10.0.0,1.*)。
+
+    Returns:
+        主机列表；超过 limit 时返回 None
+    """
+    hosts: Dict[str, None] = {}
+    for token in _split_targets(target):
+        for host in _expand_token(token):
+            hosts[host] = None
+            if len(hosts) > limit:
+                return None
+    return list(hosts)
+
+
+def _split_targets(target: str) -> List[str]:
+    """按空白分隔；逗号只在不属于八位组写法 (10.0.0,1.1) 时作为分隔符"""
+    tokens = []
+    for part in target.split():
+        if _OCTET_TARGET.match(part):
+            tokens.append(part)
+        else:
+            tokens.extend(p for p in part.split(",") if p)
+    return tokens
+
+
+def _expand_token(token: str):
+    if "/" in token:
+        try:
+            network = ipaddress.ip_network(token, strict=False)
+        except ValueError:
+            yield token  # 主机名/掩码，交给nmap解析
+            return
+        addresses = network.hosts() if network.num_addresses > 2 else iter(network)
+        for address in addresses:
+            yield str(address)
+        return
+
+    octets = token.split(".")
+    if _OCTET_TARGET.match(token) and any(ch in token for ch in "-,*"):
+        choices = [_expand_octet(octet) for octet in octets]
+        if all(choices):
+            for combo in itertools.product(*choices):
+                yield ".".join(map(str, combo))
+            return
+    yield token
+
+
+def _expand_octet(octet: str) -> Optional[List[int]]:
+    if octet == "*":
+        return list(range(256))
+    values = []
+    for part in octet.split(","):
+        match = _OCTET_PART.match(part)
+        if not match:
+            return None
+        start = int(match.group(1))
+        end = int(match.group(2) or start)
+        if start > end or end > 255:
+            return None
+        values.extend(range(start, end + 1))
+    return values
+
+
+def find_port_spec(args: List[str]) -> Optional[Tuple[int, str]]:
+    """参数中 -p 端口范围的位置和值 (-p 1-1000 / -p1-1000 / -p-)"""
+    for idx, arg in enumerate(args):
+        if arg == "-p" and idx + 1 < len(args):
+            return idx, args[idx + 1]
+        if arg.startswith("-p") and len(arg) > 2 and not arg.startswith("--"):
+            return idx, arg[2:]
+    return None
+
+
+def parse_port_spec(spec: str) -> Optional[List[Tuple[int, int]]]:
+    """解析TCP端口范围为合并后的 [(起始, 结束)]；含协议前缀或服务名时返回 None"""
+    if spec == "-":
+        return [(1, 65535)]
+    if not _PORT_SPEC.match(spec):
+        return None
+    ranges = []
+    for part in filter(None, spec.split(",")):
+        if "-" in part:
+            start, _, end = part.partition("-")
+            ranges.append((int(start or 1), int(end or 65535)))
+        else:
+            ranges.append((int(part), int(part)))
+
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def split_ports(ranges: List[Tuple[int, int]], count: int) -> List[str]:
+    """将端口范围切分为 count 段端口数相近的端口规格"""
+    total = sum(end - start + 1 for start, end in ranges)
+    size = -(-total // count)
+    specs: List[str] = []
+    current: List[str] = []
+    current_size = 0
+    for start, end in ranges:
+        while start <= end:
+            take = min(end - start + 1, size - current_size)
+            stop = start + take - 1
+            current.append(str(start) if start == stop else f"{start}-{stop}")
+            current_size += take
+            start = stop + 1
+            if current_size == size:
+                specs.append(",".join(current))
+                current, current_size = [], 0
+    if current:
+        specs.append(",".join(current))
+    return specs
+
+
+class Shard:
+    """一个nmap子进程的扫描范围"""
+
+    def __init__(self, targets: List[str], arguments: str, total_hosts: Optional[int] = None):
+        """
+        Args:
+            targets: 展开后的主机列表 (或无法展开的原始目标)
+            arguments: nmap参数
+            total_hosts: 主机数 (None 表示未知，由运行器估算)
+        """
+        self.targets = targets
+        self.arguments = arguments
+        self.total_hosts = total_hosts
+
+    def __repr__(self):
+        return f"Shard({len(self.targets)} targets, {self.arguments!r})"
+
+
+def plan_shards(
+    target: str,
+    arguments: str,
+    parallelism: int,
+    min_hosts_per_shard: int
+) -> List[Shard]:
+    """
+    规划分片
+
+    - 主机数足够时按主机切分 (每片至少 min_hosts_per_shard 个主机，最多 parallelism 片)
+    - 主机较少但端口范围大 (-p) 时按端口切分，每片扫描全部主机的一段端口
+    - 否则 (或目标过大无法展开) 单个分片
+    """
+    hosts = expand_targets(target)
+    if hosts is None:
+        return [Shard(target.split(), arguments)]
+    if parallelism <= 1 or not hosts:
+        return [Shard(hosts, arguments, len(hosts))]
+
+    host_shards = min(parallelism, len(hosts) // max(1, min_hosts_per_shard))
+    if host_shards >= 2:
+        size = -(-len(hosts) // host_shards)
+        return [
+            Shard(hosts[i:i + size], arguments, len(hosts[i:i + size]))
+            for i in range(0, len(hosts), size)
+        ]
+
+    args = shlex.split(arguments)
+    found = find_port_spec(args)
+    ranges = parse_port_spec(found[1]) if found else None
+    if ranges:
+        port_count = sum(end - start + 1 for start, end in ranges)
+        port_shards = min(parallelism, port_count // MIN_PORTS_PER_SHARD)
+        if port_shards >= 2:
+            idx = found[0]
+            shards = []
+            for spec in split_ports(ranges, port_shards):
+                shard_args = args[:idx] + ["-p", spec] + args[idx + (2 if args[idx] == "-p" else 1):]
+                shards.append(Shard(hosts, shlex.join(shard_args), len(hosts)))
+            return shards
+
+    return [Shard(hosts, arguments, len(hosts))]
+
+
+def merge_host(merged: Dict[str, Dict[str, Any]], host_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    将一个分片的主机结果合并到 merged (按IP)
+
+    Returns:
+        本次新增的端口
+    """
+    existing = merged.get(host_info["ip"])
+    if existing is None:
+        merged[host_info["ip"]] = {**host_info, "ports": list(host_info["ports"])}
+        return list(host_info["ports"])
+
+    if host_info["state"] == "up":
+        existing["state"] = "up"
+    for key in ("hostname", "mac"):
+        if host_info.get(key) and not existing.get(key):
+            existing[key] = host_info[key]
+
+    known = {(p["protocol"], p["port"]) for p in existing["ports"]}
+    added = [p for p in host_info["ports"] if (p["protocol"], p["port"]) not in known]
+    existing["ports"].extend(added)
+    existing["ports"].sort(key=lambda p: (p["protocol"], p["port"]))
+    return added
+
+
+def run_shards(
+    shards: List[Shard],
+    on_host: Optional[Callable[[Dict[str, Any], List[Dict[str, Any]]], None]] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    should_cancel: Optional[Callable[[], bool]] = None,
+    max_parallel: int = 4,
+    runner: Optional[NmapRunner] = None
+) -> List[Dict[str, Any]]:
+    """
+    并发执行分片并合并结果
+
+    Args:
+        shards: 分片 (plan_shards)
+        on_host: 主机结果合并后回调 (合并后的主机信息, 本次新增的端口)，调用已串行化
+        on_progress: 进度回调 {fraction, task, percent, remaining, shards_done, shards}
+        should_cancel: 返回 True 时终止全部nmap进程
+        max_parallel: 同时运行的nmap进程数上限
+        runner: nmap运行器 (可选)
+
+    Returns:
+        合并后的主机列表 (按首次发现顺序)
+    """
+    runner = runner or NmapRunner()
+    merged: Dict[str, Dict[str, Any]] = {}
+    fractions = [0.0] * len(shards)
+    done = [False] * len(shards)
+    lock = threading.Lock()
+    failed = threading.Event()
+
+    def cancelled() -> bool:
+        return failed.is_set() or bool(should_cancel and should_cancel())
+
+    def report(progress: Dict[str, Any]):
+        if on_progress:
+            on_progress({
+                **progress,
+                "fraction": sum(fractions) / len(shards),
+                "shards_done": sum(done),
+                "shards": len(shards),
+            })
+
+    def run(idx: int, shard: Shard):
+        def shard_host(host_info):
+            with lock:
+                added = merge_host(merged, host_info)
+                if on_host:
+                    on_host(merged[host_info["ip"]], added)
+
+        def shard_progress(progress):
+            with lock:
+                fractions[idx] = progress["fraction"]
+                report(progress)
+
+        try:
+            runner.run(
+                shard.targets,
+                shard.arguments,
+                on_host=shard_host,
+                on_progress=shard_progress,
+                should_cancel=cancelled,
+                total_hosts=shard.total_hosts
+            )
+        except Exception:
+            failed.set()
+            raise
+        with lock:
+            fractions[idx] = 1.0
+            done[idx] = True
+            report({"task": "", "percent": 100.0, "remaining": None})
+
+    if len(shards) > 1:
+        logger.info(f"Running {len(shards)} nmap shards: {shards}")
+
+    workers = max(1, min(max_parallel, len(shards)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nmap-shard") as pool:
+        futures = [pool.submit(run, idx, shard) for idx, shard in enumerate(shards)]
+        errors = []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+
+    if errors:
+        # 某个分片失败会终止其他分片，优先报告真正的失败原因
+        real = [e for e in errors if not isinstance(e, NmapScanCancelled)]
+        raise (real or errors)[0]
+    return list(merged.values())
@@ -1,13 +1,15 @@
 """
 Ping扫描Worker
 
-实现简单的Ping连通性测试，作为任务执行引擎的POC
+基于异步主机发现引擎 (host_discovery) 的连通性测试: 支持单个主机和网段，
+所有主机和探测并发执行，按主机统计RTT。
 """
-import subprocess
-import time
 import logging
 from typing import Dict, Any, Callable
 
+from app.core.task_executor import task_executor
+from app.workers.host_discovery import DiscoveryCancelled, HostDiscovery
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,131 +20,110 @@ def ping_scan_worker(
 ) -> dict:
     """
     Ping扫描任务
-    
+
     Args:
         task_id: 任务ID
         params: 参数字典，包含:
-            - target: 目标IP或域名
-            - count: Ping次数（默认4次）
+            - target: 目标IP、域名或网段 (CIDR、nmap八位组范围，空格/逗号分隔)
+            - count: 每个在线主机的探测次数（默认4次）
             - timeout: 超时时间（默认1秒）
+            - ports: TCP探测端口列表（可选，默认常见IoT端口）
+            - icmp: 是否使用ICMP探测（默认True，无权限时自动退化为仅TCP）
         progress_callback: 进度回调函数
-        
+
     Returns:
         dict: 扫描结果
     """
     target = params.get("target")
     count = params.get("count", 4)
     timeout = params.get("timeout", 1)
-    
+
     if not target:
         raise ValueError("Missing required parameter: target")
-    
+
     logger.info(f"Starting ping scan for {target} (count={count})")
     progress_callback(10, f"开始扫描 {target}", "INFO")
-    
-    results = []
-    success_count = 0
-    total_latency = 0.0
-    
-    for i in range(count):
-        try:
-            # 构建ping命令（跨平台）
-            import platform
-            if platform.system().lower() == "windows":
-                cmd = ["ping", "-n", "1", "-w", str(timeout * 1000), target]
-            else:
-                cmd = ["ping", "-c", "1", "-W", str(timeout), target]
-            
-            # 执行ping
-            start_time = time.time()
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=timeout + 2  # 留2秒缓冲
-            )
-            elapsed = (time.time() - start_time) * 1000  # 转为毫秒
-            
-            success = result.returncode == 0
-            
-            # 解析延迟（简单实现，从输出中提取time=XXms）
-            latency = None
-            if success:
-                output = result.stdout
-                # 尝试提取time信息
-                import re
-                time_match = re.search(r'time[=<](\d+\.?\d*)\s*ms', output, re.IGNORECASE)
-                if time_match:
-                    latency = float(time_match.group(1))
-                else:
-                    latency = elapsed
-            
-            results.append({
-                "attempt": i + 1,
-                "success": success,
-                "latency_ms": latency,
-                "output": result.stdout if success else result.stderr
-            })
-            
-            if success:
-                success_count += 1
-                if latency:
-                    total_latency += latency
-            
-            # 更新进度
-            progress = 10 + int((i + 1) / count * 85)
-            log_level = "INFO" if success else "WARN"
-            progress_callback(
-                progress,
-                f"Ping {i+1}/{count} - {'成功' if success else '失败'} (延迟: {latency:.2f}ms)" if latency else f"Ping {i+1}/{count} - {'成功' if success else '失败'}",
-                log_level,
-                {"attempt": i+1, "success": success, "latency_ms": latency}
-            )
-            
-            # 间隔一下
-            if i < count - 1:
-                time.sleep(0.5)
-                
-        except subprocess.TimeoutExpired:
-            results.append({
-                "attempt": i + 1,
-                "success": False,
-                "latency_ms": None,
-                "output": "Timeout"
-            })
-            progress_callback(
-                10 + int((i + 1) / count * 85),
-                f"Ping {i+1}/{count} - 超时",
-                "ERROR",
-                {"attempt": i+1, "error": "timeout"}
-            )
-        except Exception as e:
-            logger.error(f"Ping attempt {i+1} failed: {e}")
-            results.append({
-                "attempt": i + 1,
-                "success": False,
-                "latency_ms": None,
-                "output": str(e)
-            })
-    
-    # 计算统计
-    loss_rate = ((count - success_count) / count) * 100
-    avg_latency = (total_latency / success_count) if success_count > 0 else None
-    
+
+    discovery = HostDiscovery(
+        ports=params.get("ports"),
+        timeout=float(timeout),
+        count=int(count),
+        use_icmp=params.get("icmp", True)
+    )
+
+    last_reported = {"progress": 10}
+
+    def on_host(host: Dict[str, Any]):
+        if host["state"] != "up":
+            if host.get("error"):
+                progress_callback(last_reported["progress"], f"{host['ip']}: {host['error']}", "WARN")
+            return
+        ports = f"，开放端口: {', '.join(map(str, host['open_ports']))}" if host["open_ports"] else ""
+        progress_callback(
+            last_reported["progress"],
+            f"主机在线: {host['ip']} - {host['received']}/{host['sent']} 响应 "
+            f"(平均延迟: {host['avg_latency_ms']:.2f}ms){ports}",
+            "INFO",
+            {"host": host}
+        )
+
+    def on_progress(done: int, total: int):
+        progress = 10 + int(done / total * 85)
+        if progress > last_reported["progress"]:
+            last_reported["progress"] = progress
+            progress_callback(progress, f"已探测 {done}/{total} 个主机", "INFO")
+
+    try:
+        discovered = discovery.discover(
+            target,
+            on_host=on_host,
+            on_progress=on_progress,
+            should_cancel=lambda: task_executor.is_cancelled(task_id)
+        )
+    except DiscoveryCancelled:
+        progress_callback(last_reported["progress"], "扫描已取消", "WARNING")
+        logger.info(f"Ping scan for {target} cancelled")
+        raise
+
     progress_callback(95, "分析结果", "INFO")
-    
+
+    # 汇总统计 (兼容单主机结果格式)
+    hosts = discovered["hosts"]
+    attempts = [
+        {**attempt, "host": host["ip"]}
+        for host in hosts
+        for attempt in host["attempts"]
+    ]
+    latencies = [a["latency_ms"] for a in attempts if a["success"]]
+    total_attempts = len(attempts)
+    success_count = len(latencies)
+
     final_result = {
         "target": target,
-        "total_attempts": count,
+        "total_attempts": total_attempts,
         "successful": success_count,
-        "failed": count - success_count,
-        "loss_rate": round(loss_rate, 2),
-        "avg_latency_ms": round(avg_latency, 2) if avg_latency else None,
-        "min_latency_ms": min((r["latency_ms"] for r in results if r["latency_ms"]), default=None),
-        "max_latency_ms": max((r["latency_ms"] for r in results if r["latency_ms"]), default=None),
-        "details": results,
+        "failed": total_attempts - success_count,
+        "loss_rate": round((total_attempts - success_count) / total_attempts * 100, 2) if total_attempts else 100.0,
+        "avg_latency_ms": round(sum(latencies) / success_count, 2) if success_count else None,
+        "min_latency_ms": min(latencies, default=None),
+        "max_latency_ms": max(latencies, default=None),
+        "details": attempts,
+        "hosts_total": discovered["hosts_total"],
+        "hosts_up": discovered["hosts_up"],
+        "hosts": [host for host in hosts if host["state"] == "up"],
+        "icmp": discovered["icmp"],
+        "elapsed": discovered["elapsed"],
         "status": "reachable" if success_count > 0 else "unreachable"
     }
-    
-    logger.info(f"Ping scan completed for {target}: {success_count}/{count} successful")
+
+    progress_callback(
+        100,
+        f"扫描完成: {discovered['hosts_up']}/{discovered['hosts_total']} 个主机在线，"
+        f"耗时 {discovered['elapsed']:.1f} 秒",
+        "INFO"
+    )
+    logger.info(
+        f"Ping scan completed for {target}: "
+        f"{discovered['hosts_up']}/{discovered['hosts_total']} hosts up"
+    )
     return final_result
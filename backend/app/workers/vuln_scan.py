@@ -3,16 +3,32 @@
 
 基于Nmap扫描结果查询CVE数据库
 """
+import asyncio
 import logging
-from typing import Dict, Any, Callable, List
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, List, Optional, Set, Tuple, Union
 from sqlalchemy.orm import Session
 
-from app.services.nvd_client import NVDClient
-from app.models import ScanResult, Vulnerability
+from app.core.config import settings
+from app.core.task_executor import task_executor
+from app.services.bulk_persistence import bulk_insert_vulnerabilities
+from app.services.cpe_resolver import cpe_resolver, parse_cpe
+from app.services.nvd_cache import get_nvd_cache
+from app.services.nvd_client import NVDClient, get_nvd_rate_limiter
+from app.services.nvd_mirror import normalize_product, nvd_mirror
+from app.models import ScanResult, Task, Vulnerability
 from app.core.database import get_sync_db
 
 logger = logging.getLogger(__name__)
 
+# 关键词搜索结果相关性低，只取前几条；按CPE查询的结果都相关，全部保留
+MAX_RESULTS_KEYWORD = 20
+MAX_RESULTS_CPE = 500
+
+# 服务位置 (主机, 协议, 端口) 和漏洞实例 (主机, 协议, 端口, CVE)
+Endpoint = Tuple[str, str, Optional[int]]
+FindingKey = Tuple[str, str, Optional[int], str]
+
 
 def vuln_scan_worker(
     task_id: str,
@@ -28,8 +44,12 @@ def vuln_scan_worker(
             - scan_result_id: Nmap扫描结果记录ID (可选)
             - nmap_task_id: Nmap任务ID，会自动查询其scan_result (可选)
             - target_services: 手动指定的服务列表 (可选)
+            - target: 扫描目标 (可选，未提供以上参数时先执行Nmap扫描，新鲜的缓存结果
+              直接复用；扫描配置 scanType 等和 forceRescan 同 nmap_scan_worker)
             - severity_filter: 严重程度过滤 (可选)
             - nvd_api_key: NVD API密钥 (可选)
+            - baseline_task_id: 基线漏洞扫描任务ID (可选，增量扫描: 只查询新增或
+              版本变化的服务，其余沿用基线结果及其处理状态)
         progress_callback: 进度回调函数
         
     Returns:
@@ -38,8 +58,11 @@ def vuln_scan_worker(
     scan_result_id = params.get("scan_result_id")
     nmap_task_id = params.get("nmap_task_id")
     target_services = params.get("target_services", [])
+    target = params.get("target")
     severity_filter = params.get("severity_filter", ["CRITICAL", "HIGH", "MEDIUM", "LOW"])
     api_key = params.get("nvd_api_key")
+    baseline_task_id = params.get("baseline_task_id")
+    scanned_at = datetime.now(timezone.utc)
     
     progress_callback(0, "开始漏洞扫描", "INFO", {})
     
@@ -60,8 +83,11 @@ def vuln_scan_worker(
     elif target_services:
         # 使用手动指定的服务
         services = target_services
+    elif target:
+        # 扫描目标 (扫描缓存新鲜时直接复用)
+        scan_result_id, services = _scan_target_services(task_id, params, progress_callback)
     else:
-        raise ValueError("Must provide either scan_result_id, nmap_task_id, or target_services")
+        raise ValueError("Must provide either scan_result_id, nmap_task_id, target_services, or target")
     
     if not services:
         progress_callback(100, "未发现可扫描的服务", "WARNING", {})
@@ -69,97 +95,98 @@ def vuln_scan_worker(
     
     progress_callback(20, f"发现 {len(services)} 个服务待扫描", "INFO", {})
     
-    # 初始化NVD客户端
-    nvd_client = NVDClient(api_key=api_key)
+    # 相同的 (产品, 版本) 只查询一次，结果在保存时分发到每个主机/端口
+    groups = group_services(services)
+    progress_callback(
+        20,
+        f"{len(services)} 个服务归并为 {len(groups)} 个唯一的软件版本",
+        "INFO",
+        {}
+    )
     
-    # 扫描每个服务
-    all_vulnerabilities = []
-    for idx, service in enumerate(services):
-        progress = 20 + int((idx / len(services)) * 60)
-        
-        service_name = service.get("name")
-        service_version = service.get("version", "")
-        port = service.get("port")
-        
+    # 增量扫描: 与基线相同且CVE未更新的软件版本直接沿用基线结果
+    baseline = None
+    lookup_groups, carried_groups = groups, []
+    if baseline_task_id:
+        baseline = _load_baseline(baseline_task_id, severity_filter)
+        if baseline is None:
+            progress_callback(20, "基线任务缺少服务快照或过滤条件不同，执行完整扫描", "WARNING", {})
+        else:
+            modified = nvd_mirror.modified_since(baseline["scanned_at"])
+            if modified is None:
+                progress_callback(20, "本地NVD镜像不可用，无法检查CVE更新，重新查询所有软件版本", "WARNING", {})
+            lookup_groups, carried_groups = split_groups_by_baseline(groups, baseline, modified)
+            progress_callback(
+                20,
+                f"增量扫描: {len(carried_groups)} 个软件版本沿用基线结果，{len(lookup_groups)} 个需要查询",
+                "INFO",
+                {}
+            )
+    
+    # 所有查询在一个事件循环上并发执行，共用连接池和全局限流器
+    nvd_client = create_nvd_client(api_key)
+    queries = [(group["product"], group["version"], group["cpes"]) for group in lookup_groups]
+    
+    def on_lookup(idx: int, done: int, result):
+        group = lookup_groups[idx]
         progress_callback(
-            progress,
-            f"扫描服务: {service_name} {service_version} (端口{port})",
+            20 + int((done / len(lookup_groups)) * 60),
+            f"扫描服务: {group['product']} {group['version']} ({len(group['services'])} 个端口)",
             "INFO",
             {}
         )
+    
+    lookup_results = search_cves_concurrently(nvd_client, queries, on_lookup)
+    
+    findings = []
+    scanned_groups = list(carried_groups)
+    for group in carried_groups:
+        cves = list(baseline["cves"].get(group["key"], {}).values())
+        if cves:
+            findings.append({"cves": cves, "services": group["services"]})
+    
+    for group, cves in zip(lookup_groups, lookup_results):
+        product = group["product"]
+        version = group["version"]
         
-        try:
-            # 查询CVE (使用同步方法)
-            import asyncio
-            from datetime import datetime
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                cves = loop.run_until_complete(
-                    nvd_client.search_cves(service_name, service_version, max_results=20)
-                )
-            finally:
-                loop.close()
-            
-            logger.info(f"NVD returned {len(cves)} CVEs for {service_name} {service_version}")
-            
-            # 多层过滤提高准确性
-            filtered_cves = []
-            current_year = datetime.now().year
-            
-            for cve in cves:
-                # 1. 过滤严重程度
-                if cve["severity"] not in severity_filter:
-                    logger.debug(f"Filtered by severity: {cve['cve_id']} ({cve['severity']})")
-                    continue
-                
-                # 2. 时间过滤：排除过于老旧的CVE (15年前，放宽限制)
-                if cve.get("published_date"):
-                    try:
-                        pub_year = int(cve["published_date"][:4])
-                        if pub_year < current_year - 15:  # 改为15年
-                            logger.debug(f"Filtered old CVE: {cve['cve_id']} ({pub_year})")
-                            continue
-                    except (ValueError, TypeError):
-                        pass
-                
-                # 3. 版本匹配：如果有版本信息，检查是否真的影响该版本
-                if service_version and cve.get("affected_products"):
-                    if not nvd_client.is_version_affected(service_version, cve["affected_products"]):
-                        logger.debug(f"Filtered non-matching version: {cve['cve_id']} for {service_name} {service_version}")
-                        continue
-                
-                filtered_cves.append(cve)
-            
-            logger.info(f"After filtering: {len(filtered_cves)} CVEs remain for {service_name}")
-            
-            if filtered_cves:
-                progress_callback(
-                    progress,
-                    f"发现 {len(filtered_cves)} 个漏洞",
-                    "WARNING",
-                    {}
-                )
-                
-                # 添加服务信息
-                for cve in filtered_cves:
-                    cve.update({
-                        "service_name": service_name,
-                        "service_version": service_version,
-                        "port": port,
-                        "protocol": service.get("protocol", "tcp")
-                    })
-                
-                all_vulnerabilities.extend(filtered_cves)
-            
-        except Exception as e:
-            logger.error(f"Error scanning {service_name}: {e}")
+        if isinstance(cves, Exception):
+            logger.error(f"Error scanning {product}: {cves}")
+            progress_callback(80, f"扫描失败: {product} - {str(cves)}", "ERROR", {})
+            continue
+        scanned_groups.append(group)
+        
+        logger.info(f"NVD returned {len(cves)} CVEs for {product} {version}")
+        
+        filtered_cves = filter_cves(cves, product, version, severity_filter, nvd_client)
+        
+        logger.info(f"After filtering: {len(filtered_cves)} CVEs remain for {product}")
+        
+        if filtered_cves:
             progress_callback(
-                progress,
-                f"扫描失败: {service_name} - {str(e)}",
-                "ERROR",
+                80,
+                f"{product} {version}: 发现 {len(filtered_cves)} 个漏洞，影响 {len(group['services'])} 个端口",
+                "WARNING",
                 {}
             )
+            findings.append({"cves": filtered_cves, "services": group["services"]})
+    
+    all_vulnerabilities = list(fan_out_findings(findings))
+    
+    incremental = None
+    if baseline is not None:
+        incremental = apply_baseline_status(all_vulnerabilities, baseline)
+        incremental.update({
+            "baseline_task_id": str(baseline_task_id),
+            "carried_versions": len(carried_groups),
+            "queried_versions": len(lookup_groups),
+        })
+        progress_callback(
+            85,
+            f"与基线相比: 新增 {incremental['new']} 个，未变化 {incremental['unchanged']} 个，"
+            f"已消失 {len(incremental['resolved'])} 个漏洞",
+            "INFO",
+            {}
+        )
     
     # 保存结果
     progress_callback(85, "保存漏洞数据到数据库", "INFO", {})
@@ -179,12 +206,306 @@ def vuln_scan_worker(
         "low_count": sum(1 for v in all_vulnerabilities if v.get("severity") == "LOW"),
     }
     
-    return {
+    results = {
         "vulnerabilities_found": len(all_vulnerabilities),
         "services_scanned": len(services),
+        "unique_versions": len(groups),
         "vulnerabilities": all_vulnerabilities,
+        # 作为后续增量扫描的基线
+        "scanned_at": scanned_at.isoformat(),
+        "severity_filter": sorted(severity_filter),
+        "scanned_services": [
+            [*service_endpoint(service), *group["key"]]
+            for group in scanned_groups
+            for service in group["services"]
+        ],
         **severity_counts
     }
+    if incremental is not None:
+        results["incremental"] = incremental
+    return results
+
+
+def filter_cves(
+    cves: List[Dict],
+    service_name: str,
+    service_version: str,
+    severity_filter: List[str],
+    nvd_client: NVDClient
+) -> List[Dict]:
+    """多层过滤NVD返回的CVE，提高准确性"""
+    filtered_cves = []
+    current_year = datetime.now().year
+    # 整个查询结果的版本范围编译为一个区间索引，一次查询得到受影响的CVE
+    affected = nvd_client.version_index(cves).lookup(service_version) if service_version else None
+    
+    for cve in cves:
+        # 1. 过滤严重程度
+        if cve["severity"] not in severity_filter:
+            logger.debug(f"Filtered by severity: {cve['cve_id']} ({cve['severity']})")
+            continue
+        
+        # 2. 时间过滤：排除过于老旧的CVE (15年前，放宽限制)
+        if cve.get("published_date"):
+            try:
+                pub_year = int(cve["published_date"][:4])
+                if pub_year < current_year - 15:  # 改为15年
+                    logger.debug(f"Filtered old CVE: {cve['cve_id']} ({pub_year})")
+                    continue
+            except (ValueError, TypeError):
+                pass
+        
+        # 3. 版本匹配：如果有版本信息，检查是否真的影响该版本
+        if affected is not None and cve["cve_id"] not in affected:
+            logger.debug(f"Filtered non-matching version: {cve['cve_id']} for {service_name} {service_version}")
+            continue
+        
+        filtered_cves.append(cve)
+    
+    return filtered_cves
+
+
+def service_query_key(product: str, version: str) -> Tuple[str, str]:
+    """规范化的 (产品, 版本)，用于合并相同软件版本的服务"""
+    return normalize_product(product or ""), (version or "").strip().lstrip("vV").lower()
+
+
+def group_services(services: List[Dict]) -> List[Dict]:
+    """
+    按规范化的 (产品, 版本) 合并服务
+    
+    Returns:
+        [{key, product, version, cpes, services}]，product/version 取组内第一个服务的原始值，
+        cpes 为解析出的候选CPE (无法解析时为空，按关键词搜索)
+    """
+    groups: Dict[Tuple[str, str], Dict] = {}
+    for service in services:
+        # Nmap产品名 (如 "OpenSSH") 比服务名 (如 "ssh") 更接近CPE产品名
+        product = service.get("product") or service.get("name") or ""
+        version = service.get("version", "") or ""
+        key = service_query_key(product, version)
+        if key not in groups:
+            groups[key] = {
+                "key": key,
+                "product": product,
+                "version": version,
+                "cpes": cpe_resolver.resolve(
+                    product=service.get("product", ""),
+                    version=version,
+                    extrainfo=service.get("extrainfo", ""),
+                    service_name=service.get("name", ""),
+                    nmap_cpe=service.get("cpe", "")
+                ),
+                "services": []
+            }
+        groups[key]["services"].append(service)
+    return list(groups.values())
+
+
+def service_endpoint(service: Dict) -> Endpoint:
+    """服务所在的 (主机, 协议, 端口)"""
+    return service.get("host") or "", service.get("protocol") or "tcp", service.get("port")
+
+
+def split_groups_by_baseline(
+    groups: List[Dict],
+    baseline: Dict,
+    modified: Optional[Dict[str, Set]]
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    按基线划分需要查询和可以沿用的软件版本
+    
+    基线中查询过的 (产品, 版本) 可以沿用，除非基线发现的某个CVE此后有更新，
+    或该产品的CPE出现了更新/新发布的CVE (modified 为镜像中基线扫描之后
+    lastModified 变化的CVE和产品，见 NVDMirror.modified_since)。
+    modified 为 None (无法判断CVE是否更新) 时不沿用任何结果，
+    基线仅用于沿用处理状态。
+    
+    Returns:
+        (需要查询的组, 沿用基线结果的组)
+    """
+    if modified is None:
+        return list(groups), []
+    
+    changed_cves = modified["cves"]
+    changed_products = modified["products"]
+    
+    lookup, carried = [], []
+    for group in groups:
+        key = group["key"]
+        stale = key not in baseline["versions"]
+        if not stale and changed_cves:
+            stale = not changed_cves.isdisjoint(baseline["cves"].get(key, {}))
+        if not stale and changed_products:
+            for cpe in group["cpes"]:
+                parsed = parse_cpe(cpe)
+                if parsed and (parsed["vendor"], parsed["product"]) in changed_products:
+                    stale = True
+                    break
+        (lookup if stale else carried).append(group)
+    return lookup, carried
+
+
+def apply_baseline_status(vulnerabilities: List[Dict], baseline: Dict) -> Dict[str, Any]:
+    """
+    沿用基线中同一漏洞实例的处理状态和修复建议，统计变化
+    
+    Returns:
+        {new, unchanged, resolved}，resolved 为基线中存在、本次不再出现的漏洞实例
+    """
+    statuses = baseline["statuses"]
+    seen: Set[FindingKey] = set()
+    new = 0
+    for vuln in vulnerabilities:
+        finding_key = (*service_endpoint(vuln), vuln["cve_id"])
+        seen.add(finding_key)
+        previous = statuses.get(finding_key)
+        if previous is None:
+            new += 1
+            continue
+        vuln["status"], vuln["remediation"] = previous
+    
+    resolved = []
+    for finding_key in sorted(set(statuses) - seen, key=str):
+        host, protocol, port, cve_id = finding_key
+        resolved.append({
+            "host": host,
+            "protocol": protocol,
+            "port": port,
+            "cve_id": cve_id,
+            "status": statuses[finding_key][0]
+        })
+    return {"new": new, "unchanged": len(seen & set(statuses)), "resolved": resolved}
+
+
+def fan_out_findings(findings: List[Dict]):
+    """将每组的CVE展开为每个主机/端口一条漏洞记录"""
+    for finding in findings:
+        for service in finding["services"]:
+            for cve in finding["cves"]:
+                yield {
+                    **cve,
+                    "service_name": service.get("name"),
+                    "service_version": service.get("version", ""),
+                    "host": service.get("host"),
+                    "port": service.get("port"),
+                    "protocol": service.get("protocol", "tcp")
+                }
+
+
+def create_nvd_client(api_key: Optional[str] = None) -> NVDClient:
+    """NVD客户端: 本地镜像 + 查询缓存 + Redis全局限流"""
+    return NVDClient(
+        api_key=api_key,
+        mirror=nvd_mirror,
+        cache=get_nvd_cache(task_executor.redis_sync),
+        rate_limiter=get_nvd_rate_limiter(api_key, task_executor.redis_sync)
+    )
+
+
+def search_cves_concurrently(
+    nvd_client: NVDClient,
+    queries: List[Tuple[str, str, Optional[List[str]]]],
+    on_done: Optional[Callable[[int, int, Union[List[Dict], Exception]], None]] = None
+) -> List[Union[List[Dict], Exception]]:
+    """
+    在一个事件循环上并发执行CVE查询
+    
+    最多 NVD_MAX_CONCURRENCY 个查询同时进行，共用一个HTTP连接池；
+    实际请求速率由客户端的全局令牌桶控制。
+    
+    Args:
+        nvd_client: NVD客户端
+        queries: (产品, 版本, 候选CPE) 列表
+        on_done: 每个查询完成时调用 (查询序号, 已完成数, 结果)
+        
+    Returns:
+        与 queries 顺序对应的结果，失败的查询为对应的异常
+    """
+    results: List[Union[List[Dict], Exception]] = [[] for _ in queries]
+    
+    async def _search_all():
+        semaphore = asyncio.Semaphore(settings.NVD_MAX_CONCURRENCY)
+        done = 0
+        
+        async def _search(idx: int, product: str, version: str, cpes: Optional[List[str]]):
+            nonlocal done
+            async with semaphore:
+                try:
+                    results[idx] = await nvd_client.search_cves(
+                        product,
+                        version,
+                        max_results=MAX_RESULTS_CPE if cpes else MAX_RESULTS_KEYWORD,
+                        cpes=cpes
+                    )
+                except Exception as e:
+                    results[idx] = e
+            done += 1
+            if on_done:
+                on_done(idx, done, results[idx])
+        
+        async with nvd_client:
+            await asyncio.gather(*(
+                _search(idx, *query) for idx, query in enumerate(queries)
+            ))
+    
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(_search_all())
+    finally:
+        loop.close()
+    
+    return results
+
+
+def lookup_component_cves(
+    components: List[Tuple[str, str, Optional[str]]],
+    severity_filter: List[str],
+    api_key: Optional[str] = None,
+    progress_callback: Optional[Callable[[int, int, str, str], None]] = None
+) -> Dict[Tuple[str, str, Optional[str]], List[Dict]]:
+    """
+    批量查询组件CVE (固件SBOM等非Nmap来源)
+    
+    每个唯一的 (产品, 版本, CPE) 只查询一次，查询并发执行，
+    过滤规则与 vuln_scan_worker 相同。调用方已知组件CPE时直接按该CPE查询，
+    否则通过 cpe_resolver 解析候选CPE。
+    
+    Args:
+        components: (产品, 版本, CPE或None) 列表
+        severity_filter: 严重程度过滤
+        api_key: NVD API密钥 (可选)
+        progress_callback: 每个组件查询完成时调用 (已完成数, 总数, 产品, 版本)
+        
+    Returns:
+        dict: (产品, 版本, CPE或None) -> 过滤后的CVE列表
+    """
+    unique = sorted(set(components), key=lambda c: (c[0], c[1], c[2] or ""))
+    nvd_client = create_nvd_client(api_key)
+    
+    def on_lookup(idx: int, done: int, result):
+        if progress_callback:
+            product, version, _ = unique[idx]
+            progress_callback(done, len(unique), product, version)
+    
+    queries = [
+        (product, version, [cpe] if cpe else cpe_resolver.resolve(product=product, version=version))
+        for product, version, cpe in unique
+    ]
+    lookup_results = search_cves_concurrently(nvd_client, queries, on_lookup)
+    
+    results: Dict[Tuple[str, str, Optional[str]], List[Dict]] = {}
+    for key, cves in zip(unique, lookup_results):
+        product, version, _ = key
+        if isinstance(cves, Exception):
+            logger.error(f"Error looking up {product} {version}: {cves}")
+            results[key] = []
+            continue
+        results[key] = filter_cves(
+            cves, product, version, severity_filter, nvd_client
+        )
+    
+    return results
 
 
 def _get_scan_result_id_from_task(
@@ -211,6 +532,55 @@ def _get_scan_result_id_from_task(
         db.close()
 
 
+def _scan_target_services(
+    task_id: str,
+    params: Dict[str, Any],
+    progress_callback: Callable
+) -> Tuple[Optional[str], List[Dict]]:
+    """
+    对目标执行Nmap扫描 (作为本任务的一部分，占总进度 5-20%)
+    
+    nmap_scan_worker 在扫描缓存新鲜时直接复用缓存结果，并把结果保存为本任务的
+    扫描结果记录，漏洞关联到该记录。
+    
+    Returns:
+        (扫描结果记录ID, 服务列表)
+    """
+    from app.workers.nmap_scan import nmap_scan_worker
+    
+    def nmap_progress(progress: int, message: str = "", level: str = "INFO", data: dict = None):
+        progress_callback(5 + progress * 15 // 100, f"[Nmap] {message}", level, data or {})
+    
+    scan_results = nmap_scan_worker(task_id, params, nmap_progress)
+    scan_result_id = _get_scan_result_id_from_task(task_id, progress_callback)
+    return scan_result_id, extract_services(scan_results)
+
+
+def extract_services(result_data: Dict[str, Any]) -> List[Dict]:
+    """从nmap扫描结果 (ScanResult.result) 中提取已识别的服务"""
+    services = []
+    
+    for host in result_data.get("hosts", []):
+        for port_data in host.get("ports", []):
+            service_name = port_data.get("service")
+            service_version = port_data.get("version", "")
+            
+            # 只扫描已识别的服务
+            if service_name and service_name not in ["unknown", "tcpwrapped"]:
+                services.append({
+                    "host": host.get("ip"),
+                    "name": service_name,
+                    "version": service_version,
+                    "port": port_data.get("port"),
+                    "protocol": port_data.get("protocol", "tcp"),
+                    "product": port_data.get("product", ""),
+                    "extrainfo": port_data.get("extrainfo", ""),
+                    "cpe": port_data.get("cpe", "")
+                })
+    
+    return services
+
+
 def _extract_services_from_scan(
     scan_result_id: str,
     progress_callback: Callable
@@ -226,25 +596,7 @@ def _extract_services_from_scan(
         if not scan_result:
             raise ValueError(f"Scan result not found: {scan_result_id}")
         
-        # 解析结果
-        result_data = scan_result.result
-        services = []
-        
-        for host in result_data.get("hosts", []):
-            for port_data in host.get("ports", []):
-                service_name = port_data.get("service")
-                service_version = port_data.get("version", "")
-                
-                # 只扫描已识别的服务
-                if service_name and service_name not in ["unknown", "tcpwrapped"]:
-                    services.append({
-                        "name": service_name,
-                        "version": service_version,
-                        "port": port_data.get("port"),
-                        "protocol": port_data.get("protocol", "tcp"),
-                        "product": port_data.get("product", "")
-                    })
-        
+        services = extract_services(scan_result.result)
         logger.info(f"Extracted {len(services)} services from scan result")
         return services
         
@@ -252,41 +604,93 @@ def _extract_services_from_scan(
         db.close()
 
 
+def _load_baseline(baseline_task_id: str, severity_filter: List[str]) -> Optional[Dict]:
+    """
+    加载基线漏洞扫描任务
+    
+    Returns:
+        {scanned_at, versions, cves, statuses}:
+        - versions: 基线查询过的规范化 (产品, 版本)
+        - cves: (产品, 版本) -> {cve_id: CVE数据}
+        - statuses: (主机, 协议, 端口, CVE) -> (状态, 修复建议)
+        基线没有服务快照 (早期任务) 或严重程度过滤不同时返回 None
+    """
+    db = next(get_sync_db())
+    
+    try:
+        task = db.query(Task).filter(Task.id == baseline_task_id).first()
+        if not task or task.type != "vuln_scan":
+            raise ValueError(f"基线任务 {baseline_task_id} 不存在或不是漏洞扫描任务")
+        if task.status != "completed":
+            raise ValueError(f"基线任务 {baseline_task_id} 尚未完成")
+        
+        results = task.results or {}
+        if "scanned_services" not in results or "scanned_at" not in results:
+            logger.warning(f"Baseline task {baseline_task_id} has no service snapshot")
+            return None
+        if sorted(results.get("severity_filter", [])) != sorted(severity_filter):
+            logger.warning(f"Baseline task {baseline_task_id} used a different severity filter")
+            return None
+        
+        endpoints: Dict[Endpoint, Tuple[str, str]] = {}
+        for host, protocol, port, product_key, version_key in results["scanned_services"]:
+            endpoints[(host, protocol, port)] = (product_key, version_key)
+        
+        cves: Dict[Tuple[str, str], Dict[str, Dict]] = {}
+        statuses: Dict[FindingKey, Tuple[str, Optional[str]]] = {}
+        for vuln in db.query(Vulnerability).filter(Vulnerability.task_id == baseline_task_id).all():
+            endpoint = (vuln.host or "", vuln.protocol or "tcp", vuln.port)
+            statuses[(*endpoint, vuln.cve_id)] = (vuln.status or "open", vuln.remediation)
+            key = endpoints.get(endpoint)
+            if key is not None:
+                cves.setdefault(key, {}).setdefault(vuln.cve_id, _baseline_cve(vuln))
+        
+        logger.info(
+            f"Loaded baseline {baseline_task_id}: {len(endpoints)} services, {len(statuses)} findings"
+        )
+        return {
+            "scanned_at": datetime.fromisoformat(results["scanned_at"]),
+            "versions": set(endpoints.values()),
+            "cves": cves,
+            "statuses": statuses,
+        }
+        
+    finally:
+        db.close()
+
+
+def _baseline_cve(vuln: Vulnerability) -> Dict:
+    """基线漏洞记录还原为CVE查询结果的结构"""
+    def _format(value: Optional[datetime]) -> Optional[str]:
+        return value.strftime("%Y-%m-%dT%H:%M:%S.000") if value else None
+    
+    return {
+        "cve_id": vuln.cve_id,
+        "description": vuln.cve_description or "",
+        "cvss_score": vuln.cvss_score or 0.0,
+        "cvss_vector": vuln.cvss_vector or "",
+        "severity": vuln.severity,
+        "published_date": _format(vuln.published_date),
+        "last_modified_date": _format(vuln.last_modified_date),
+        "references": vuln.references or [],
+        "affected_products": [],
+    }
+
+
 def _save_vulnerabilities(
     task_id: str,
     scan_result_id: str,
     vulnerabilities: List[Dict]
 ):
-    """保存漏洞到数据库"""
-    db = next(get_sync_db())
+    """
+    保存漏洞到数据库 (批量插入，同一任务内重复的 CVE/端口/主机 跳过)
     
+    Args:
+        vulnerabilities: 展开到每个主机/端口的漏洞 (见 fan_out_findings)
+    """
     try:
-        for vuln_data in vulnerabilities:
-            vulnerability = Vulnerability(
-                task_id=task_id,
-                scan_result_id=scan_result_id,
-                cve_id=vuln_data["cve_id"],
-                cve_description=vuln_data["description"],
-                service_name=vuln_data["service_name"],
-                service_version=vuln_data["service_version"],
-                port=vuln_data["port"],
-                protocol=vuln_data["protocol"],
-                severity=vuln_data["severity"],
-                status="open",
-                cvss_score=vuln_data["cvss_score"],
-                cvss_vector=vuln_data["cvss_vector"],
-                published_date=vuln_data.get("published_date"),
-                last_modified_date=vuln_data.get("last_modified_date"),
-                references=vuln_data.get("references", [])
-            )
-            db.add(vulnerability)
-        
-        db.commit()
-        logger.info(f"Saved {len(vulnerabilities)} vulnerabilities")
-        
+        count = bulk_insert_vulnerabilities(task_id, scan_result_id, vulnerabilities)
+        logger.info(f"Saved {count} vulnerabilities")
     except Exception as e:
-        db.rollback()
         logger.error(f"Error saving vulnerabilities: {e}")
         raise
-    finally:
-        db.close()
@@ -0,0 +1,203 @@
+"""
+漏洞扫描CVE查询基准测试
+
+在本地NVD模拟服务器 (scripts/nvd_stub_server.py) 上对大量服务执行
+vuln_scan 的查询流程 (服务归并 -> CPE解析 -> 并发查询 -> 过滤)，
+统计耗时、查询并发度、HTTP请求数和缓存命中率。第二轮起同一进程内的
+查询缓存已预热。
+
+用法:
+    python scripts/benchmark_vuln_scan.py --hosts 500 --services-per-host 6 --latency 0.1
+    python scripts/benchmark_vuln_scan.py --client-rate 5 --window 30        # 模拟无API密钥的NVD限速
+    python scripts/benchmark_vuln_scan.py --url http://127.0.0.1:8089/rest/json/cves/2.0
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.request import urlopen
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.core.config import settings
+from app.services.cpe_resolver import cpe_resolver
+from app.services.nvd_cache import NVDQueryCache
+from app.services.nvd_client import NVDClient
+from app.services.rate_limiter import TokenBucket
+from app.workers.vuln_scan import filter_cves, group_services, search_cves_concurrently
+from nvd_stub_server import NVDStubData, NVDStubServer, start_in_thread, synthetic_vulnerabilities
+
+SEVERITY_FILTER = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+
+
+class ConcurrencyProbe:
+    """统计客户端同时进行的API请求数"""
+
+    def __init__(self, client: NVDClient):
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._request = client._request
+        client._request = self._tracked
+
+    async def _tracked(self, params):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await self._request(params)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def reset(self):
+        self.requests = 0
+        self.max_in_flight = 0
+
+
+def build_services(args, products):
+    """生成服务列表: 产品和版本按幂律分布，同一产品线的设备大量重复"""
+    rng = random.Random(args.seed)
+    weights = [1 / (rank + 1) for rank in range(len(products))]
+    services = []
+    for host in range(args.hosts):
+        ip = f"10.{host // 65536 % 256}.{host // 256 % 256}.{host % 256}"
+        for idx, (vendor, product) in enumerate(rng.choices(products, weights, k=args.services_per_host)):
+            version = f"1.{min(int(rng.expovariate(0.5)), args.versions - 1)}"
+            services.append({
+                "host": ip,
+                "name": "http",
+                "product": product,
+                "version": version,
+                "port": 8000 + idx,
+                "protocol": "tcp",
+                "extrainfo": "",
+                "cpe": "" if args.keyword_only else f"cpe:/a:{vendor}:{product}:{version}",
+            })
+    return services
+
+
+def server_stats(url):
+    base = url.split("/rest/")[0]
+    with urlopen(f"{base}/stats", timeout=5) as response:
+        return json.load(response)
+
+
+def run_once(client, probe, cache, services, url):
+    before_cache = cache.stats()
+    before_server = server_stats(url)
+    probe.reset()
+
+    started = time.perf_counter()
+    groups = group_services(services)
+    queries = [(group["product"], group["version"], group["cpes"]) for group in groups]
+    results = search_cves_concurrently(client, queries)
+    failed = sum(1 for cves in results if isinstance(cves, Exception))
+    findings = sum(
+        len(filter_cves(cves, group["product"], group["version"], SEVERITY_FILTER, client)) * len(group["services"])
+        for group, cves in zip(groups, results)
+        if not isinstance(cves, Exception)
+    )
+    elapsed = time.perf_counter() - started
+
+    after_cache = cache.stats()
+    after_server = server_stats(url)
+    hits = after_cache["hits"] - before_cache["hits"]
+    misses = after_cache["misses"] - before_cache["misses"]
+    return {
+        "wall_time": round(elapsed, 3),
+        "services": len(services),
+        "unique_versions": len(groups),
+        "failed_lookups": failed,
+        "findings": findings,
+        "api_requests": probe.requests,
+        "client_max_in_flight": probe.max_in_flight,
+        "server_requests": after_server["requests"] - before_server["requests"],
+        "server_rate_limited": after_server["rate_limited"] - before_server["rate_limited"],
+        "server_max_in_flight": after_server["max_in_flight"],
+        "cache_hits": hits,
+        "cache_misses": misses,
+        "cache_hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="漏洞扫描CVE查询基准测试")
+    parser.add_argument("--url", help="已运行的NVD模拟服务器地址 (默认在进程内启动)")
+    parser.add_argument("--hosts", type=int, default=200)
+    parser.add_argument("--services-per-host", type=int, default=5)
+    parser.add_argument("--products", type=int, default=40)
+    parser.add_argument("--versions", type=int, default=10)
+    parser.add_argument("--cves-per-product", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟服务器响应延迟 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--server-rate", type=int, default=None, help="模拟服务器每窗口请求上限")
+    parser.add_argument("--client-rate", type=int, default=1000, help="客户端令牌桶每窗口请求数")
+    parser.add_argument("--burst", type=int, default=10, help="客户端令牌桶容量")
+    parser.add_argument("--window", type=float, default=30.0)
+    parser.add_argument("--concurrency", type=int, default=settings.NVD_MAX_CONCURRENCY)
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--keyword-only", action="store_true", help="不提供CPE，全部按关键词查询")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    products = [(f"vendor{i}", f"product{i}") for i in range(args.products)]
+
+    server = None
+    url = args.url
+    if url is None:
+        server = NVDStubServer(
+            ("127.0.0.1", 0),
+            NVDStubData(synthetic_vulnerabilities(
+                products, args.cves_per_product, args.versions, args.seed
+            )),
+            latency=args.latency,
+            jitter=args.jitter,
+            rate=args.server_rate,
+            window=args.window
+        )
+        start_in_thread(server)
+        url = server.url
+
+    # 只测在线API路径: 不查本地镜像，CPE字典只包含模拟数据中的产品
+    settings.NVD_MIRROR_ENABLED = False
+    settings.NVD_MAX_CONCURRENCY = args.concurrency
+    cpe_resolver.dictionary.build([("a", vendor, product) for vendor, product in products])
+    cpe_resolver.dictionary._loaded_at = time.monotonic()
+
+    cache = NVDQueryCache(max_entries=settings.NVD_CACHE_MAX_ENTRIES)
+    client = NVDClient(
+        cache=cache,
+        rate_limiter=TokenBucket(
+            key="nvd:ratelimit:benchmark",
+            rate=args.client_rate,
+            period=args.window,
+            capacity=args.burst
+        ),
+        base_url=url
+    )
+    probe = ConcurrencyProbe(client)
+    services = build_services(args, products)
+
+    print(f"NVD: {url}  并发: {args.concurrency}  客户端限速: {args.client_rate}/{args.window:g}s")
+    try:
+        for run in range(1, args.runs + 1):
+            stats = run_once(client, probe, cache, services, url)
+            print(f"\n第 {run} 轮")
+            for key, value in stats.items():
+                print(f"  {key:<22} {value}")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
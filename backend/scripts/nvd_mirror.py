@@ -0,0 +1,83 @@
+"""
+NVD本地镜像维护
+
+用法:
+    python scripts/nvd_mirror.py import /data/nvd/CVE-2024.json.xz [...]
+    python scripts/nvd_mirror.py import            # 导入 NVD_FEED_DIR 下的全部数据文件
+    python scripts/nvd_mirror.py sync [--api-key KEY] [--since 2024-01-01]
+    python scripts/nvd_mirror.py status
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.config import settings
+from app.services.nvd_mirror import nvd_mirror
+
+FEED_PATTERNS = ('*.json', '*.json.gz', '*.json.xz')
+
+
+def feed_files(paths):
+    if paths:
+        return [Path(p) for p in paths]
+    feed_dir = Path(settings.NVD_FEED_DIR)
+    return sorted(f for pattern in FEED_PATTERNS for f in feed_dir.glob(pattern))
+
+
+def cmd_import(args):
+    files = feed_files(args.files)
+    if not files:
+        print(f"未找到NVD数据文件 ({settings.NVD_FEED_DIR})")
+        return 1
+    for path in files:
+        stats = nvd_mirror.import_feed_file(str(path))
+        print(f"  ✓ {path.name}: 处理 {stats['processed']} 条，更新 {stats['changed']} 条")
+    return 0
+
+
+def cmd_sync(args):
+    since = None
+    if args.since:
+        since = datetime.fromisoformat(args.since).replace(tzinfo=timezone.utc)
+    stats = nvd_mirror.sync_from_api(api_key=args.api_key, since=since)
+    print(f"  ✓ 同步完成: 处理 {stats['processed']} 条，更新 {stats['changed']} 条，"
+          f"最新 lastModified {stats['last_modified']}")
+    return 0
+
+
+def cmd_status(args):
+    status = nvd_mirror.status()
+    print(f"CVE: {status['cves']}  CPE匹配条件: {status['cpe_matches']}  "
+          f"最新 lastModified: {status['newest_last_modified']}")
+    for source in status['sources']:
+        print(f"  {source['source']:<30} {source['last_modified']}  "
+              f"同步于 {source['synced_at']}  ({source['cve_count']} 条)")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NVD本地镜像维护")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_import = sub.add_parser('import', help="离线导入NVD JSON数据文件")
+    p_import.add_argument('files', nargs='*', help="数据文件 (默认 NVD_FEED_DIR 下全部)")
+    p_import.set_defaults(func=cmd_import)
+
+    p_sync = sub.add_parser('sync', help="从NVD API增量同步")
+    p_sync.add_argument('--api-key', default=os.environ.get('NVD_API_KEY'))
+    p_sync.add_argument('--since', help="同步起点 (ISO日期，默认上次同步点)")
+    p_sync.set_defaults(func=cmd_sync)
+
+    p_status = sub.add_parser('status', help="查看镜像状态")
+    p_status.set_defaults(func=cmd_status)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
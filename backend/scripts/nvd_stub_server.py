@@ -0,0 +1,421 @@
+"""
+本地NVD API 2.0 模拟服务器
+
+离线、CI和压测时代替 services.nvd.nist.gov: 返回录制的或夹具CVE数据，
+支持 keywordSearch / cpeName / virtualMatchString / cveId / lastModStartDate
+查询和分页，可配置响应延迟、速率限制 (超限返回403，同真实NVD) 和
+随机403。
+
+用法:
+    python scripts/nvd_stub_server.py --fixtures /data/nvd-fixtures/ --port 8089
+    python scripts/nvd_stub_server.py --synthetic 50 --latency 0.2 --jitter 0.1 --rate 5 --window 30
+
+    # 让客户端和测试脚本指向模拟服务器
+    NVD_API_URL=http://127.0.0.1:8089/rest/json/cves/2.0 python scripts/test_nvd_client.py
+
+GET /stats 返回请求统计。
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.versions import WILDCARDS, version_key, version_in_range
+
+API_PATH = "/rest/json/cves/2.0"
+MAX_PAGE_SIZE = 2000
+
+
+def load_fixtures(paths: List[str]) -> List[Dict]:
+    """
+    加载CVE夹具 (.json / .json.gz，目录则加载其中全部文件)
+
+    每个文件可以是API 2.0响应 ({"vulnerabilities": [...]})、
+    vulnerabilities 列表，或单个 {"cve": {...}} 对象。
+    """
+    files: List[Path] = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(path.glob("*.json")) + sorted(path.glob("*.json.gz")))
+        else:
+            files.append(path)
+
+    vulnerabilities = []
+    for path in files:
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and "vulnerabilities" in data:
+            data = data["vulnerabilities"]
+        elif isinstance(data, dict):
+            data = [data]
+        vulnerabilities.extend(item for item in data if item.get("cve", {}).get("id"))
+    return vulnerabilities
+
+
+def synthetic_vulnerabilities(
+    products: List[Tuple[str, str]],
+    cves_per_product: int = 20,
+    versions_per_product: int = 10,
+    seed: int = 0
+) -> List[Dict]:
+    """
+    为每个 (vendor, product) 生成CVE
+
+    产品版本为 1.0 ~ 1.<versions_per_product-1>，CVE的受影响范围为
+    "< 1.k"、"1.j <= v < 1.k" 或单个精确版本，与真实NVD数据的分布相近。
+    """
+    rng = random.Random(seed)
+    base_date = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    vulnerabilities = []
+    serial = 0
+    for vendor, product in products:
+        for _ in range(cves_per_product):
+            serial += 1
+            fixed = rng.randint(1, versions_per_product)
+            shape = rng.random()
+            match = {"vulnerable": True}
+            if shape < 0.6:
+                match["criteria"] = f"cpe:2.3:a:{vendor}:{product}:*:*:*:*:*:*:*:*"
+                match["versionEndExcluding"] = f"1.{fixed}"
+            elif shape < 0.85:
+                match["criteria"] = f"cpe:2.3:a:{vendor}:{product}:*:*:*:*:*:*:*:*"
+                match["versionStartIncluding"] = f"1.{rng.randint(0, fixed - 1)}"
+                match["versionEndExcluding"] = f"1.{fixed}"
+            else:
+                match["criteria"] = f"cpe:2.3:a:{vendor}:{product}:1.{fixed - 1}:*:*:*:*:*:*:*"
+
+            score = round(rng.uniform(2.0, 10.0), 1)
+            published = base_date + timedelta(days=rng.randint(0, 1800))
+            modified = published + timedelta(days=rng.randint(0, 300))
+            vulnerabilities.append({
+                "cve": {
+                    "id": f"CVE-{published.year}-{90000 + serial}",
+                    "published": published.strftime("%Y-%m-%dT%H:%M:%S.000"),
+                    "lastModified": modified.strftime("%Y-%m-%dT%H:%M:%S.000"),
+                    "vulnStatus": "Analyzed",
+                    "descriptions": [{
+                        "lang": "en",
+                        "value": f"Synthetic vulnerability in {vendor} {product} before 1.{fixed}."
+                    }],
+                    "metrics": {"cvssMetricV31": [{"cvssData": {
+                        "baseScore": score,
+                        "vectorString": "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H",
+                    }}]},
+                    "configurations": [{"nodes": [{"cpeMatch": [match]}]}],
+                    "references": [{"url": f"https://example.invalid/{vendor}/{product}/{serial}"}],
+                }
+            })
+    return vulnerabilities
+
+
+def _parse_cpe(cpe: str) -> Optional[Dict[str, str]]:
+    parts = re.split(r"(?<!\\):", cpe)
+    if len(parts) < 5 or not cpe.startswith("cpe:2.3:"):
+        return None
+    version = parts[5] if len(parts) > 5 else "*"
+    return {"vendor": parts[3], "product": parts[4], "version": version.replace("\\", "")}
+
+
+def _parse_datetime(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class NVDStubData:
+    """CVE数据及其查询索引"""
+
+    def __init__(self, vulnerabilities: List[Dict]):
+        self.vulnerabilities = []
+        self.products = set()
+        for vuln in vulnerabilities:
+            cve = vuln["cve"]
+            matches = []
+            for config in cve.get("configurations", []):
+                for node in config.get("nodes", []):
+                    for match in node.get("cpeMatch", []):
+                        parsed = _parse_cpe(match.get("criteria", ""))
+                        if parsed and match.get("vulnerable", True):
+                            matches.append((parsed, match))
+                            self.products.add((parsed["vendor"], parsed["product"]))
+            text = " ".join(
+                [d.get("value", "") for d in cve.get("descriptions", [])]
+                + [match.get("criteria", "") for _, match in matches]
+            ).lower()
+            self.vulnerabilities.append({
+                "wrapper": vuln,
+                "id": cve["id"],
+                "last_modified": _parse_datetime(cve.get("lastModified", "1970-01-01T00:00:00")),
+                "text": text,
+                "matches": matches,
+            })
+
+    def query(self, params: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        """执行一次API查询，返回 (HTTP状态码, 响应体)"""
+        try:
+            results_per_page = min(int(params.get("resultsPerPage", MAX_PAGE_SIZE)), MAX_PAGE_SIZE)
+            start_index = int(params.get("startIndex", 0))
+        except ValueError:
+            return 400, {"message": "Invalid paging parameters"}
+
+        candidates = self.vulnerabilities
+        if "cveId" in params:
+            candidates = [v for v in candidates if v["id"] == params["cveId"]]
+
+        if "keywordSearch" in params:
+            words = params["keywordSearch"].lower().split()
+            candidates = [v for v in candidates if all(word in v["text"] for word in words)]
+
+        for name in ("cpeName", "virtualMatchString"):
+            if name not in params:
+                continue
+            cpe = _parse_cpe(params[name])
+            if cpe is None:
+                return 404, {"message": f"Invalid {name}"}
+            if name == "cpeName" and (cpe["vendor"], cpe["product"]) not in self.products:
+                return 404, {"message": "Invalid cpeName"}
+            candidates = [v for v in candidates if self._matches_cpe(v, cpe)]
+
+        if "lastModStartDate" in params or "lastModEndDate" in params:
+            try:
+                start = _parse_datetime(params.get("lastModStartDate", "1970-01-01T00:00:00"))
+                end = _parse_datetime(params.get("lastModEndDate", "9999-12-31T00:00:00"))
+            except ValueError:
+                return 404, {"message": "Invalid lastModified dates"}
+            candidates = [v for v in candidates if start <= v["last_modified"] <= end]
+
+        page = candidates[start_index:start_index + results_per_page]
+        return 200, {
+            "resultsPerPage": len(page),
+            "startIndex": start_index,
+            "totalResults": len(candidates),
+            "format": "NVD_CVE",
+            "version": "2.0",
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000"),
+            "vulnerabilities": [v["wrapper"] for v in page],
+        }
+
+    @staticmethod
+    def _matches_cpe(vuln: Dict, cpe: Dict[str, str]) -> bool:
+        version = "" if cpe["version"] in WILDCARDS else cpe["version"]
+        for parsed, match in vuln["matches"]:
+            if (parsed["vendor"], parsed["product"]) != (cpe["vendor"], cpe["product"]):
+                continue
+            if not version:
+                return True
+            if parsed["version"] not in WILDCARDS:
+                if version_key(parsed["version"]) == version_key(version):
+                    return True
+                continue
+            if version_in_range(
+                version,
+                match.get("versionStartIncluding"),
+                match.get("versionStartExcluding"),
+                match.get("versionEndIncluding"),
+                match.get("versionEndExcluding"),
+            ):
+                return True
+        return False
+
+
+class NVDStubServer(ThreadingHTTPServer):
+    """模拟NVD的HTTP服务器 (每个请求一个线程)"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        data: NVDStubData,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate: Optional[int] = None,
+        window: float = 30.0,
+        error_rate: float = 0.0,
+        api_keys: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            data: CVE数据
+            latency: 每个响应的基础延迟 (秒)
+            jitter: 额外的随机延迟上限 (秒)
+            rate: 每个窗口内每个客户端 (apiKey，无密钥时按IP) 允许的请求数，None 不限制
+            window: 速率限制窗口 (秒)
+            error_rate: 随机返回403的概率
+            api_keys: 有效的API密钥 (可选，设置后携带其他密钥的请求返回403)
+        """
+        super().__init__(address, NVDStubHandler)
+        self.data = data
+        self.latency = latency
+        self.jitter = jitter
+        self.rate = rate
+        self.window = window
+        self.error_rate = error_rate
+        self.api_keys = set(api_keys or [])
+        self._history: Dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.stats = {
+            "requests": 0,
+            "ok": 0,
+            "rate_limited": 0,
+            "forbidden": 0,
+            "not_found": 0,
+            "max_in_flight": 0,
+        }
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{API_PATH}"
+
+    def admit(self, client: str) -> bool:
+        """滑动窗口速率限制"""
+        if self.rate is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            history = self._history[client]
+            while history and now - history[0] >= self.window:
+                history.popleft()
+            if len(history) >= self.rate:
+                return False
+            history.append(now)
+            return True
+
+    def enter(self):
+        with self._lock:
+            self._in_flight += 1
+            self.stats["requests"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+
+    def leave(self, outcome: str):
+        with self._lock:
+            self._in_flight -= 1
+            self.stats[outcome] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "cves": len(self.data.vulnerabilities)}
+
+
+class NVDStubHandler(BaseHTTPRequestHandler):
+    server: NVDStubServer
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            self._send(200, self.server.snapshot())
+            return
+        if url.path.rstrip("/") != API_PATH:
+            self._send(404, {"message": "Not found"})
+            return
+
+        server = self.server
+        server.enter()
+        outcome = "ok"
+        try:
+            delay = server.latency + random.uniform(0, server.jitter)
+            if delay > 0:
+                time.sleep(delay)
+
+            api_key = self.headers.get("apiKey", "")
+            if server.api_keys and api_key and api_key not in server.api_keys:
+                outcome = "forbidden"
+                self._send(403, {"message": "Invalid apiKey"})
+                return
+            if not server.admit(api_key or self.client_address[0]):
+                outcome = "rate_limited"
+                self._send(403, {"message": "Rate limit exceeded"})
+                return
+            if server.error_rate and random.random() < server.error_rate:
+                outcome = "forbidden"
+                self._send(403, {"message": "Forbidden"})
+                return
+
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            status, body = server.data.query(params)
+            if status == 404:
+                outcome = "not_found"
+            self._send(status, body)
+        finally:
+            server.leave(outcome)
+
+    def _send(self, status: int, body: Dict[str, Any]):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status != 200:
+            self.send_header("message", body.get("message", ""))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_in_thread(server: NVDStubServer) -> threading.Thread:
+    """在后台线程中运行服务器 (供基准测试等脚本内嵌使用)"""
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地NVD API 2.0模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--fixtures", nargs="*", default=[], help="CVE夹具文件或目录")
+    parser.add_argument("--synthetic", type=int, default=0, help="额外生成N个合成产品的CVE")
+    parser.add_argument("--cves-per-product", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="响应延迟 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="随机额外延迟上限 (秒)")
+    parser.add_argument("--rate", type=int, default=None, help="每个窗口允许的请求数 (默认不限制)")
+    parser.add_argument("--window", type=float, default=30.0, help="速率限制窗口 (秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回403的概率")
+    parser.add_argument("--api-key", action="append", default=[], help="有效的API密钥 (可重复)")
+    args = parser.parse_args()
+
+    vulnerabilities = load_fixtures(args.fixtures)
+    if args.synthetic:
+        vulnerabilities += synthetic_vulnerabilities(
+            [(f"vendor{i}", f"product{i}") for i in range(args.synthetic)],
+            cves_per_product=args.cves_per_product
+        )
+
+    server = NVDStubServer(
+        (args.host, args.port),
+        NVDStubData(vulnerabilities),
+        latency=args.latency,
+        jitter=args.jitter,
+        rate=args.rate,
+        window=args.window,
+        error_rate=args.error_rate,
+        api_keys=args.api_key
+    )
+    print(f"NVD模拟服务器: {server.url}  ({len(vulnerabilities)} 个CVE)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
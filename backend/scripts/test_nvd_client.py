@@ -19,6 +19,7 @@ async def test_nvd_client():
     client = NVDClient()
     print(f"\n✅ 客户端初始化成功")
     print(f"   速率限制: {client.rate_limit} 请求/{client.rate_window}秒")
+    print(f"   API地址: {client.base_url} (NVD_API_URL 可指向 scripts/nvd_stub_server.py)")
     
     # 测试1: 搜索已知的CVE
     print("\n" + "=" * 60)
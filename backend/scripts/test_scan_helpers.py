@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+测试扫描辅助逻辑 (无需网络/数据库/nmap)
+
+- 版本排序边界: 预发布、字母补丁 (1.0rc1 < 1.0 < 1.0.2k, 7.4 < 7.4p1)
+- 版本范围: compare_versions / version_in_range / VersionRangeIndex 的端点
+- 端口规格拆分: nmap_shards.parse_port_spec / split_ports / plan_shards
+- 两次扫描结果对比: scan_diff.diff_scan_results
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath('.'))
+
+from app.services.versions import VersionRangeIndex, compare_versions, version_in_range
+from app.services.scan_diff import diff_scan_results
+from app.workers.nmap_shards import find_port_spec, parse_port_spec, plan_shards, split_ports
+
+
+def check(results, label, actual, expected):
+    """记录一条检查结果并打印"""
+    ok = actual == expected
+    results.append(ok)
+    status = "✓" if ok else "✗"
+    print(f"{status} {label:45} => {actual!r}" + ("" if ok else f" (expected {expected!r})"))
+
+
+def test_version_ordering(results):
+    """版本排序边界"""
+    print("=" * 60)
+    print("测试1: 版本排序")
+    print("=" * 60)
+
+    chains = [
+        ["1.0rc1", "1.0", "1.0.2", "1.0.2k", "1.0.3"],
+        ["7.4", "7.4p1", "7.5"],
+        ["2.0alpha1", "2.0beta2", "2.0rc1", "2.0"],
+        ["1.0b2", "1.0", "1.0.2b"],
+    ]
+    for chain in chains:
+        for lower, higher in zip(chain, chain[1:]):
+            check(results, f"{lower} < {higher}", compare_versions(lower, higher), -1)
+            check(results, f"{higher} > {lower}", compare_versions(higher, lower), 1)
+
+    for v1, v2 in [("2.4", "2.4.0"), ("v2.4.1", "2.4.1"), ("1.0.0", "1")]:
+        check(results, f"{v1} == {v2}", compare_versions(v1, v2), 0)
+    print()
+
+
+def test_version_ranges(results):
+    """版本范围端点及区间索引与逐条判断一致"""
+    print("=" * 60)
+    print("测试2: 版本范围")
+    print("=" * 60)
+
+    # (版本, start_including, start_excluding, end_including, end_excluding, 期望)
+    cases = [
+        ("1.0.2k", None, None, None, "1.0.2k", False),
+        ("1.0.2j", None, None, None, "1.0.2k", True),
+        ("1.0.2k", None, None, "1.0.2k", None, True),
+        ("1.0rc1", "1.0", None, None, None, False),
+        ("1.0", "1.0", None, None, None, True),
+        ("7.4", None, "7.4", None, None, False),
+        ("7.4p1", None, "7.4", None, None, True),
+        ("2.4.0", "2.4", None, "2.4", None, True),
+    ]
+    for version, start_inc, start_exc, end_inc, end_exc, expected in cases:
+        bounds = f"[{start_inc or start_exc or '*'}, {end_inc or end_exc or '*'}]"
+        check(
+            results,
+            f"{version} in {bounds}",
+            version_in_range(version, start_inc, start_exc, end_inc, end_exc),
+            expected
+        )
+
+    conditions = {
+        "below-1.0.2k": {"end_excluding": "1.0.2k"},
+        "1.0.2-1.0.2k": {"start_including": "1.0.2", "end_including": "1.0.2k"},
+        "after-7.4": {"start_excluding": "7.4"},
+        "7.4-7.4p1": {"start_excluding": "7.4", "end_excluding": "7.5"},
+        "exact-1.0": {"version": "1.0"},
+        "any": {},
+    }
+    index = VersionRangeIndex()
+    for item, condition in conditions.items():
+        index.add(item, **condition)
+    index.build()
+
+    for version in ["0.9", "1.0rc1", "1.0", "1.0.2", "1.0.2j", "1.0.2k", "1.0.2l", "7.4", "7.4p1", "7.5"]:
+        expected = set()
+        for item, condition in conditions.items():
+            exact = condition.get("version")
+            if version_in_range(
+                version,
+                condition.get("start_including"),
+                condition.get("start_excluding"),
+                condition.get("end_including"),
+                condition.get("end_excluding"),
+                exact
+            ):
+                expected.add(item)
+        check(results, f"index.lookup({version})", sorted(index.lookup(version)), sorted(expected))
+
+    check(results, "index.lookup('') (无版本)", sorted(index.lookup("")), sorted(conditions))
+    print()
+
+
+def test_port_specs(results):
+    """端口规格解析与拆分"""
+    print("=" * 60)
+    print("测试3: 端口规格拆分")
+    print("=" * 60)
+
+    check(results, "find_port_spec(-p 1-1000)", find_port_spec(["-sV", "-p", "1-1000"]), (1, "1-1000"))
+    check(results, "find_port_spec(-p1-1000)", find_port_spec(["-sV", "-p1-1000"]), (1, "1-1000"))
+    check(results, "find_port_spec(--privileged)", find_port_spec(["--privileged"]), None)
+    check(results, "parse_port_spec(-)", parse_port_spec("-"), [(1, 65535)])
+    check(results, "parse_port_spec(80,22,1-100,443)", parse_port_spec("80,22,1-100,443"), [(1, 100), (443, 443)])
+    check(results, "parse_port_spec(-1024,1000-)", parse_port_spec("-1024,1000-"), [(1, 65535)])
+    check(results, "parse_port_spec(U:53) (协议前缀)", parse_port_spec("U:53"), None)
+    check(results, "split_ports(1-100,443 / 2)", split_ports([(1, 100), (443, 443)], 2), ["1-51", "52-100,443"])
+    check(results, "split_ports(1-10 / 3)", split_ports([(1, 10)], 3), ["1-4", "5-8", "9-10"])
+
+    shards = plan_shards("192.168.1.10", "-sV -p 1-4096", 4, 16)
+    check(results, "plan_shards 单主机按端口切分", [s.arguments for s in shards], [
+        "-sV -p 1-1024", "-sV -p 1025-2048", "-sV -p 2049-3072", "-sV -p 3073-4096"
+    ])
+    shards = plan_shards("10.0.0.1-64", "-sV", 4, 16)
+    check(results, "plan_shards 64主机按主机切分", [len(s.targets) for s in shards], [16, 16, 16, 16])
+    shards = plan_shards("10.0.0.1-8", "-sV -p 80", 4, 16)
+    check(results, "plan_shards 规模不足不切分", len(shards), 1)
+    print()
+
+
+def test_scan_diff(results):
+    """两次扫描结果对比"""
+    print("=" * 60)
+    print("测试4: 扫描结果对比")
+    print("=" * 60)
+
+    base = {"hosts": [
+        {"ip": "10.0.0.1", "state": "up", "ports": [
+            {"port": 22, "protocol": "tcp", "state": "open", "service": "ssh", "product": "OpenSSH", "version": "7.4"},
+            {"port": 80, "protocol": "tcp", "state": "open", "service": "http", "product": "lighttpd"},
+        ]},
+        {"ip": "10.0.0.2", "state": "up", "ports": [
+            {"port": 23, "protocol": "tcp", "state": "open", "service": "telnet"},
+        ]},
+    ]}
+    target = {"hosts": [
+        {"ip": "10.0.0.1", "state": "up", "ports": [
+            {"port": 22, "protocol": "tcp", "state": "open", "service": "ssh", "product": "OpenSSH", "version": "7.4p1"},
+            {"port": 80, "protocol": "tcp", "state": "filtered", "service": "http"},
+            {"port": 443, "protocol": "tcp", "state": "open", "service": "https"},
+        ]},
+        {"ip": "10.0.0.10", "state": "up", "ports": [
+            {"port": 53, "protocol": "udp", "state": "open", "service": "domain"},
+        ]},
+    ]}
+
+    diff = diff_scan_results(base, target)
+    check(results, "summary", diff["summary"], {
+        "hosts_base": 2,
+        "hosts_target": 2,
+        "hosts_added": 1,
+        "hosts_removed": 1,
+        "hosts_changed": 3,
+        "ports_opened": 2,
+        "ports_closed": 2,
+        "services_changed": 1,
+    })
+    hosts = {host["ip"]: host for host in diff["hosts"]}
+    check(results, "主机按IP数值排序", [host["ip"] for host in diff["hosts"]], ["10.0.0.1", "10.0.0.2", "10.0.0.10"])
+    check(results, "状态", {ip: host["status"] for ip, host in hosts.items()}, {
+        "10.0.0.1": "changed", "10.0.0.2": "removed", "10.0.0.10": "added"
+    })
+    check(results, "10.0.0.1 新开放", [p["port"] for p in hosts["10.0.0.1"]["opened"]], [443])
+    check(results, "10.0.0.1 已关闭 (当前状态)", [
+        (p["port"], p["state_after"]) for p in hosts["10.0.0.1"]["closed"]
+    ], [(80, "filtered")])
+    check(results, "10.0.0.1 服务变化", hosts["10.0.0.1"]["changed"], [{
+        "port": 22,
+        "protocol": "tcp",
+        "fields": ["version"],
+        "before": {"version": "7.4"},
+        "after": {"version": "7.4p1"},
+    }])
+    check(results, "相同结果无变化", diff_scan_results(base, base)["hosts"], [])
+    print()
+
+
+def main():
+    results = []
+    test_version_ordering(results)
+    test_version_ranges(results)
+    test_port_specs(results)
+    test_scan_diff(results)
+
+    failed = results.count(False)
+    print("=" * 60)
+    if failed:
+        print(f"❌ {failed}/{len(results)} 项检查失败")
+    else:
+        print(f"✅ 所有 {len(results)} 项检查通过！")
+    print("=" * 60)
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
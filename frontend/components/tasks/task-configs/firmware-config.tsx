@@ -20,15 +20,17 @@ export function FirmwareConfig({ formData, setFormData }: FirmwareConfigProps) {
     const [dragActive, setDragActive] = useState(false)
 
     const analysisDepths = [
-        { value: 'quick', label: '快速扫描', duration: '5-10分钟', description: '基础提取和快速扫描' },
-        { value: 'standard', label: '标准分析', duration: '15-30分钟', description: '完整文件系统扫描与检测' },
-        { value: 'deep', label: '深度分析', duration: '30-60分钟', description: '使用所有模块进行全面分析' }
+        { value: 'quick', label: '快速扫描', duration: '约1分钟', description: '30秒扫描预算，优先检查密钥、配置和关键二进制' },
+        { value: 'standard', label: '标准分析', duration: '5-10分钟', description: '5分钟扫描预算，覆盖完整文件系统' },
+        { value: 'deep', label: '深度分析', duration: '30-60分钟', description: '30分钟扫描预算，不限扫描数据量' }
     ]
 
     const scanTypes = [
         { id: 'strings', label: '字符串提取', description: '从二进制文件中提取URL、IP地址、邮箱' },
         { id: 'credentials', label: '凭证检测', description: '查找硬编码的密码、API密钥、令牌' },
         { id: 'crypto', label: '加密材料', description: '扫描私钥、证书' },
+        { id: 'binaries', label: '二进制加固', description: '检查ELF的NX、PIE、RELRO、栈保护及依赖库' },
+        { id: 'components', label: '组件识别', description: '识别BusyBox、OpenSSL等组件版本并生成SBOM' },
         { id: 'vulnerabilities', label: '已知漏洞', description: '与CVE数据库匹配' }
     ]
 
@@ -27,12 +27,12 @@ export function PingScanConfig({ formData, setFormData }: PingScanConfigProps) {
                 </Label>
                 <Input
                     id="targetIp"
-                    placeholder="例如: 8.8.8.8 或 google.com"
+                    placeholder="例如: 8.8.8.8、google.com 或 192.168.1.0/24"
                     value={formData.targetIp || ''}
                     onChange={(e) => setFormData({ ...formData, targetIp: e.target.value })}
                 />
                 <p className="text-xs text-muted-foreground">
-                    输入要测试连通性的目标IP地址或域名
+                    输入要测试连通性的目标IP地址、域名或网段
                 </p>
             </div>
 
@@ -47,7 +47,7 @@ export function PingScanConfig({ formData, setFormData }: PingScanConfigProps) {
                     onChange={(e) => setFormData({ ...formData, count: parseInt(e.target.value) })}
                 />
                 <p className="text-xs text-muted-foreground">
-                    发送ICMP请求的次数（1-10次）
+                    每个在线主机的探测次数（1-10次），用于统计延迟
                 </p>
             </div>
         </div>